@@ -81,3 +81,7 @@ AVAILABLE_MODELS = [
     "meta-llama/llama-3-8b-instruct",
     "gryphe/mythomax-l2-13b"
 ]
+MODELOS_CON_CACHE_PROMPT = [
+    "openai/gpt-5-nano",
+    "google/gemini-2.0-flash-lite-001"
+]
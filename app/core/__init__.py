@@ -1,3 +1,29 @@
-from .exceptions import AnalisisNotFoundError, IAProcessingError
+from .exceptions import (
+    AnalisisNotFoundError,
+    IAProcessingError,
+    AnalisisNoCancelableError,
+    IdempotenciaConflictoError,
+    IdempotenciaEnCursoError,
+    ServicioSaturadoError,
+    CuotaClienteExcedidaError,
+    ClaveApiInvalidaError,
+    PerfilNoEncontradoError,
+    InformeNoDisponibleError,
+    SnapshotNoDisponibleError,
+    RegistroInvalidoError,
+)
 
-__all__ = ["AnalisisNotFoundError", "IAProcessingError"]
\ No newline at end of file
+__all__ = [
+    "AnalisisNotFoundError",
+    "IAProcessingError",
+    "AnalisisNoCancelableError",
+    "IdempotenciaConflictoError",
+    "IdempotenciaEnCursoError",
+    "ServicioSaturadoError",
+    "CuotaClienteExcedidaError",
+    "ClaveApiInvalidaError",
+    "PerfilNoEncontradoError",
+    "InformeNoDisponibleError",
+    "SnapshotNoDisponibleError",
+    "RegistroInvalidoError",
+]
@@ -12,4 +12,95 @@ class IAProcessingError(HTTPException):
         super().__init__(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=detail
-        )
\ No newline at end of file
+        )
+
+class AnalisisNoCancelableError(HTTPException):
+    def __init__(self, analisis_id: str, estado: str):
+        super().__init__(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"El análisis con ID {analisis_id} está en estado {estado} y no puede cancelarse."
+        )
+
+
+class IdempotenciaConflictoError(HTTPException):
+    def __init__(self, clave: str):
+        super().__init__(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"La Idempotency-Key '{clave}' ya se usó con un cuerpo de petición distinto."
+        )
+
+class IdempotenciaEnCursoError(HTTPException):
+    def __init__(self, clave: str):
+        super().__init__(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"La petición con Idempotency-Key '{clave}' todavía se está procesando."
+        )
+
+
+class ServicioSaturadoError(HTTPException):
+    def __init__(self, retry_after: int):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"El servicio está saturado. Reintentar en {retry_after} segundos.",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+class CuotaClienteExcedidaError(HTTPException):
+    def __init__(self, cliente: str, retry_after: int, cuota: str = "análisis"):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"El cliente {cliente} superó su cuota de {cuota} en curso. Reintentar en {retry_after} segundos.",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+class ClaveApiInvalidaError(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="La clave X-Api-Key no corresponde a ningún cliente registrado.",
+        )
+
+class PerfilNoEncontradoError(HTTPException):
+    def __init__(self, nombre: str):
+        super().__init__(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No hay un perfil guardado para {nombre}. Procesar con el header X-Perfilar: true."
+        )
+
+class InformeNoDisponibleError(HTTPException):
+    def __init__(self, analisis_id: str, estado: str):
+        super().__init__(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"El análisis con ID {analisis_id} está en estado {estado}: todavía no tiene informe."
+        )
+
+
+class SnapshotNoDisponibleError(HTTPException):
+    def __init__(self, analisis_id: str, motivo: str):
+        super().__init__(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Snapshot del análisis {analisis_id}: {motivo}"
+        )
+
+class RegistroInvalidoError(HTTPException):
+    def __init__(self, linea: int, detalle: str):
+        super().__init__(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Línea {linea} inválida (no se guardó ningún registro de este envío): {detalle}"
+        )
+
+
+class WebhooksDeshabilitadosError(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Los webhooks están deshabilitados: el servidor no tiene WEBHOOK_SECRETO para firmarlos."
+        )
+
+class WebhookUrlNoPermitidaError(HTTPException):
+    def __init__(self, url: str, motivo: str):
+        super().__init__(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"La URL de webhook {url} no está permitida: {motivo}"
+        )
@@ -0,0 +1,32 @@
+import json
+from decimal import Decimal
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: extra [fast]
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Tipo no serializable: {type(obj).__name__}")
+
+
+def serializar_json(contenido: Any) -> bytes:
+    """Serializa a JSON con orjson si está instalado; si no, con la stdlib."""
+    if orjson is not None:
+        return orjson.dumps(contenido, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        contenido, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default
+    ).encode("utf-8")
+
+
+class RespuestaJSONRapida(JSONResponse):
+    """Response class por defecto de la app: JSON vía orjson con fallback a json."""
+
+    def render(self, content: Any) -> bytes:
+        return serializar_json(content)
@@ -1,3 +1,60 @@
-from .crud_analisis import create_analisis, get_analisis, update_estado
+from .crud_analisis import (
+    create_analisis,
+    get_analisis,
+    update_estado,
+    get_analisis_superados,
+    reclamar_procesamiento,
+    liberar_procesamiento,
+    iterar_lotes_exportacion,
+)
+from .crud_snapshot import (
+    guardar_snapshot,
+    sellar_snapshot,
+    get_resultado_por_hash,
+    iniciar_snapshot,
+    get_snapshot_por_partes_id,
+    insertar_datos,
+    cargar_datos_snapshot,
+)
+from .crud_riesgos import normalizar_riesgos, sincronizar_terminos_riesgo, buscar_resultados, frecuencia_riesgos
+from .crud_webhooks import (
+    crear_suscripciones,
+    encolar_eventos,
+    reclamar_entregas,
+    marcar_entregadas,
+    reprogramar_entrega,
+)
+from .crud_informes import get_informe, guardar_informe
+from .crud_idempotencia import reservar_clave, completar_clave, liberar_clave, purgar_claves_vencidas
 
-__all__ = ["create_analisis", "get_analisis", "update_estado"]
\ No newline at end of file
+__all__ = [
+    "create_analisis",
+    "get_analisis",
+    "update_estado",
+    "get_analisis_superados",
+    "reclamar_procesamiento",
+    "liberar_procesamiento",
+    "iterar_lotes_exportacion",
+    "guardar_snapshot",
+    "sellar_snapshot",
+    "get_resultado_por_hash",
+    "iniciar_snapshot",
+    "get_snapshot_por_partes_id",
+    "insertar_datos",
+    "cargar_datos_snapshot",
+    "normalizar_riesgos",
+    "sincronizar_terminos_riesgo",
+    "buscar_resultados",
+    "frecuencia_riesgos",
+    "crear_suscripciones",
+    "encolar_eventos",
+    "reclamar_entregas",
+    "marcar_entregadas",
+    "reprogramar_entrega",
+    "get_informe",
+    "guardar_informe",
+    "reservar_clave",
+    "completar_clave",
+    "liberar_clave",
+    "purgar_claves_vencidas",
+]
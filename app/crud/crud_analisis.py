@@ -1,8 +1,13 @@
-from sqlalchemy.orm import Session
+from datetime import date, datetime, timedelta
+from typing import Iterator
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session, selectinload
 from uuid import UUID
 from app.models.analysis import Analisis
+from app.models.results import ResultadoAnalisis
 from app.schemas.analisis import AnalisisCreate
 from app.models.enums import EstadoAnalisis
+from app.db import marcar_escritura
 
 def create_analisis(db: Session, analisis_in: AnalisisCreate) -> Analisis:
     db_obj = Analisis(
@@ -25,4 +30,106 @@ def update_estado(db: Session, analisis_id: UUID, estado: EstadoAnalisis) -> Ana
         db_obj.estado = estado
         db.commit()
         db.refresh(db_obj)
-    return db_obj
\ No newline at end of file
+    return db_obj
+
+def get_analisis_superados(db: Session, analisis: Analisis) -> list[Analisis]:
+    """Análisis anteriores del mismo proyecto y período que siguen activos."""
+    return (
+        db.query(Analisis)
+        .filter(
+            Analisis.id != analisis.id,
+            Analisis.proyecto_codigo == analisis.proyecto_codigo,
+            Analisis.periodo_desde == analisis.periodo_desde,
+            Analisis.periodo_hasta == analisis.periodo_hasta,
+            Analisis.fecha_solicitud < analisis.fecha_solicitud,
+            Analisis.estado.in_([EstadoAnalisis.PENDIENTE, EstadoAnalisis.PROCESANDO]),
+        )
+        .all()
+    )
+
+
+def reclamar_procesamiento(db: Session, analisis_id: UUID, vencimiento_segundos: float) -> bool:
+    """
+    Pasa el análisis a PROCESANDO de forma atómica. Devuelve False si otro
+    proceso ya lo está procesando (salvo que su reclamo esté vencido).
+    """
+    vencido = datetime.utcnow() - timedelta(seconds=vencimiento_segundos)
+    filas = (
+        db.query(Analisis)
+        .filter(
+            Analisis.id == analisis_id,
+            Analisis.estado != EstadoAnalisis.CANCELADO,
+            or_(Analisis.estado != EstadoAnalisis.PROCESANDO, Analisis.updated_at < vencido),
+        )
+        .update(
+            {
+                Analisis.estado: EstadoAnalisis.PROCESANDO,
+                Analisis.fecha_inicio_proceso: datetime.utcnow(),
+                Analisis.updated_at: datetime.utcnow(),
+            },
+            synchronize_session="fetch",
+        )
+    )
+    db.commit()
+    # El UPDATE masivo no pasa por after_flush
+    marcar_escritura(analisis_id)
+    return filas == 1
+
+def liberar_procesamiento(db: Session, analisis_id: UUID, motivo: str) -> bool:
+    """
+    Devuelve a PENDIENTE un análisis que quedó PROCESANDO sin terminar
+    (p. ej. por un reinicio), para poder volver a enviarlo. No toca los que
+    ya pasaron a otro estado, como un CANCELADO persistido por otra request.
+    """
+    filas = (
+        db.query(Analisis)
+        .filter(Analisis.id == analisis_id, Analisis.estado == EstadoAnalisis.PROCESANDO)
+        .update(
+            {
+                Analisis.estado: EstadoAnalisis.PENDIENTE,
+                Analisis.error_mensaje: motivo,
+                Analisis.updated_at: datetime.utcnow(),
+            },
+            synchronize_session="fetch",
+        )
+    )
+    db.commit()
+    marcar_escritura(analisis_id)
+    return filas == 1
+
+def iterar_lotes_exportacion(
+    db: Session,
+    proyecto_codigo: str | None = None,
+    desde: date | None = None,
+    hasta: date | None = None,
+    estado: EstadoAnalisis | None = None,
+    tamano_lote: int = 500,
+) -> Iterator[list[Analisis]]:
+    """
+    Análisis filtrados, de a lotes, con cursor del lado del servidor
+    (stream_results + yield_per). Resultado y observaciones se cargan con
+    un selectin por lote (sin N+1) y cada lote se saca de la sesión antes
+    de pedir el siguiente, así la memoria no crece con el total de filas.
+    El período filtra por solapamiento con [desde, hasta].
+    """
+    consulta = (
+        select(Analisis)
+        .options(selectinload(Analisis.resultado).selectinload(ResultadoAnalisis.observaciones))
+        .order_by(Analisis.fecha_solicitud, Analisis.id)
+        .execution_options(stream_results=True, yield_per=tamano_lote)
+    )
+    if proyecto_codigo:
+        consulta = consulta.where(Analisis.proyecto_codigo == proyecto_codigo)
+    if desde:
+        consulta = consulta.where(Analisis.periodo_hasta >= desde)
+    if hasta:
+        consulta = consulta.where(Analisis.periodo_desde <= hasta)
+    if estado:
+        consulta = consulta.where(Analisis.estado == estado)
+
+    for lote in db.execute(consulta).scalars().partitions():
+        yield lote
+        # expunge_all reemplazaría el identity map que sigue usando yield_per;
+        # el cascade lleva también resultado y observaciones
+        for analisis in lote:
+            db.expunge(analisis)
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import and_, inspect, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import ClaveIdempotencia
+
+
+def reservar_clave(
+    db: Session, clave: str, endpoint: str, huella: str, ttl_segundos: float, reserva_segundos: float
+) -> tuple[ClaveIdempotencia, bool]:
+    """
+    Reserva la clave para el endpoint. Devuelve (registro, True) si quien llama
+    debe ejecutar la operación, o (registro_existente, False) si es un reintento.
+    Una reserva sin respuesta por más de `reserva_segundos` se considera
+    abandonada (el proceso murió a mitad) y se retoma como si no existiera.
+    """
+    while True:
+        ahora = datetime.utcnow()
+        existente = _get_clave(db, clave, endpoint)
+        if existente is not None:
+            abandonada = existente.status_code is None and (
+                existente.created_at <= ahora - timedelta(seconds=reserva_segundos)
+            )
+            if existente.expira_at > ahora and not abandonada:
+                return existente, False
+            # Condicionado a lo visto: si otra request ya la retomó o la completó, no se borra
+            db.query(ClaveIdempotencia).filter(
+                ClaveIdempotencia.id == existente.id,
+                or_(
+                    ClaveIdempotencia.expira_at <= ahora,
+                    and_(
+                        ClaveIdempotencia.status_code.is_(None),
+                        ClaveIdempotencia.created_at <= ahora - timedelta(seconds=reserva_segundos),
+                    ),
+                ),
+            ).delete(synchronize_session=False)
+            db.commit()
+            db.expunge(existente)
+
+        registro = ClaveIdempotencia(
+            clave=clave,
+            endpoint=endpoint,
+            huella_solicitud=huella,
+            created_at=ahora,
+            expira_at=ahora + timedelta(seconds=ttl_segundos),
+        )
+        db.add(registro)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Otra request con la misma clave ganó la carrera: se vuelve a leer
+            # (si ya la liberó porque su operación falló, se reintenta la reserva)
+            db.rollback()
+            continue
+        return registro, True
+
+
+def _id(registro: ClaveIdempotencia):
+    # Sin refrescar la instancia: si otra request borró la fila, leerla fallaría
+    return inspect(registro).identity[0]
+
+
+def completar_clave(
+    db: Session,
+    registro: ClaveIdempotencia,
+    status_code: int,
+    respuesta: Any,
+    huella: str | None = None,
+    commit: bool = True,
+) -> bool:
+    """
+    Guarda la respuesta de la operación. `huella` reemplaza la de la reserva
+    (cuando solo se conoce al terminar, como en un cuerpo en streaming). Con
+    `commit=False` queda en la transacción de quien llama, junto con lo que
+    produjo la respuesta. Devuelve False si la reserva ya no está en curso
+    (otra request la retomó por abandonada).
+    """
+    campos = {ClaveIdempotencia.status_code: status_code, ClaveIdempotencia.respuesta: respuesta}
+    if huella is not None:
+        campos[ClaveIdempotencia.huella_solicitud] = huella
+    filas = (
+        db.query(ClaveIdempotencia)
+        .filter(ClaveIdempotencia.id == _id(registro), ClaveIdempotencia.status_code.is_(None))
+        .update(campos, synchronize_session=False)
+    )
+    if commit:
+        db.commit()
+    return filas > 0
+
+
+def liberar_clave(db: Session, registro: ClaveIdempotencia):
+    """Si la operación falló se borra la reserva para que el cliente pueda reintentar."""
+    db.rollback()
+    db.query(ClaveIdempotencia).filter(ClaveIdempotencia.id == _id(registro)).delete()
+    db.commit()
+
+
+def purgar_claves_vencidas(db: Session) -> int:
+    filas = (
+        db.query(ClaveIdempotencia)
+        .filter(ClaveIdempotencia.expira_at < datetime.utcnow())
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return filas
+
+
+def _get_clave(db: Session, clave: str, endpoint: str) -> ClaveIdempotencia | None:
+    return (
+        db.query(ClaveIdempotencia)
+        .filter(ClaveIdempotencia.clave == clave, ClaveIdempotencia.endpoint == endpoint)
+        .first()
+    )
@@ -0,0 +1,42 @@
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models import InformeGenerado
+
+
+def get_informe(db: Session, resultado_id: UUID, version_plantilla: str, formato: str = "html") -> InformeGenerado | None:
+    return (
+        db.query(InformeGenerado)
+        .filter(
+            InformeGenerado.resultado_id == resultado_id,
+            InformeGenerado.version_plantilla == version_plantilla,
+            InformeGenerado.formato == formato,
+        )
+        .first()
+    )
+
+
+def guardar_informe(
+    db: Session, resultado_id: UUID, version_plantilla: str, contenido: bytes, etag: str, formato: str = "html"
+):
+    """Upsert del informe renderizado (dos renders concurrentes no chocan por la unique)."""
+    valores = {
+        "resultado_id": resultado_id,
+        "version_plantilla": version_plantilla,
+        "formato": formato,
+        "contenido": contenido,
+        "etag": etag,
+        "generado_at": datetime.utcnow(),
+    }
+    db.execute(
+        insert(InformeGenerado)
+        .values(**valores)
+        .on_conflict_do_update(
+            constraint="uq_informes_generados_resultado_version",
+            set_={k: valores[k] for k in ("contenido", "etag", "generado_at")},
+        )
+    )
+    db.commit()
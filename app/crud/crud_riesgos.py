@@ -0,0 +1,151 @@
+from datetime import date
+from typing import Any
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models import Analisis, ResultadoAnalisis, TerminoRiesgo, resultados_riesgos
+from app.utils.texto import normalizar_termino
+
+
+def normalizar_riesgos(riesgos: Any) -> list[str]:
+    """
+    Lista de riesgos tal como se guarda en `riesgos_identificados`. Viene
+    de la respuesta del LLM: un string suelto cuenta como un riesgo (la
+    columna ARRAY lo partiría en letras) y lo que no sea lista se ignora,
+    igual que los elementos que no son strings.
+    """
+    if isinstance(riesgos, str):
+        riesgos = [riesgos]
+    elif not isinstance(riesgos, (list, tuple)):
+        return []
+    return [r for r in riesgos if isinstance(r, str) and r.strip()]
+
+
+def _terminos_por_normalizado(riesgos: Any) -> dict[str, str]:
+    """Término normalizado → texto original."""
+    por_termino: dict[str, str] = {}
+    for riesgo in normalizar_riesgos(riesgos):
+        normalizado = normalizar_termino(riesgo)[:300]
+        if normalizado:
+            por_termino.setdefault(normalizado, riesgo.strip()[:300])
+    return por_termino
+
+
+def sincronizar_terminos_riesgo(db: Session, resultado: ResultadoAnalisis, riesgos: list[str]) -> list[TerminoRiesgo]:
+    """
+    Vincula el resultado con los términos normalizados de sus riesgos,
+    creando los que falten. El alta es ON CONFLICT DO NOTHING para que dos
+    workers guardando el mismo riesgo a la vez no choquen por la unique.
+    No hace commit: queda en la transacción de quien guarda el resultado.
+    """
+    por_termino = _terminos_por_normalizado(riesgos)
+
+    if not por_termino:
+        resultado.terminos_riesgo = []
+        return []
+
+    db.execute(
+        insert(TerminoRiesgo)
+        .values([{"termino_normalizado": n, "texto": t} for n, t in por_termino.items()])
+        .on_conflict_do_nothing(index_elements=["termino_normalizado"])
+    )
+    terminos = (
+        db.query(TerminoRiesgo)
+        .filter(TerminoRiesgo.termino_normalizado.in_(list(por_termino)))
+        .all()
+    )
+    resultado.terminos_riesgo = terminos
+    return terminos
+
+
+def _filtrar_analisis(consulta, proyecto_codigo: str | None, desde: date | None, hasta: date | None):
+    if proyecto_codigo:
+        consulta = consulta.where(Analisis.proyecto_codigo == proyecto_codigo)
+    if desde:
+        consulta = consulta.where(Analisis.periodo_hasta >= desde)
+    if hasta:
+        consulta = consulta.where(Analisis.periodo_desde <= hasta)
+    return consulta
+
+
+def buscar_resultados(
+    db: Session,
+    texto: str | None = None,
+    riesgo: str | None = None,
+    proyecto_codigo: str | None = None,
+    desde: date | None = None,
+    hasta: date | None = None,
+    limite: int = 50,
+    offset: int = 0,
+) -> list[dict[str, Any]]:
+    """
+    Resultados que matchean `texto` (sintaxis de buscador web: comillas,
+    OR, -exclusión) sobre el tsvector indexado, y/o que mencionan el riesgo
+    normalizado. Con texto se ordena por ts_rank; sin texto, por fecha.
+    """
+    columnas = [
+        ResultadoAnalisis.analisis_id,
+        Analisis.proyecto_codigo,
+        Analisis.periodo_desde,
+        Analisis.periodo_hasta,
+        ResultadoAnalisis.score_coherencia,
+        ResultadoAnalisis.riesgos_identificados,
+        ResultadoAnalisis.generado_at,
+    ]
+    consulta_ts = func.websearch_to_tsquery("spanish", texto) if texto else None
+    if consulta_ts is not None:
+        columnas += [
+            func.ts_rank(ResultadoAnalisis.busqueda, consulta_ts).label("rango"),
+            func.ts_headline(
+                "spanish", ResultadoAnalisis.resumen_general, consulta_ts,
+                "MaxFragments=2, MaxWords=30, MinWords=10",
+            ).label("fragmento"),
+        ]
+
+    consulta = select(*columnas).join(Analisis, Analisis.id == ResultadoAnalisis.analisis_id)
+    if consulta_ts is not None:
+        consulta = consulta.where(ResultadoAnalisis.busqueda.op("@@")(consulta_ts))
+    if riesgo:
+        consulta = (
+            consulta
+            .join(resultados_riesgos, resultados_riesgos.c.resultado_id == ResultadoAnalisis.id)
+            .join(TerminoRiesgo, TerminoRiesgo.id == resultados_riesgos.c.termino_id)
+            .where(TerminoRiesgo.termino_normalizado == normalizar_termino(riesgo))
+        )
+    consulta = _filtrar_analisis(consulta, proyecto_codigo, desde, hasta)
+
+    if consulta_ts is not None:
+        consulta = consulta.order_by(func.ts_rank(ResultadoAnalisis.busqueda, consulta_ts).desc())
+    else:
+        consulta = consulta.order_by(ResultadoAnalisis.generado_at.desc())
+
+    filas = db.execute(consulta.limit(limite).offset(offset)).mappings().all()
+    return [dict(fila) for fila in filas]
+
+
+def frecuencia_riesgos(
+    db: Session,
+    proyecto_codigo: str | None = None,
+    desde: date | None = None,
+    hasta: date | None = None,
+    limite: int = 50,
+) -> list[dict[str, Any]]:
+    """Términos de riesgo más frecuentes: en cuántos análisis y proyectos aparecen."""
+    analisis_total = func.count(func.distinct(Analisis.id)).label("analisis")
+    consulta = (
+        select(
+            TerminoRiesgo.texto.label("termino"),
+            TerminoRiesgo.termino_normalizado,
+            analisis_total,
+            func.count(func.distinct(Analisis.proyecto_codigo)).label("proyectos"),
+        )
+        .join(resultados_riesgos, resultados_riesgos.c.termino_id == TerminoRiesgo.id)
+        .join(ResultadoAnalisis, ResultadoAnalisis.id == resultados_riesgos.c.resultado_id)
+        .join(Analisis, Analisis.id == ResultadoAnalisis.analisis_id)
+        .group_by(TerminoRiesgo.id)
+    )
+    consulta = _filtrar_analisis(consulta, proyecto_codigo, desde, hasta)
+    consulta = consulta.order_by(analisis_total.desc(), TerminoRiesgo.texto).limit(limite)
+    return [dict(fila) for fila in db.execute(consulta).mappings().all()]
@@ -0,0 +1,159 @@
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.models import (
+    Analisis, ResultadoAnalisis, SnapshotRecibido,
+    DatoProyecto, DatoEtapa, DatoAvance, DatoSeguridad, DatoValidacion,
+)
+from app.models.enums import EstadoAnalisis
+from app.schemas.snapshot import (
+    DatoProyectoBase, DatoEtapaBase, DatoAvanceBase, DatoSeguridadBase, DatoValidacionBase,
+)
+
+
+def guardar_snapshot(
+    db: Session, analisis_id: UUID, payload: dict[str, Any] | str, hash_payload: int, huella: str
+) -> SnapshotRecibido:
+    """
+    Persiste (o reemplaza, si se reprocesa) el snapshot recibido para el análisis.
+    `payload` puede venir ya codificado como JSONPreserializado para no volver a
+    serializarlo al escribir la columna JSON.
+    """
+    db_obj = db.query(SnapshotRecibido).filter(SnapshotRecibido.analisis_id == analisis_id).first()
+    if db_obj is None:
+        db_obj = SnapshotRecibido(analisis_id=analisis_id)
+        db.add(db_obj)
+    db_obj.payload_completo = payload
+    db_obj.hash_payload = hash_payload
+    db_obj.huella_sha256 = huella
+    db_obj.recibido_at = datetime.utcnow()
+    db.commit()
+    return db_obj
+
+
+def sellar_snapshot(db: Session, analisis_id: UUID, hash_payload: int, huella: str):
+    """
+    Registra hash y huella de un snapshot por partes. Los datos ya están en
+    las tablas Dato*: el payload no se vuelve a escribir en payload_completo.
+    """
+    db.query(SnapshotRecibido).filter(SnapshotRecibido.analisis_id == analisis_id).update(
+        {SnapshotRecibido.hash_payload: hash_payload, SnapshotRecibido.huella_sha256: huella},
+        synchronize_session=False,
+    )
+    db.commit()
+
+
+def get_resultado_por_hash(
+    db: Session,
+    hash_payload: int,
+    huella: str,
+    excluir_analisis_id: UUID,
+    desde: datetime,
+) -> ResultadoAnalisis | None:
+    """
+    Último resultado COMPLETADO generado desde `desde` para un snapshot
+    idéntico. El hash es de 32 bits (usa el índice), así que se confirma con
+    la huella sha256 en lugar de traer y comparar los payloads.
+    Los informes parciales (COMPLETADO con error_mensaje) no se reutilizan.
+    """
+    return (
+        db.query(ResultadoAnalisis)
+        .join(Analisis, Analisis.id == ResultadoAnalisis.analisis_id)
+        .join(SnapshotRecibido, SnapshotRecibido.analisis_id == Analisis.id)
+        .filter(
+            SnapshotRecibido.hash_payload == hash_payload,
+            SnapshotRecibido.huella_sha256 == huella,
+            Analisis.id != excluir_analisis_id,
+            Analisis.estado == EstadoAnalisis.COMPLETADO,
+            Analisis.error_mensaje.is_(None),
+            ResultadoAnalisis.generado_at >= desde,
+        )
+        .order_by(ResultadoAnalisis.generado_at.desc())
+        .first()
+    )
+
+
+# ─── Ingesta por partes (tablas Dato*) ───────────────────────────────
+
+def iniciar_snapshot(db: Session, analisis: Analisis, proyecto: dict[str, Any]) -> SnapshotRecibido:
+    """
+    Empieza un snapshot por partes: reemplaza el anterior del análisis (sus
+    Dato* caen por cascada) y guarda los datos del proyecto. El payload y
+    el hash se completan al procesar, a partir de las tablas.
+    """
+    db.query(SnapshotRecibido).filter(SnapshotRecibido.analisis_id == analisis.id).delete()
+    snapshot = SnapshotRecibido(analisis_id=analisis.id, payload_completo={}, hash_payload=0)
+    snapshot.dato_proyecto = DatoProyecto(proyecto_codigo=analisis.proyecto_codigo, **proyecto)
+    db.add(snapshot)
+    db.commit()
+    return snapshot
+
+
+def get_snapshot_por_partes_id(db: Session, analisis_id: UUID) -> UUID | None:
+    """
+    Id del snapshot por partes del análisis: el que se inició con los datos
+    del proyecto. Un snapshot de /procesar (un solo body) no tiene DatoProyecto
+    y no cuenta, porque desde las tablas Dato* no hay nada que armar.
+    """
+    return (
+        db.query(SnapshotRecibido.id)
+        .join(DatoProyecto, DatoProyecto.snapshot_id == SnapshotRecibido.id)
+        .filter(SnapshotRecibido.analisis_id == analisis_id)
+        .scalar()
+    )
+
+
+def siguiente_orden(db: Session, modelo: type, snapshot_id: UUID) -> int:
+    """
+    Primera posición libre de la sección para un envío nuevo. En PostgreSQL
+    toma un advisory lock de la sección hasta el commit: dos envíos a la vez
+    a la misma sección se serializan en lugar de repartirse las posiciones.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext(:clave))"),
+            {"clave": f"{modelo.__tablename__}:{snapshot_id}"},
+        )
+    ultimo = db.execute(
+        select(func.max(modelo.orden)).where(modelo.snapshot_id == snapshot_id)
+    ).scalar()
+    return 0 if ultimo is None else ultimo + 1
+
+
+def insertar_datos(db: Session, modelo: type, filas: list[dict[str, Any]]):
+    """INSERT masivo (executemany) de un lote de registros. No hace commit."""
+    if filas:
+        db.execute(insert(modelo), filas)
+
+
+def _volcar(db: Session, esquema: type, modelo: type, snapshot_id: UUID) -> list[dict[str, Any]]:
+    # Mismo volcado que el JSON de SnapshotInput y en el orden de carga: los
+    # mismos registros enviados por partes o en un solo body dan el mismo hash.
+    # El id solo desempata filas anteriores a la columna `orden` (todas en 0)
+    columnas = [getattr(modelo, campo) for campo in esquema.model_fields]
+    consulta = select(*columnas).where(modelo.snapshot_id == snapshot_id)
+    if hasattr(modelo, "orden"):
+        consulta = consulta.order_by(modelo.orden, modelo.id)
+    filas = db.execute(consulta).mappings()
+    return [esquema.model_validate(dict(fila)).model_dump(mode="json") for fila in filas]
+
+
+def cargar_datos_snapshot(db: Session, analisis_id: UUID) -> dict[str, Any] | None:
+    """Arma el volcado del snapshot desde las tablas Dato*, o None si no hay snapshot por partes."""
+    snapshot_id = get_snapshot_por_partes_id(db, analisis_id)
+    if snapshot_id is None:
+        return None
+    proyecto = _volcar(db, DatoProyectoBase, DatoProyecto, snapshot_id)
+    if not proyecto:
+        return None
+    return {
+        "proyecto": proyecto[0],
+        "etapas": _volcar(db, DatoEtapaBase, DatoEtapa, snapshot_id),
+        "avances": _volcar(db, DatoAvanceBase, DatoAvance, snapshot_id),
+        "seguridad_higiene": _volcar(db, DatoSeguridadBase, DatoSeguridad, snapshot_id),
+        "validaciones_tecnicas": _volcar(db, DatoValidacionBase, DatoValidacion, snapshot_id),
+    }
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models import Analisis, EntregaWebhook, SuscripcionWebhook
+from app.models.enums import EstadoAnalisis, EstadoEntregaWebhook
+
+ESTADOS_NOTIFICABLES = (EstadoAnalisis.COMPLETADO, EstadoAnalisis.ERROR, EstadoAnalisis.CANCELADO)
+
+
+def crear_suscripciones(db: Session, url: str, analisis_ids: list[UUID]) -> int:
+    """
+    Suscribe `url` a los análisis indicados (uno o un lote). Los que ya
+    terminaron se encolan en el acto, solo si la suscripción es nueva: volver
+    a suscribirse no repite la notificación. Devuelve cuántos análisis existían.
+    """
+    analisis = db.query(Analisis).filter(Analisis.id.in_(analisis_ids)).all()
+    if not analisis:
+        return 0
+    nuevas = set(
+        db.execute(
+            insert(SuscripcionWebhook)
+            .values([{"analisis_id": a.id, "url": url} for a in analisis])
+            .on_conflict_do_nothing(constraint="uq_suscripciones_webhook_analisis_url")
+            .returning(SuscripcionWebhook.analisis_id)
+        ).scalars()
+    )
+    for a in analisis:
+        if a.id in nuevas and a.estado in ESTADOS_NOTIFICABLES:
+            db.add(EntregaWebhook(analisis_id=a.id, url=url, evento=a.estado))
+    db.commit()
+    return len(analisis)
+
+
+def encolar_eventos(db: Session, analisis: Analisis) -> int:
+    """
+    Agrega a la sesión una entrega por URL suscripta al análisis, con el
+    estado actual como evento. No hace commit: la entrega se persiste en la
+    misma transacción que el cambio de estado.
+    """
+    if analisis.estado not in ESTADOS_NOTIFICABLES:
+        return 0
+    urls = [
+        url for (url,) in
+        db.query(SuscripcionWebhook.url).filter(SuscripcionWebhook.analisis_id == analisis.id)
+    ]
+    for url in urls:
+        db.add(EntregaWebhook(analisis_id=analisis.id, url=url, evento=analisis.estado))
+    return len(urls)
+
+
+def reclamar_entregas(db: Session, limite: int, reserva_segundos: float) -> list[dict[str, Any]]:
+    """
+    Toma hasta `limite` entregas vencidas y las reserva corriendo su próximo
+    intento. SKIP LOCKED deja que varios procesos repartan la cola sin pisarse.
+    """
+    ahora = datetime.utcnow()
+    entregas = (
+        db.query(EntregaWebhook)
+        .filter(
+            EntregaWebhook.estado == EstadoEntregaWebhook.PENDIENTE,
+            EntregaWebhook.proximo_intento_at <= ahora,
+        )
+        .order_by(EntregaWebhook.proximo_intento_at)
+        .limit(limite)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    reclamadas = []
+    for entrega in entregas:
+        entrega.proximo_intento_at = ahora + timedelta(seconds=reserva_segundos)
+        reclamadas.append({
+            "id": entrega.id,
+            "analisis_id": entrega.analisis_id,
+            "url": entrega.url,
+            "evento": entrega.evento,
+            "intentos": entrega.intentos,
+            "created_at": entrega.created_at,
+        })
+    db.commit()
+    return reclamadas
+
+
+def marcar_entregadas(db: Session, ids: list[UUID]):
+    db.query(EntregaWebhook).filter(EntregaWebhook.id.in_(ids)).update(
+        {
+            EntregaWebhook.estado: EstadoEntregaWebhook.ENTREGADA,
+            EntregaWebhook.entregado_at: datetime.utcnow(),
+            EntregaWebhook.ultimo_error: None,
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+
+
+def reprogramar_entrega(
+    db: Session, entrega_id: UUID, intentos: int, proximo_intento_at: datetime | None, error: str
+):
+    """Registra un intento fallido. Sin `proximo_intento_at`, la entrega queda FALLIDA."""
+    campos = {
+        EntregaWebhook.intentos: intentos,
+        EntregaWebhook.ultimo_error: error[:500],
+    }
+    if proximo_intento_at is None:
+        campos[EntregaWebhook.estado] = EstadoEntregaWebhook.FALLIDA
+    else:
+        campos[EntregaWebhook.proximo_intento_at] = proximo_intento_at
+    db.query(EntregaWebhook).filter(EntregaWebhook.id == entrega_id).update(campos, synchronize_session=False)
@@ -1,4 +1,16 @@
-from .database import Base, SessionLocal, engine
+from fastapi import Request
+
+from .database import (
+    Base,
+    SessionLocal,
+    SessionLectura,
+    SessionWorkers,
+    engine,
+    engine_lectura,
+    engine_workers,
+    escritura_reciente,
+    marcar_escritura,
+)
 
 def get_db():
     """Dependencia para obtener la sesión de DB en FastAPI"""
@@ -8,5 +20,31 @@ def get_db():
     finally:
         db.close()
 
+def get_db_lectura(request: Request):
+    """
+    Sesión para endpoints de solo lectura: va a la réplica salvo que el
+    análisis de la ruta se haya escrito hace instantes (read-your-writes).
+    """
+    analisis_id = request.path_params.get("analisis_id")
+    if engine_lectura is engine or (analisis_id and escritura_reciente(analisis_id)):
+        db = SessionLocal()
+    else:
+        db = SessionLectura()
+    try:
+        yield db
+    finally:
+        db.close()
+
 # Al ponerlos aquí, puedes importar directamente desde 'app.db'
-__all__ = ["Base", "engine", "get_db"]
\ No newline at end of file
+__all__ = [
+    "Base",
+    "engine",
+    "engine_workers",
+    "engine_lectura",
+    "get_db",
+    "get_db_lectura",
+    "SessionLocal",
+    "SessionWorkers",
+    "SessionLectura",
+    "marcar_escritura",
+]
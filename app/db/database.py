@@ -1,10 +1,98 @@
+import json
 import os
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import settings
+from app.utils.cache import CacheLRU
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://admin:admin123@db:5432/ai_analisis_db")
+# Réplica de solo lectura opcional para los GET (polling de estado)
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL", "")
+
+class JSONPreserializado(str):
+    """Texto JSON ya codificado: las columnas JSON lo escriben tal cual."""
+
+
+def _json_serializer(valor) -> str:
+    if isinstance(valor, JSONPreserializado):
+        return valor
+    return json.dumps(valor)
+
+
+def _crear_engine(url: str, pool_size: int, max_overflow: int):
+    return create_engine(
+        url,
+        pool_pre_ping=True,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_recycle=settings.db_pool_recycle_segundos,
+        pool_timeout=settings.db_pool_timeout_segundos,
+        json_serializer=_json_serializer,
+    )
+
+
+# Pool de las requests de la API (y de los scripts)
+engine = _crear_engine(DATABASE_URL, settings.db_pool_size, settings.db_max_overflow)
+def _pool_workers() -> int:
+    """
+    Conexiones del pool de workers. Cada análisis en curso tiene dos a la vez
+    (su sesión y la del advisory lock) y el repartidor de webhooks una más.
+    El checkout es bloqueante: si faltaran, la espera frenaría el bucle del
+    ejecutor y con él a todos los análisis, así que un pool chico se rechaza
+    al arrancar en lugar de descubrirlo bajo carga.
+    """
+    necesarias = settings.max_analisis_concurrentes * 2 + 1
+    if settings.db_workers_pool_size is None:
+        return necesarias
+    if settings.db_workers_pool_size + settings.db_workers_max_overflow < necesarias:
+        raise RuntimeError(
+            f"DB_WORKERS_POOL_SIZE + DB_WORKERS_MAX_OVERFLOW = "
+            f"{settings.db_workers_pool_size + settings.db_workers_max_overflow} no alcanza para "
+            f"MAX_ANALISIS_CONCURRENTES={settings.max_analisis_concurrentes}: se necesitan al menos {necesarias}."
+        )
+    return settings.db_workers_pool_size
+
+
+# Pool propio de los workers de IA: un análisis lento no deja sin conexiones a la API
+engine_workers = _crear_engine(DATABASE_URL, _pool_workers(), settings.db_workers_max_overflow)
+# Sin réplica configurada, las lecturas usan la primaria
+engine_lectura = (
+    _crear_engine(DATABASE_REPLICA_URL, settings.db_pool_size, settings.db_max_overflow)
+    if DATABASE_REPLICA_URL else engine
+)
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
\ No newline at end of file
+SessionWorkers = sessionmaker(autocommit=False, autoflush=False, bind=engine_workers)
+SessionLectura = sessionmaker(autocommit=False, autoflush=False, bind=engine_lectura)
+Base = declarative_base()
+
+
+# ─── Read-your-writes ────────────────────────────────────────────────
+# Tras escribir un análisis, sus lecturas van a la primaria durante una
+# ventana que cubre el lag de replicación. El registro es por proceso:
+# alcanza porque los análisis corren en el proceso de la API que los
+# recibió, pero con varios procesos (uvicorn --workers, varias instancias
+# detrás de un balanceador) un GET que cae en otro proceso no ve la
+# escritura y puede leer de la réplica un estado atrasado. Ahí hay que
+# fijar cada cliente a un proceso en el balanceador o no configurar
+# DATABASE_REPLICA_URL.
+_escrituras_recientes = CacheLRU(10_000)
+
+def marcar_escritura(analisis_id) -> None:
+    _escrituras_recientes.set(str(analisis_id), time.monotonic() + settings.db_ventana_lectura_propia_segundos)
+
+def escritura_reciente(analisis_id) -> bool:
+    vence = _escrituras_recientes.get(str(analisis_id))
+    return vence is not None and vence > time.monotonic()
+
+@event.listens_for(Session, "after_flush")
+def _registrar_escrituras(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        analisis_id = getattr(obj, "analisis_id", None)
+        if analisis_id is None and getattr(obj, "__tablename__", None) == "analisis":
+            analisis_id = obj.id
+        if analisis_id is not None:
+            marcar_escritura(analisis_id)
@@ -1,5 +1,6 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
 
 # Importamos desde nuestra estructura modularizada
@@ -7,7 +8,29 @@ from app.config import settings
 from app.routers import api_router
 from app.db import engine
 from app.models import init_db
-from app.core.exceptions import AnalisisNotFoundError, IAProcessingError
+from app.core.respuestas import RespuestaJSONRapida
+from app.core.exceptions import (
+    AnalisisNotFoundError,
+    IAProcessingError,
+    AnalisisNoCancelableError,
+    IdempotenciaConflictoError,
+    IdempotenciaEnCursoError,
+    ServicioSaturadoError,
+    CuotaClienteExcedidaError,
+    ClaveApiInvalidaError,
+    PerfilNoEncontradoError,
+    InformeNoDisponibleError,
+    SnapshotNoDisponibleError,
+    RegistroInvalidoError,
+    WebhooksDeshabilitadosError,
+    WebhookUrlNoPermitidaError,
+)
+from app.crud import purgar_claves_vencidas
+from app.db import SessionLocal
+from app.services import ejecutor
+from app.services.proveedores import proveedores
+from app.services.webhooks import repartidor
+from app.services.informes import cerrar_pool
 
 # ═══════════════════════════════════════════════════════════════════
 # 1. INICIALIZACIÓN DE FASTAPI
@@ -15,7 +38,8 @@ from app.core.exceptions import AnalisisNotFoundError, IAProcessingError
 app = FastAPI(
     title=settings.app_name,
     version="1.0.0",
-    description="API para procesamiento de análisis de obras con Inteligencia Artificial."
+    description="API para procesamiento de análisis de obras con Inteligencia Artificial.",
+    default_response_class=RespuestaJSONRapida,
 )
 
 # ═══════════════════════════════════════════════════════════════════
@@ -29,8 +53,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Los informes narrativos pesan decenas de KB: se comprimen por encima del umbral
+app.add_middleware(GZipMiddleware, minimum_size=settings.compresion_minimo_bytes)
+
 # ═══════════════════════════════════════════════════════════════════
-# 3. EVENTOS DE CICLO DE VIDA (Startup)
+# 3. EVENTOS DE CICLO DE VIDA (Startup / Shutdown)
 # ═══════════════════════════════════════════════════════════════════
 @app.on_event("startup")
 def startup_event():
@@ -39,9 +66,35 @@ def startup_event():
     Ideal para inicializar la base de datos.
     """
     init_db(engine)
+
+    db = SessionLocal()
+    try:
+        purgadas = purgar_claves_vencidas(db)
+        if purgadas:
+            print(f"🧹 {purgadas} claves de idempotencia vencidas eliminadas.")
+    finally:
+        db.close()
+
+    # Entrega de webhooks pendientes (incluye los que quedaron de antes de un reinicio).
+    # Sin secreto no se envía nada sin firmar: las entregas esperan a que se configure
+    if settings.webhook_secreto:
+        ejecutor.iniciar_servicio(repartidor.correr())
+    else:
+        print("⚠️  WEBHOOK_SECRETO vacío: webhooks deshabilitados.")
+
     print(f"🚀 {settings.app_name} iniciado correctamente.")
     print(f"⚙️  Modo Debug: {settings.debug_mode}")
 
+async def _cerrar_clientes_http():
+    await proveedores.cerrar()
+    await repartidor.cerrar()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Interrumpe los análisis en vuelo (vuelven a PENDIENTE) y el repartidor, cierra los pools HTTP, detiene el ejecutor y el pool de render."""
+    ejecutor.detener(limpieza=_cerrar_clientes_http())
+    cerrar_pool()
+
 # ═══════════════════════════════════════════════════════════════════
 # 4. MANEJO GLOBAL DE EXCEPCIONES (Core)
 # ═══════════════════════════════════════════════════════════════════
@@ -59,6 +112,92 @@ async def ia_processing_error_handler(request: Request, exc: IAProcessingError):
         content={"error": "Internal Server Error", "mensaje": exc.detail},
     )
 
+@app.exception_handler(AnalisisNoCancelableError)
+async def analisis_no_cancelable_handler(request: Request, exc: AnalisisNoCancelableError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": "Conflict", "mensaje": exc.detail},
+    )
+
+@app.exception_handler(IdempotenciaEnCursoError)
+async def idempotencia_en_curso_handler(request: Request, exc: IdempotenciaEnCursoError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": "Conflict", "mensaje": exc.detail},
+    )
+
+@app.exception_handler(IdempotenciaConflictoError)
+async def idempotencia_conflicto_handler(request: Request, exc: IdempotenciaConflictoError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": "Unprocessable Entity", "mensaje": exc.detail},
+    )
+
+@app.exception_handler(ServicioSaturadoError)
+async def servicio_saturado_handler(request: Request, exc: ServicioSaturadoError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": "Service Unavailable", "mensaje": exc.detail},
+        headers=exc.headers,
+    )
+
+@app.exception_handler(CuotaClienteExcedidaError)
+async def cuota_cliente_handler(request: Request, exc: CuotaClienteExcedidaError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": "Too Many Requests", "mensaje": exc.detail},
+        headers=exc.headers,
+    )
+
+@app.exception_handler(ClaveApiInvalidaError)
+async def clave_api_invalida_handler(request: Request, exc: ClaveApiInvalidaError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": "Unauthorized", "mensaje": exc.detail},
+    )
+
+@app.exception_handler(PerfilNoEncontradoError)
+async def perfil_no_encontrado_handler(request: Request, exc: PerfilNoEncontradoError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": "Not Found", "mensaje": exc.detail},
+    )
+
+@app.exception_handler(InformeNoDisponibleError)
+async def informe_no_disponible_handler(request: Request, exc: InformeNoDisponibleError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": "Conflict", "mensaje": exc.detail},
+    )
+
+@app.exception_handler(SnapshotNoDisponibleError)
+async def snapshot_no_disponible_handler(request: Request, exc: SnapshotNoDisponibleError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": "Conflict", "mensaje": exc.detail},
+    )
+
+@app.exception_handler(RegistroInvalidoError)
+async def registro_invalido_handler(request: Request, exc: RegistroInvalidoError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": "Unprocessable Entity", "mensaje": exc.detail},
+    )
+
+@app.exception_handler(WebhooksDeshabilitadosError)
+async def webhooks_deshabilitados_handler(request: Request, exc: WebhooksDeshabilitadosError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": "Service Unavailable", "mensaje": exc.detail},
+    )
+
+@app.exception_handler(WebhookUrlNoPermitidaError)
+async def webhook_url_no_permitida_handler(request: Request, exc: WebhookUrlNoPermitidaError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": "Unprocessable Entity", "mensaje": exc.detail},
+    )
+
 # ═══════════════════════════════════════════════════════════════════
 # 5. REGISTRO DE RUTAS (Endpoints)
 # ═══════════════════════════════════════════════════════════════════
@@ -69,4 +208,4 @@ app.include_router(api_router, prefix="/api/v1")
 @app.get("/health", tags=["Sistema"])
 def health_check():
     """Endpoint básico para verificar que el servidor está vivo."""
-    return {"status": "ok", "app": settings.app_name}
\ No newline at end of file
+    return {"status": "ok", "app": settings.app_name, "carga": ejecutor.estadisticas()}
\ No newline at end of file
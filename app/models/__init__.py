@@ -1,17 +1,34 @@
+from sqlalchemy import text
+
 from app.db import Base, engine
 # Importar todos los modelos para que Base.metadata los registre
-from .enums import EstadoAnalisis, CategoriaObservacion, NivelObservacion
+from .enums import EstadoAnalisis, CategoriaObservacion, NivelObservacion, PrioridadAnalisis, EstadoEntregaWebhook
 from .analysis import Analisis
 from .snapshot import (
-    SnapshotRecibido, DatoProyecto, DatoEtapa, 
+    DDL_SNAPSHOT, SnapshotRecibido, DatoProyecto, DatoEtapa, 
     DatoAvance, DatoSeguridad, DatoValidacion
 )
 from .ai_process import InvocacionLLM, PromptGenerado, RespuestaLLM
-from .results import ResultadoAnalisis, ObservacionGenerada
+from .results import DDL_RESULTADOS, ResultadoAnalisis, ObservacionGenerada
+from .idempotencia import ClaveIdempotencia
+from .riesgos import TerminoRiesgo, resultados_riesgos
+from .webhooks import SuscripcionWebhook, EntregaWebhook
+from .informes import InformeGenerado
 
 # Helpers para inicialización
+# Columnas e índices agregados a tablas existentes; cada sentencia es idempotente
+DDL_INCREMENTAL = [*DDL_RESULTADOS, *DDL_SNAPSHOT]
+
+# Clave del advisory lock que serializa el DDL entre workers que arrancan juntos
+_LOCK_DDL = 0x52454E4F
+
 def init_db(engine):
     Base.metadata.create_all(bind=engine)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:clave)"), {"clave": _LOCK_DDL})
+            for sentencia in DDL_INCREMENTAL:
+                conn.execute(text(sentencia))
     print("✅ Base de datos inicializada: Tablas creadas.")
 
 def drop_all(engine):
@@ -33,9 +50,17 @@ __all__ = [
     "RespuestaLLM",
     "ResultadoAnalisis",
     "ObservacionGenerada",
+    "ClaveIdempotencia",
+    "TerminoRiesgo",
+    "resultados_riesgos",
+    "SuscripcionWebhook",
+    "EntregaWebhook",
+    "InformeGenerado",
     "EstadoAnalisis",
     "CategoriaObservacion",
     "NivelObservacion",
+    "PrioridadAnalisis",
+    "EstadoEntregaWebhook",
     "init_db",
     "drop_all"
 ]
\ No newline at end of file
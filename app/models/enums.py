@@ -17,4 +17,14 @@ class CategoriaObservacion(str, enum.Enum):
 class NivelObservacion(str, enum.Enum):
     INFORMATIVO = "INFORMATIVO"
     ATENCION = "ATENCION"
-    CRITICO = "CRITICO"
\ No newline at end of file
+    CRITICO = "CRITICO"
+
+class PrioridadAnalisis(str, enum.Enum):
+    INTERACTIVA = "INTERACTIVA"
+    NORMAL = "NORMAL"
+    LOTE = "LOTE"
+
+class EstadoEntregaWebhook(str, enum.Enum):
+    PENDIENTE = "PENDIENTE"
+    ENTREGADA = "ENTREGADA"
+    FALLIDA = "FALLIDA"
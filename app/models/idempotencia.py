@@ -0,0 +1,22 @@
+from sqlalchemy import Column, String, DateTime, Integer, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID, JSON
+from datetime import datetime
+import uuid
+from app.db import Base
+
+class ClaveIdempotencia(Base):
+    __tablename__ = "claves_idempotencia"
+    __table_args__ = (
+        UniqueConstraint('clave', 'endpoint', name='uq_claves_idempotencia_clave_endpoint'),
+        Index('ix_claves_idempotencia_expira_at', 'expira_at'),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    clave = Column(String(255), nullable=False)
+    endpoint = Column(String(200), nullable=False)
+    huella_solicitud = Column(String(64), nullable=False)
+    # NULL mientras la primera ejecución sigue en curso
+    status_code = Column(Integer, nullable=True)
+    respuesta = Column(JSON, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expira_at = Column(DateTime, nullable=False)
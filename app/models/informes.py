@@ -0,0 +1,21 @@
+from sqlalchemy import Column, String, DateTime, LargeBinary, ForeignKey, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+import uuid
+from app.db import Base
+
+class InformeGenerado(Base):
+    """Documento del informe ya renderizado, por resultado y versión de plantilla."""
+    __tablename__ = "informes_generados"
+    __table_args__ = (
+        UniqueConstraint('resultado_id', 'version_plantilla', 'formato', name='uq_informes_generados_resultado_version'),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Reprocesar crea un resultado nuevo: el informe viejo cae por cascada
+    resultado_id = Column(UUID(as_uuid=True), ForeignKey("resultados_analisis.id", ondelete="CASCADE"), nullable=False)
+    version_plantilla = Column(String(32), nullable=False)
+    formato = Column(String(10), nullable=False, default="html")
+    contenido = Column(LargeBinary, nullable=False)
+    etag = Column(String(64), nullable=False)
+    generado_at = Column(DateTime, nullable=False, default=datetime.utcnow)
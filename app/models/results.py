@@ -1,13 +1,34 @@
-from sqlalchemy import Column, String, DateTime, Integer, Numeric, Boolean, Text, ForeignKey, Index, Enum as SQLEnum
-from sqlalchemy.dialects.postgresql import UUID, ARRAY
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Computed, String, DateTime, Integer, Numeric, Boolean, Text, ForeignKey, Index, Enum as SQLEnum
+from sqlalchemy.dialects.postgresql import UUID, ARRAY, TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 from datetime import datetime
 import uuid
 from app.db import Base
 from app.models.enums import CategoriaObservacion, NivelObservacion
 
+# El resumen pesa más que los apartados en el ranking de la búsqueda
+_DOCUMENTO_BUSQUEDA = (
+    "setweight(to_tsvector('spanish', coalesce(resumen_general, '')), 'A') || "
+    "setweight(to_tsvector('spanish', coalesce(estado_ejecucion, '') || ' ' || "
+    "coalesce(estado_planificacion, '') || ' ' || coalesce(estado_seguridad, '') || ' ' || "
+    "coalesce(estado_validaciones, '')), 'B')"
+)
+
+# create_all no agrega columnas ni índices a una tabla que ya existe: init_db
+# corre esto en cada arranque para llevar las bases desplegadas al modelo actual
+DDL_RESULTADOS = [
+    "ALTER TABLE resultados_analisis ADD COLUMN IF NOT EXISTS busqueda tsvector "
+    f"GENERATED ALWAYS AS ({_DOCUMENTO_BUSQUEDA}) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_resultados_analisis_busqueda ON resultados_analisis USING gin (busqueda)",
+    "CREATE INDEX IF NOT EXISTS ix_resultados_analisis_riesgos ON resultados_analisis USING gin (riesgos_identificados)",
+]
+
 class ResultadoAnalisis(Base):
     __tablename__ = "resultados_analisis"
+    __table_args__ = (
+        Index('ix_resultados_analisis_busqueda', 'busqueda', postgresql_using='gin'),
+        Index('ix_resultados_analisis_riesgos', 'riesgos_identificados', postgresql_using='gin'),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     analisis_id = Column(UUID(as_uuid=True), ForeignKey("analisis.id", ondelete="CASCADE"), nullable=False, unique=True)
     resumen_general = Column(Text, nullable=False)
@@ -18,8 +39,12 @@ class ResultadoAnalisis(Base):
     score_coherencia = Column(Numeric(5, 2), nullable=True)
     riesgos_identificados = Column(ARRAY(String), nullable=True)
     generado_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # Documento de texto completo (configuración spanish), lo mantiene PostgreSQL
+    # (diferida: solo la usan los filtros de búsqueda, no hace falta traerla)
+    busqueda = deferred(Column(TSVECTOR, Computed(_DOCUMENTO_BUSQUEDA, persisted=True)))
 
     analisis = relationship("Analisis", back_populates="resultado")
+    terminos_riesgo = relationship("TerminoRiesgo", secondary="resultados_riesgos", back_populates="resultados")
     observaciones = relationship("ObservacionGenerada", back_populates="resultado", cascade="all, delete-orphan", order_by="ObservacionGenerada.orden")
 
 class ObservacionGenerada(Base):
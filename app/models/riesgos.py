@@ -0,0 +1,25 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey, Table
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+from datetime import datetime
+import uuid
+from app.db import Base
+
+# Qué términos normalizados menciona cada resultado
+resultados_riesgos = Table(
+    "resultados_riesgos",
+    Base.metadata,
+    Column("resultado_id", UUID(as_uuid=True), ForeignKey("resultados_analisis.id", ondelete="CASCADE"), primary_key=True),
+    Column("termino_id", UUID(as_uuid=True), ForeignKey("terminos_riesgo.id", ondelete="CASCADE"), primary_key=True, index=True),
+)
+
+class TerminoRiesgo(Base):
+    """Taxonomía de riesgos: un registro por término normalizado."""
+    __tablename__ = "terminos_riesgo"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    termino_normalizado = Column(String(300), nullable=False, unique=True)
+    # Primera redacción vista, para mostrar
+    texto = Column(String(300), nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    resultados = relationship("ResultadoAnalisis", secondary=resultados_riesgos, back_populates="terminos_riesgo")
@@ -1,16 +1,33 @@
-from sqlalchemy import Column, String, Date, DateTime, Integer, Numeric, Boolean, Text, ForeignKey, Index
+from sqlalchemy import Column, String, Date, DateTime, Integer, Numeric, Boolean, Text, ForeignKey, Index, text
 from sqlalchemy.dialects.postgresql import UUID, JSON, ARRAY
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
 from app.db import Base
 
+_TABLAS_POR_PARTES = ("datos_etapas", "datos_avances", "datos_seguridad", "datos_validaciones")
+
+# Para bases creadas antes de `huella_sha256` y `orden` (ver init_db). Las
+# filas viejas quedan con orden 0 y desempatan por id, como antes
+DDL_SNAPSHOT = [
+    "ALTER TABLE snapshots_recibidos ADD COLUMN IF NOT EXISTS huella_sha256 varchar(64)",
+] + [
+    sentencia
+    for tabla in _TABLAS_POR_PARTES
+    for sentencia in (
+        f"ALTER TABLE {tabla} ADD COLUMN IF NOT EXISTS orden integer NOT NULL DEFAULT 0",
+        f"CREATE INDEX IF NOT EXISTS ix_{tabla}_snapshot_carga ON {tabla} (snapshot_id, orden)",
+    )
+]
+
 class SnapshotRecibido(Base):
     __tablename__ = "snapshots_recibidos"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     analisis_id = Column(UUID(as_uuid=True), ForeignKey("analisis.id", ondelete="CASCADE"), nullable=False, unique=True)
     payload_completo = Column(JSON, nullable=False)
     hash_payload = Column(Integer, nullable=False, index=True)
+    # sha256 de los bytes canónicos: confirma coincidencias del hash de 32 bits
+    huella_sha256 = Column(String(64), nullable=True)
     recibido_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
     analisis = relationship("Analisis", back_populates="snapshot")
@@ -36,9 +53,14 @@ class DatoProyecto(Base):
 
 class DatoEtapa(Base):
     __tablename__ = "datos_etapas"
-    __table_args__ = (Index('ix_datos_etapas_snapshot_orden', 'snapshot_id', 'etapa_orden'),)
+    __table_args__ = (
+        Index('ix_datos_etapas_snapshot_orden', 'snapshot_id', 'etapa_orden'),
+        Index('ix_datos_etapas_snapshot_carga', 'snapshot_id', 'orden'),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     snapshot_id = Column(UUID(as_uuid=True), ForeignKey("snapshots_recibidos.id", ondelete="CASCADE"), nullable=False)
+    # Posición de carga dentro de la sección: el volcado respeta el orden en que llegó
+    orden = Column(Integer, nullable=False, server_default=text("0"))
     etapa_nombre = Column(String(100), nullable=False)
     etapa_orden = Column(Integer, nullable=False)
     fecha_inicio_estimada = Column(Date, nullable=True)
@@ -48,8 +70,11 @@ class DatoEtapa(Base):
 
 class DatoAvance(Base):
     __tablename__ = "datos_avances"
+    __table_args__ = (Index('ix_datos_avances_snapshot_carga', 'snapshot_id', 'orden'),)
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     snapshot_id = Column(UUID(as_uuid=True), ForeignKey("snapshots_recibidos.id", ondelete="CASCADE"), nullable=False)
+    # Posición de carga dentro de la sección: el volcado respeta el orden en que llegó
+    orden = Column(Integer, nullable=False, server_default=text("0"))
     fecha_registro = Column(Date, nullable=False)
     etapa_nombre = Column(String(100), nullable=False)
     porcentaje_avance = Column(Numeric(5, 2), nullable=False)
@@ -59,8 +84,11 @@ class DatoAvance(Base):
 
 class DatoSeguridad(Base):
     __tablename__ = "datos_seguridad"
+    __table_args__ = (Index('ix_datos_seguridad_snapshot_carga', 'snapshot_id', 'orden'),)
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     snapshot_id = Column(UUID(as_uuid=True), ForeignKey("snapshots_recibidos.id", ondelete="CASCADE"), nullable=False)
+    # Posición de carga dentro de la sección: el volcado respeta el orden en que llegó
+    orden = Column(Integer, nullable=False, server_default=text("0"))
     fecha_registro = Column(Date, nullable=False)
     medidas_implementadas = Column(ARRAY(String), nullable=False)
     cobertura_art_declarada = Column(Boolean, nullable=False)
@@ -68,8 +96,11 @@ class DatoSeguridad(Base):
 
 class DatoValidacion(Base):
     __tablename__ = "datos_validaciones"
+    __table_args__ = (Index('ix_datos_validaciones_snapshot_carga', 'snapshot_id', 'orden'),)
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     snapshot_id = Column(UUID(as_uuid=True), ForeignKey("snapshots_recibidos.id", ondelete="CASCADE"), nullable=False)
+    # Posición de carga dentro de la sección: el volcado respeta el orden en que llegó
+    orden = Column(Integer, nullable=False, server_default=text("0"))
     fecha_validacion = Column(Date, nullable=False)
     estado_validacion = Column(String(50), nullable=False)
     responsable_tecnico = Column(String(200), nullable=False)
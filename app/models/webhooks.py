@@ -0,0 +1,39 @@
+from sqlalchemy import Column, String, DateTime, Integer, ForeignKey, Index, UniqueConstraint, Enum as SQLEnum
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+import uuid
+from app.db import Base
+from app.models.enums import EstadoAnalisis, EstadoEntregaWebhook
+
+class SuscripcionWebhook(Base):
+    """URL a notificar cuando el análisis llega a un estado final."""
+    __tablename__ = "suscripciones_webhook"
+    __table_args__ = (
+        UniqueConstraint('analisis_id', 'url', name='uq_suscripciones_webhook_analisis_url'),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    analisis_id = Column(UUID(as_uuid=True), ForeignKey("analisis.id", ondelete="CASCADE"), nullable=False, index=True)
+    url = Column(String(2000), nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class EntregaWebhook(Base):
+    """
+    Cola persistida de notificaciones (outbox): se escribe en la misma
+    transacción que el cambio de estado, así un reinicio no pierde eventos.
+    """
+    __tablename__ = "entregas_webhook"
+    __table_args__ = (
+        Index('ix_entregas_webhook_pendientes', 'estado', 'proximo_intento_at'),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    analisis_id = Column(UUID(as_uuid=True), ForeignKey("analisis.id", ondelete="CASCADE"), nullable=False)
+    url = Column(String(2000), nullable=False)
+    evento = Column(SQLEnum(EstadoAnalisis, native_enum=False), nullable=False)
+    estado = Column(SQLEnum(EstadoEntregaWebhook, native_enum=False), nullable=False, default=EstadoEntregaWebhook.PENDIENTE)
+    intentos = Column(Integer, nullable=False, default=0)
+    proximo_intento_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    ultimo_error = Column(String(500), nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    entregado_at = Column(DateTime, nullable=True)
@@ -1,8 +1,14 @@
 from fastapi import APIRouter
 from .analisis import router as analisis_router
+from .sistema import router as sistema_router
+from .busqueda import router as busqueda_router
+from .webhooks import router as webhooks_router
 
 # Router principal que agrupa todos los sub-routers
 api_router = APIRouter()
 api_router.include_router(analisis_router)
+api_router.include_router(sistema_router)
+api_router.include_router(busqueda_router)
+api_router.include_router(webhooks_router)
 
-__all__ = ["api_router"]
\ No newline at end of file
+__all__ = ["api_router"]
@@ -1,58 +1,265 @@
-from fastapi import APIRouter, Depends, BackgroundTasks, status
+from fastapi import APIRouter, Depends, Header, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from datetime import date
+from typing import Literal, Optional
 from uuid import UUID
 
-from app.db import get_db, SessionLocal
+from app.config import settings
+from app.db import get_db, get_db_lectura
 from app.schemas.analisis import AnalisisCreate, AnalisisOut
-from app.schemas.snapshot import SnapshotInput
-from app.services import analisis_service
-from app.core.exceptions import AnalisisNotFoundError
-from app.crud import crud_analisis
+from app.schemas.enums import EstadoAnalisis, PrioridadAnalisis
+from app.schemas.snapshot import SnapshotInput, SnapshotCanonico, DatoProyectoBase
+from app.services import analisis_service, ejecutor, ingesta_service
+from app.services.exportacion_service import exportar_analisis
+from app.services.informes import obtener_informe
+from app.services.idempotencia_service import huella_solicitud, responder_idempotente
+from app.services.presupuesto import Presupuesto
+from app.core.exceptions import AnalisisNotFoundError, ClaveApiInvalidaError, SnapshotNoDisponibleError
+from app.crud import crud_analisis, crud_snapshot
 
 router = APIRouter(prefix="/analisis", tags=["Análisis de IA"])
 
+async def leer_cuerpo(request: Request) -> bytes:
+    """Cuerpo crudo ya leído por FastAPI para validar el body (queda cacheado en la request)."""
+    return await request.body()
+
+def identificar_cliente(
+    request: Request,
+    api_key: Optional[str] = Header(None, alias="X-Api-Key", max_length=200),
+) -> str:
+    """Cliente para cuotas y scheduling: el registrado para X-Api-Key o, sin clave, la IP de origen."""
+    if api_key:
+        cliente = settings.claves_clientes.get(api_key)
+        if cliente is None:
+            raise ClaveApiInvalidaError()
+        return cliente
+    return request.client.host if request.client else "anonimo"
+
 @router.post("/", response_model=AnalisisOut, status_code=status.HTTP_201_CREATED)
 def crear_solicitud_analisis(
     solicitud: AnalisisCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     db: Session = Depends(get_db)
 ):
     """Crea una nueva solicitud de análisis en estado PENDIENTE."""
-    analisis_id = analisis_service.iniciar_nuevo_analisis(db, solicitud)
-    return crud_analisis.get_analisis(db, analisis_id)
+    def crear():
+        analisis_id = analisis_service.iniciar_nuevo_analisis(db, solicitud)
+        return AnalisisOut.model_validate(crud_analisis.get_analisis(db, analisis_id))
+
+    return responder_idempotente(
+        db,
+        idempotency_key,
+        "POST /analisis/",
+        huella_solicitud(solicitud.model_dump_json()),
+        status.HTTP_201_CREATED,
+        crear,
+    )
+
+# Declarado antes de /{analisis_id} para que "export" no se tome como un id
+@router.get("/export")
+def exportar(
+    formato: Literal["ndjson", "csv"] = Query("ndjson"),
+    proyecto_codigo: Optional[str] = Query(None, max_length=50),
+    desde: Optional[date] = Query(None, description="Análisis cuyo período termina en o después de esta fecha."),
+    hasta: Optional[date] = Query(None, description="Análisis cuyo período empieza en o antes de esta fecha."),
+    estado: Optional[EstadoAnalisis] = Query(None),
+):
+    """
+    Export masivo de análisis con resultados, riesgos y observaciones para BI.
+    Se transmite por streaming con cursor del lado del servidor: la memoria
+    no depende de la cantidad de filas.
+    """
+    media_type = "text/csv; charset=utf-8" if formato == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        exportar_analisis(formato, proyecto_codigo, desde, hasta, estado),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="analisis.{formato}"'},
+    )
+
+def _encolar_procesamiento(
+    db: Session,
+    analisis_id: UUID,
+    snapshot: Optional[SnapshotCanonico],
+    presupuesto: Presupuesto,
+    perfilar: bool,
+    cliente: str,
+    prioridad: PrioridadAnalisis,
+) -> dict:
+    analisis = crud_analisis.get_analisis(db, analisis_id)
+    if not analisis:
+        raise AnalisisNotFoundError(str(analisis_id))
+
+    # ✅ La tarea corre en el ejecutor y gestiona su propia sesión
+    # Control de admisión: puede responder 503 / 429 con Retry-After
+    lanzado = ejecutor.enviar(
+        analisis_id,
+        analisis_service.ejecutar_procesamiento(
+            analisis_id, snapshot, presupuesto,
+            # El perfil queda en GET /sistema/perfiles/{analisis_id}
+            perfilar=perfilar and settings.perfilado_por_header,
+        ),
+        cliente=cliente,
+        prioridad=prioridad,
+        proyecto=analisis.proyecto_codigo,
+    )
+    if not lanzado:
+        return {"mensaje": "El análisis ya se está procesando", "analisis_id": analisis_id}
+
+    # Un análisis más nuevo del mismo proyecto y período deja obsoletos a los anteriores
+    analisis_service.cancelar_analisis_superados(db, analisis)
+
+    return {"mensaje": "Procesamiento de IA iniciado en segundo plano", "analisis_id": analisis_id}
 
 @router.post("/{analisis_id}/procesar", status_code=status.HTTP_202_ACCEPTED)
 def procesar_datos(
     analisis_id: UUID,
     snapshot: SnapshotInput,
-    background_tasks: BackgroundTasks,
+    deadline_segundos: Optional[float] = Query(
+        None, gt=0, le=settings.analisis_deadline_max_segundos,
+        description="Tiempo máximo del análisis; por defecto ANALISIS_DEADLINE_SEGUNDOS."
+    ),
+    prioridad: PrioridadAnalisis = Query(
+        PrioridadAnalisis.NORMAL,
+        description=(
+            "INTERACTIVA recibe la mayor parte de los turnos (con tope por cliente); "
+            "LOTE solo usa parte de la cola y conserva una parte mínima de los turnos."
+        )
+    ),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    perfilar: bool = Header(False, alias="X-Perfilar"),
+    cliente: str = Depends(identificar_cliente),
+    cuerpo: bytes = Depends(leer_cuerpo),
     db: Session = Depends(get_db)
 ):
-    analisis = crud_analisis.get_analisis(db, analisis_id)
-    if not analisis:
-        raise AnalisisNotFoundError(str(analisis_id))
+    # El presupuesto corre desde que se acepta la solicitud
+    presupuesto = Presupuesto(deadline_segundos or settings.analisis_deadline_segundos)
+
+    def encolar():
+        return _encolar_procesamiento(
+            db, analisis_id, SnapshotCanonico(snapshot), presupuesto, perfilar, cliente, prioridad
+        )
+
+    # La huella sale del cuerpo crudo: no hace falta volver a serializar el snapshot
+    huella = (
+        huella_solicitud(cuerpo + f"|deadline={deadline_segundos}|prioridad={prioridad.value}".encode("utf-8"))
+        if idempotency_key else ""
+    )
+    return responder_idempotente(
+        db,
+        idempotency_key,
+        f"POST /analisis/{analisis_id}/procesar",
+        huella,
+        status.HTTP_202_ACCEPTED,
+        encolar,
+    )
 
-    # ✅ El background task crea y gestiona su propia sesión
-    def tarea():
-        db_bg = SessionLocal()
-        try:
-            import asyncio
-            asyncio.run(
-                analisis_service.procesar_snapshot_con_ia(db_bg, analisis_id, snapshot)
+# ─── Ingesta por partes: para snapshots que no entran en un solo body ───
+
+@router.put("/{analisis_id}/snapshot/proyecto", status_code=status.HTTP_201_CREATED)
+def iniciar_snapshot(
+    analisis_id: UUID,
+    proyecto: DatoProyectoBase,
+    db: Session = Depends(get_db)
+):
+    """Inicia (o reinicia, descartando lo cargado) el snapshot por partes del análisis."""
+    snapshot_id = ingesta_service.iniciar_snapshot(db, analisis_id, proyecto)
+    return {"mensaje": "Snapshot iniciado", "analisis_id": analisis_id, "snapshot_id": snapshot_id}
+
+@router.post("/{analisis_id}/snapshot/{seccion}")
+async def agregar_registros_snapshot(
+    analisis_id: UUID,
+    seccion: Literal["etapas", "avances", "seguridad", "validaciones"],
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    db: Session = Depends(get_db)
+):
+    """
+    Agrega registros a una sección del snapshot. Cuerpo NDJSON (un registro
+    por línea, application/x-ndjson); se lee y se inserta a medida que llega,
+    así que puede enviarse en varios requests de cualquier tamaño. Cada envío
+    suma registros: para reintentarlo sin duplicarlos hay que mandar una
+    Idempotency-Key por envío.
+    """
+    return await ingesta_service.ingerir_seccion_idempotente(
+        db, idempotency_key, analisis_id, seccion, request.stream()
+    )
+
+@router.post("/{analisis_id}/procesar-almacenado", status_code=status.HTTP_202_ACCEPTED)
+def procesar_snapshot_almacenado(
+    analisis_id: UUID,
+    deadline_segundos: Optional[float] = Query(
+        None, gt=0, le=settings.analisis_deadline_max_segundos,
+        description="Tiempo máximo del análisis; por defecto ANALISIS_DEADLINE_SEGUNDOS."
+    ),
+    prioridad: PrioridadAnalisis = Query(PrioridadAnalisis.NORMAL),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    perfilar: bool = Header(False, alias="X-Perfilar"),
+    cliente: str = Depends(identificar_cliente),
+    db: Session = Depends(get_db)
+):
+    """
+    Procesa el snapshot cargado por partes. El request no lleva datos: el
+    job lo arma desde las tablas Dato* cuando le toca el turno.
+    """
+    presupuesto = Presupuesto(deadline_segundos or settings.analisis_deadline_segundos)
+
+    def encolar():
+        if crud_snapshot.get_snapshot_por_partes_id(db, analisis_id) is None:
+            raise SnapshotNoDisponibleError(
+                str(analisis_id), "no hay snapshot cargado por partes; iniciarlo con PUT /snapshot/proyecto."
             )
-        finally:
-            db_bg.close()
+        return _encolar_procesamiento(db, analisis_id, None, presupuesto, perfilar, cliente, prioridad)
 
-    background_tasks.add_task(tarea)
+    huella = (
+        huella_solicitud(f"almacenado|deadline={deadline_segundos}|prioridad={prioridad.value}")
+        if idempotency_key else ""
+    )
+    return responder_idempotente(
+        db,
+        idempotency_key,
+        f"POST /analisis/{analisis_id}/procesar-almacenado",
+        huella,
+        status.HTTP_202_ACCEPTED,
+        encolar,
+    )
 
-    return {"mensaje": "Procesamiento de IA iniciado en segundo plano", "analisis_id": analisis_id}
+@router.post("/{analisis_id}/cancelar")
+def cancelar_procesamiento(
+    analisis_id: UUID,
+    db: Session = Depends(get_db)
+):
+    """Cancela un análisis PENDIENTE o PROCESANDO y aborta su tarea en curso."""
+    analisis_service.cancelar_analisis(db, analisis_id)
+    return {"mensaje": "Análisis cancelado", "analisis_id": analisis_id}
+
+@router.get("/{analisis_id}/informe", response_class=Response)
+async def obtener_informe_html(
+    analisis_id: UUID,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    db: Session = Depends(get_db)
+):
+    """
+    Informe HTML pre-renderizado del análisis COMPLETADO. Con If-None-Match
+    y el ETag vigente responde 304 sin cuerpo.
+    """
+    etag, contenido = await obtener_informe(db, analisis_id)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match:
+        etiquetas = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        if "*" in etiquetas or etag in etiquetas:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=contenido, media_type="text/html; charset=utf-8", headers=headers)
 
 @router.get("/{analisis_id}", response_model=AnalisisOut)
 def obtener_analisis(
     analisis_id: UUID,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_lectura)
 ):
     """Consulta el estado y los resultados de un análisis."""
     analisis = crud_analisis.get_analisis(db, analisis_id)
     if not analisis:
         raise AnalisisNotFoundError(str(analisis_id))
-    return analisis
\ No newline at end of file
+    return Response(
+        content=analisis_service.serializar_analisis(analisis), media_type="application/json"
+    )
\ No newline at end of file
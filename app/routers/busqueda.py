@@ -0,0 +1,36 @@
+from datetime import date
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.crud import buscar_resultados, frecuencia_riesgos
+from app.db import get_db_lectura
+from app.schemas.busqueda import FrecuenciaRiesgoOut, ResultadoBusquedaOut
+
+router = APIRouter(prefix="/resultados", tags=["Búsqueda de resultados"])
+
+@router.get("/buscar", response_model=List[ResultadoBusquedaOut])
+def buscar(
+    q: Optional[str] = Query(None, min_length=2, max_length=200, description='Texto libre: "falta de EPP" humedad -filtración'),
+    riesgo: Optional[str] = Query(None, max_length=300, description="Término de riesgo (se normaliza: tildes y mayúsculas no importan)."),
+    proyecto_codigo: Optional[str] = Query(None, max_length=50),
+    desde: Optional[date] = Query(None),
+    hasta: Optional[date] = Query(None),
+    limite: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db_lectura)
+):
+    """Busca en los informes generados (índice GIN de texto completo en español) y/o por riesgo."""
+    return buscar_resultados(db, q, riesgo, proyecto_codigo, desde, hasta, limite, offset)
+
+@router.get("/riesgos/frecuencia", response_model=List[FrecuenciaRiesgoOut])
+def riesgos_frecuentes(
+    proyecto_codigo: Optional[str] = Query(None, max_length=50),
+    desde: Optional[date] = Query(None),
+    hasta: Optional[date] = Query(None),
+    limite: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db_lectura)
+):
+    """Ranking de riesgos: en cuántos análisis y proyectos aparece cada término."""
+    return frecuencia_riesgos(db, proyecto_codigo, desde, hasta, limite)
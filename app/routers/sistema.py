@@ -0,0 +1,30 @@
+from uuid import UUID
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.exceptions import PerfilNoEncontradoError
+from app.services import ejecutor
+from app.services.perfilador import leer_perfil
+
+router = APIRouter(prefix="/sistema", tags=["Sistema"])
+
+@router.get("/planificador")
+def estadisticas_planificador():
+    """Carga del ejecutor y tiempos de espera en cola por cliente (tenant)."""
+    return {
+        "ejecutor": ejecutor.estadisticas(),
+        "planificador": ejecutor.planificador.estadisticas(),
+    }
+
+@router.get("/perfiles/{analisis_id}", response_class=PlainTextResponse)
+def obtener_perfil(analisis_id: UUID):
+    """
+    Pilas colapsadas del profiler por muestreo de un análisis (se piden con
+    el header X-Perfilar al procesar, si PERFILADO_POR_HEADER está
+    habilitado). Se visualizan con flamegraph.pl o speedscope.app.
+    """
+    perfil = leer_perfil(str(analisis_id))
+    if perfil is None:
+        raise PerfilNoEncontradoError(str(analisis_id))
+    return PlainTextResponse(perfil)
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.orm import Session
+
+from app.core.exceptions import AnalisisNotFoundError
+from app.crud import crear_suscripciones
+from app.db import get_db
+from app.schemas.analisis import SuscripcionWebhookCreate
+from app.services.webhooks import validar_callback
+
+router = APIRouter(prefix="/webhooks", tags=["Webhooks"])
+
+@router.post("/", status_code=status.HTTP_201_CREATED)
+def suscribir_webhook(
+    suscripcion: SuscripcionWebhookCreate,
+    db: Session = Depends(get_db)
+):
+    """
+    Registra una URL que recibe un POST (firmado, en lotes por URL) cuando
+    cada análisis llega a COMPLETADO, ERROR o CANCELADO. Los que ya
+    terminaron se notifican enseguida. Requiere WEBHOOK_SECRETO y una URL
+    pública (o en WEBHOOK_HOSTS_PERMITIDOS).
+    """
+    validar_callback(str(suscripcion.url))
+    suscriptos = crear_suscripciones(db, str(suscripcion.url), suscripcion.analisis_ids)
+    if not suscriptos:
+        raise AnalisisNotFoundError(", ".join(str(i) for i in suscripcion.analisis_ids[:5]))
+    return {"mensaje": "Webhook registrado", "analisis_suscriptos": suscriptos}
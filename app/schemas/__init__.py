@@ -1,15 +1,23 @@
-from .analisis import AnalisisCreate, AnalisisOut
-from .snapshot import SnapshotInput
+from .analisis import AnalisisCreate, AnalisisOut, SuscripcionWebhookCreate
+from .snapshot import SnapshotInput, SnapshotCanonico, DatoSeguridadBase, DatoValidacionBase
 from .results import ResultadoAnalisisOut, ObservacionOut
-from .enums import EstadoAnalisis, CategoriaObservacion, NivelObservacion
+from .busqueda import ResultadoBusquedaOut, FrecuenciaRiesgoOut
+from .enums import EstadoAnalisis, CategoriaObservacion, NivelObservacion, PrioridadAnalisis
 
 __all__ = [
     "AnalisisCreate",
     "AnalisisOut",
+    "SuscripcionWebhookCreate",
     "SnapshotInput",
+    "SnapshotCanonico",
+    "DatoSeguridadBase",
+    "DatoValidacionBase",
     "ResultadoAnalisisOut",
     "ObservacionOut",
+    "ResultadoBusquedaOut",
+    "FrecuenciaRiesgoOut",
     "EstadoAnalisis",
     "CategoriaObservacion",
-    "NivelObservacion"
+    "NivelObservacion",
+    "PrioridadAnalisis"
 ]
\ No newline at end of file
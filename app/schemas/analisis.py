@@ -1,7 +1,7 @@
-from pydantic import BaseModel, Field
+from pydantic import AnyHttpUrl, BaseModel, Field
 from uuid import UUID
 from datetime import datetime, date
-from typing import Optional
+from typing import List, Optional
 from .enums import EstadoAnalisis
 from .results import ResultadoAnalisisOut
 
@@ -12,7 +12,8 @@ class AnalisisBase(BaseModel):
 
 class AnalisisCreate(AnalisisBase):
     """Cuerpo de la petición para crear un nuevo análisis"""
-    pass
+    # Se le hace POST al terminar (COMPLETADO / ERROR / CANCELADO)
+    callback_url: Optional[AnyHttpUrl] = None
 
 class AnalisisOut(AnalisisBase):
     """Respuesta estándar de un análisis"""
@@ -26,4 +27,9 @@ class AnalisisOut(AnalisisBase):
     resultado: Optional[ResultadoAnalisisOut] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class SuscripcionWebhookCreate(BaseModel):
+    """Registra una URL de callback para uno o varios análisis (un lote)"""
+    url: AnyHttpUrl
+    analisis_ids: List[UUID] = Field(..., min_length=1, max_length=1000)
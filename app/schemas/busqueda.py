@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+from uuid import UUID
+from datetime import datetime, date
+from typing import List, Optional
+
+class ResultadoBusquedaOut(BaseModel):
+    """Un resultado de la búsqueda de texto completo / por riesgo"""
+    analisis_id: UUID
+    proyecto_codigo: str
+    periodo_desde: date
+    periodo_hasta: date
+    score_coherencia: Optional[float] = None
+    riesgos_identificados: List[str] = []
+    generado_at: datetime
+    # Solo con búsqueda de texto
+    rango: Optional[float] = None
+    fragmento: Optional[str] = None
+
+class FrecuenciaRiesgoOut(BaseModel):
+    """Cuántos análisis y proyectos mencionan un término de riesgo"""
+    termino: str
+    termino_normalizado: str
+    analisis: int
+    proyectos: int
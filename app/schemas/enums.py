@@ -1,4 +1,4 @@
-from app.models.enums import EstadoAnalisis, CategoriaObservacion, NivelObservacion
+from app.models.enums import EstadoAnalisis, CategoriaObservacion, NivelObservacion, PrioridadAnalisis
 
 # Los exportamos para que los schemas los importen desde aquí
-__all__ = ["EstadoAnalisis", "CategoriaObservacion", "NivelObservacion"]
\ No newline at end of file
+__all__ = ["EstadoAnalisis", "CategoriaObservacion", "NivelObservacion", "PrioridadAnalisis"]
\ No newline at end of file
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
 from typing import List, Optional, Any
 from .enums import CategoriaObservacion, NivelObservacion
@@ -26,5 +26,11 @@ class ResultadoAnalisisOut(BaseModel):
     observaciones: List[ObservacionOut]
     generado_at: datetime
 
+    @field_validator("riesgos_identificados", mode="before")
+    @classmethod
+    def _riesgos_nulos(cls, valor):
+        # Columna nullable: resultados viejos pueden tener NULL en lugar de lista vacía
+        return [] if valor is None else valor
+
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -1,6 +1,8 @@
 from pydantic import BaseModel, Field
 from datetime import date
+from functools import cached_property
 from typing import List, Optional, Any
+from app.utils.hashing import serializar_canonico, generar_hash_bytes, generar_huella_bytes
 
 class DatoProyectoBase(BaseModel):
     proyecto_nombre: str = Field(..., example="Edificio RENO I")
@@ -25,6 +27,16 @@ class DatoAvanceBase(BaseModel):
     tareas_principales: List[str]
     oficios_activos: List[str]
 
+class DatoSeguridadBase(BaseModel):
+    fecha_registro: date
+    medidas_implementadas: List[str]
+    cobertura_art_declarada: bool
+
+class DatoValidacionBase(BaseModel):
+    fecha_validacion: date
+    estado_validacion: str = Field(..., max_length=50)
+    responsable_tecnico: str = Field(..., max_length=200)
+
 class SnapshotInput(BaseModel):
     """Esquema de entrada para el snapshot completo"""
     proyecto: DatoProyectoBase
@@ -34,4 +46,38 @@ class SnapshotInput(BaseModel):
     validaciones_tecnicas: List[Any]
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class SnapshotCanonico:
+    """
+    Representación única de un snapshot por solicitud: se valida una vez
+    (SnapshotInput), se vuelca a JSON una vez y se codifica a bytes canónicos
+    una vez. Hash, prompt y persistencia derivan de acá en vez de volver a
+    llamar a model_dump / json.dumps cada uno por su lado.
+    """
+
+    def __init__(self, modelo: SnapshotInput | None = None, datos: dict[str, Any] | None = None):
+        # `datos`: snapshot armado desde las tablas Dato* (ingesta por partes), ya volcado
+        if (modelo is None) == (datos is None):
+            raise ValueError("SnapshotCanonico necesita el modelo validado o los datos ya volcados.")
+        self.modelo = modelo
+        self._datos = datos
+
+    @cached_property
+    def datos(self) -> dict[str, Any]:
+        """Volcado JSON-compatible (fechas como string); se persiste tal cual."""
+        if self._datos is not None:
+            return self._datos
+        return self.modelo.model_dump(mode='json')
+
+    @cached_property
+    def bytes_canonicos(self) -> bytes:
+        return serializar_canonico(self.datos)
+
+    @cached_property
+    def hash(self) -> int:
+        return generar_hash_bytes(self.bytes_canonicos)
+
+    @cached_property
+    def huella(self) -> str:
+        return generar_huella_bytes(self.bytes_canonicos)
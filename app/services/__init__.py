@@ -1,3 +1,17 @@
-from .analisis_service import iniciar_nuevo_analisis, procesar_snapshot_con_ia
+from .analisis_service import (
+    iniciar_nuevo_analisis,
+    procesar_snapshot_con_ia,
+    ejecutar_procesamiento,
+    cancelar_analisis,
+    cancelar_analisis_superados,
+)
+from .ejecutor import ejecutor
 
-__all__ = ["iniciar_nuevo_analisis", "procesar_snapshot_con_ia"]
\ No newline at end of file
+__all__ = [
+    "iniciar_nuevo_analisis",
+    "procesar_snapshot_con_ia",
+    "ejecutar_procesamiento",
+    "cancelar_analisis",
+    "cancelar_analisis_superados",
+    "ejecutor",
+]
@@ -1,14 +1,35 @@
 import json
 import logging
-import httpx
 from sqlalchemy.orm import Session
 from uuid import UUID
 import asyncio
+import time
+from datetime import datetime, timedelta
 
 from app.config import settings
+from app.crud.crud_riesgos import normalizar_riesgos, sincronizar_terminos_riesgo
+from app.crud.crud_snapshot import get_resultado_por_hash
+from app.crud.crud_webhooks import encolar_eventos
 from app.models import Analisis, ResultadoAnalisis, ObservacionGenerada
-from app.schemas.snapshot import SnapshotInput
+from app.schemas.snapshot import SnapshotCanonico
 from app.models.enums import EstadoAnalisis
+from app.services.coalescencia import LiderAbandonadoError, bloqueo_consultivo, vuelos
+from app.services.ejecutor import marcar_invocacion_llm
+from app.services.informes import generar_informe
+from app.services.latencias import registro_latencias
+from app.services.presupuesto import AnalisisCanceladoError, Presupuesto, PresupuestoAgotadoError
+from app.services.prompts import (
+    SYSTEM_PROMPT,
+    SYSTEM_PROMPT_SECCION,
+    SYSTEM_PROMPT_SINTESIS,
+    PromptPartes,
+    build_section_prompts,
+    build_synthesis_prompt,
+    build_user_prompt,
+    construir_mensajes,
+)
+from app.services.proveedores import ProveedorLLM, proveedores
+from app.services.trazas import traza
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("ai_engine")
@@ -17,172 +38,370 @@ logger = logging.getLogger("ai_engine")
 class AIEngineService:
     def __init__(self, db: Session):
         self.db = db
-        self.api_key = settings.openrouter_api_key
-        self.url = "https://openrouter.ai/api/v1/chat/completions"
 
-    async def procesar_analisis_completo(self, analisis_id: UUID, snapshot: SnapshotInput):
+    async def procesar_analisis_completo(
+        self,
+        analisis_id: UUID,
+        snapshot: SnapshotCanonico,
+        presupuesto: Presupuesto = None,
+    ):
         analisis = self.db.query(Analisis).filter(Analisis.id == analisis_id).first()
-
-        system_prompt = self._get_system_prompt()
-        user_prompt = self._build_user_prompt(snapshot)
+        presupuesto = presupuesto or Presupuesto(settings.analisis_deadline_segundos)
 
         logger.info(f"🤖 Iniciando análisis técnico {analisis_id}...")
         try:
-            raw_response = await self._call_llm_with_fallback(system_prompt, user_prompt)
-            data_ia = self._parse_ia_response(raw_response)
-            self._save_results(analisis_id, data_ia)
+            data_ia = await self._obtener_informe(analisis_id, snapshot, presupuesto)
+            self._verificar_cancelacion(analisis_id)
+            with traza("resultados.guardar"):
+                self._save_results(analisis_id, data_ia)
             analisis.estado = EstadoAnalisis.COMPLETADO
+            # Qué faltó de un informe parcial; None borra el mensaje de un intento anterior
+            analisis.error_mensaje = data_ia.get("informe_parcial")
             logger.info(f"✅ Informe narrativo generado para {analisis_id}.")
 
+        except AnalisisCanceladoError:
+            # El estado CANCELADO ya quedó persistido por quien canceló
+            self.db.rollback()
+            logger.warning(f"🛑 Análisis {analisis_id} cancelado, se descarta el resultado.")
+            return
+
+        except PresupuestoAgotadoError as e:
+            analisis.estado = EstadoAnalisis.ERROR
+            analisis.error_mensaje = str(e)[:500]
+            logger.error(f"⏱️  Análisis {analisis_id} sin presupuesto de tiempo: {e}")
+
         except Exception as e:
             analisis.estado = EstadoAnalisis.ERROR
-            analisis.error_mensaje = str(e)
+            analisis.error_mensaje = str(e)[:500]
             logger.error(f"❌ Error en AI Engine: {e}")
 
-        self.db.commit()
+        # Webhooks de COMPLETADO / ERROR, en la misma transacción
+        encolar_eventos(self.db, analisis)
+        with traza("db.commit"):
+            self.db.commit()
+
+        if analisis.estado == EstadoAnalisis.COMPLETADO:
+            await self._generar_documento(analisis)
+
+    async def _generar_documento(self, analisis: Analisis):
+        """Pre-renderiza el informe HTML; si falla, se renderiza al pedirlo."""
+        try:
+            await generar_informe(self.db, analisis)
+        except Exception as e:
+            self.db.rollback()
+            logger.warning(f"⚠️  No se pudo pre-renderizar el informe de {analisis.id}: {e}")
+
+    async def _obtener_informe(
+        self,
+        analisis_id: UUID,
+        snapshot: SnapshotCanonico,
+        presupuesto: Presupuesto,
+    ) -> dict:
+        """
+        Coalesce análisis con el mismo snapshot: dentro del proceso, un solo
+        líder por hash llama al LLM y el resto espera su resultado; entre
+        procesos, el advisory lock serializa y el que llega segundo reutiliza
+        el resultado ya guardado. La clave del vuelo incluye los bytes
+        canónicos: el hash es de 32 bits y una colisión no debe compartir
+        el resultado de otro snapshot.
+        """
+        clave = (snapshot.hash, snapshot.bytes_canonicos)
+        while True:
+            futuro, es_lider = vuelos.unirse(clave)
+            if es_lider:
+                break
+            logger.info(f"🔗 {analisis_id} espera el resultado de un snapshot idéntico en curso.")
+            try:
+                with traza("coalescencia.esperar_lider"):
+                    return await vuelos.esperar(futuro, presupuesto)
+            except LiderAbandonadoError:
+                # El líder abandonó por motivos propios: se compite de nuevo por el liderazgo
+                continue
+
+        try:
+            async with bloqueo_consultivo(snapshot.hash, presupuesto):
+                with traza("coalescencia.reutilizar"):
+                    data_ia = self._resultado_reutilizable(analisis_id, snapshot)
+                if data_ia is None:
+                    data_ia = await self._generar_informe(analisis_id, snapshot, presupuesto)
+        except BaseException as e:
+            vuelos.fallar(clave, futuro, e)
+            raise
+        vuelos.resolver(clave, futuro, data_ia)
+        return data_ia
+
+    async def _generar_informe(
+        self,
+        analisis_id: UUID,
+        snapshot: SnapshotCanonico,
+        presupuesto: Presupuesto,
+    ) -> dict:
+        if settings.generacion_por_secciones:
+            return await self._generar_informe_por_secciones(analisis_id, snapshot, presupuesto)
+        with traza("prompt.construir"):
+            system_prompt = self._get_system_prompt()
+            user_prompt = self._build_user_prompt(snapshot)
+        raw_response = await self._call_llm_with_fallback(
+            system_prompt, user_prompt, analisis_id=analisis_id, presupuesto=presupuesto
+        )
+        with traza("respuesta.parsear", caracteres=len(raw_response)):
+            return self._parse_ia_response(raw_response)
 
-    async def _call_llm_with_fallback(self, system_prompt: str, user_prompt: str) -> str:
+    async def _generar_informe_por_secciones(
+        self,
+        analisis_id: UUID,
+        snapshot: SnapshotCanonico,
+        presupuesto: Presupuesto,
+    ) -> dict:
         """
-        Itera AVAILABLE_MODELS en orden. El primer modelo que responde
-        correctamente gana; si falla, pasa al siguiente.
+        Map-reduce: las cuatro secciones narrativas se piden en paralelo, cada
+        una con su parte del snapshot, y una síntesis corta arma el resumen,
+        los riesgos y el score. El tiempo total queda en la sección más lenta
+        más la síntesis. Una sección que falla se reintenta sola; si agota
+        los reintentos queda como no informada en lugar de perder el informe.
+        Lo mismo la síntesis: sin ella se guardan las secciones con el
+        resumen no informado. En ambos casos el informe queda marcado como
+        parcial (`informe_parcial`).
+        """
+        with traza("prompt.construir", modo="secciones"):
+            prompts = build_section_prompts(snapshot.datos)
+
+        tareas = [
+            asyncio.ensure_future(self._generar_seccion(nombre, prompt, analisis_id, presupuesto))
+            for nombre, prompt in prompts.items()
+        ]
+        try:
+            resultados = await asyncio.gather(*tareas)
+        except BaseException:
+            # Cancelación o presupuesto agotado: no dejar secciones huérfanas
+            for tarea in tareas:
+                tarea.cancel()
+            raise
+
+        secciones = {}
+        errores = []
+        for nombre, (texto, error) in zip(prompts, resultados):
+            if texto is None:
+                errores.append(f"{nombre}: {error}")
+                texto = "No informado: la sección no pudo generarse."
+            secciones[nombre] = texto
+        if len(errores) == len(prompts):
+            raise Exception(f"Ninguna sección pudo generarse. {'; '.join(errores)}")
+
+        sintesis, error = await self._generar_sintesis(snapshot, secciones, analisis_id, presupuesto)
+        if sintesis is None:
+            # Las secciones ya costaron sus llamadas: se guardan sin resumen ni score
+            errores.append(f"síntesis: {error}")
+            sintesis = {"resumen_general": "No informado", "riesgos_identificados": [], "score_coherencia": None}
+
+        return {
+            **secciones,
+            "resumen_general": sintesis.get("resumen_general", "No informado"),
+            "riesgos_identificados": sintesis.get("riesgos_identificados", []),
+            "score_coherencia": sintesis.get("score_coherencia", 0),
+            # Un informe incompleto se guarda, pero no se reutiliza para otros análisis
+            "informe_parcial": f"Informe parcial. {'; '.join(errores)}"[:500] if errores else None,
+        }
+
+    async def _generar_sintesis(
+        self,
+        snapshot: SnapshotCanonico,
+        secciones: dict[str, str],
+        analisis_id: UUID,
+        presupuesto: Presupuesto,
+    ) -> tuple[dict | None, Exception | None]:
+        """Resumen, riesgos y score (o None y el último error), con los mismos reintentos que una sección."""
+        ultimo_error = None
+        for intento in range(1, settings.seccion_max_intentos + 1):
+            try:
+                with traza("seccion.sintesis", intento=intento):
+                    raw_response = await self._call_llm_with_fallback(
+                        SYSTEM_PROMPT_SINTESIS,
+                        build_synthesis_prompt(snapshot.datos, secciones),
+                        analisis_id=analisis_id,
+                        presupuesto=presupuesto,
+                    )
+                with traza("respuesta.parsear", caracteres=len(raw_response)):
+                    return self._parse_ia_response(raw_response), None
+            except (PresupuestoAgotadoError, AnalisisCanceladoError):
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️  Síntesis falló (intento {intento}): {e}")
+                ultimo_error = e
+        return None, ultimo_error
+
+    async def _generar_seccion(
+        self,
+        nombre: str,
+        prompt: PromptPartes,
+        analisis_id: UUID,
+        presupuesto: Presupuesto,
+    ) -> tuple[str | None, Exception | None]:
+        """Texto de una sección (o None y el último error), con reintentos propios."""
+        ultimo_error = None
+        for intento in range(1, settings.seccion_max_intentos + 1):
+            try:
+                with traza("seccion.generar", seccion=nombre, intento=intento):
+                    texto = await self._call_llm_with_fallback(
+                        SYSTEM_PROMPT_SECCION, prompt, analisis_id=analisis_id, presupuesto=presupuesto
+                    )
+                return texto.strip(), None
+            except (PresupuestoAgotadoError, AnalisisCanceladoError):
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️  Sección {nombre} falló (intento {intento}): {e}")
+                ultimo_error = e
+        return None, ultimo_error
+
+    def _resultado_reutilizable(self, analisis_id: UUID, snapshot: SnapshotCanonico) -> dict | None:
+        """Resultado reciente de otro análisis (p. ej. de otro proceso) con el mismo snapshot."""
+        desde = datetime.utcnow() - timedelta(seconds=settings.coalescencia_ventana_segundos)
+        previo = get_resultado_por_hash(self.db, snapshot.hash, snapshot.huella, analisis_id, desde)
+        if previo is None:
+            return None
+        logger.info(f"♻️  {analisis_id} reutiliza el resultado del análisis {previo.analisis_id}.")
+        return {
+            "resumen_general": previo.resumen_general,
+            "estado_ejecucion": previo.estado_ejecucion,
+            "estado_planificacion": previo.estado_planificacion,
+            "estado_seguridad": previo.estado_seguridad,
+            "estado_validaciones": previo.estado_validaciones,
+            "riesgos_identificados": list(previo.riesgos_identificados or []),
+            "score_coherencia": float(previo.score_coherencia) if previo.score_coherencia is not None else 0,
+        }
+
+    def _verificar_cancelacion(self, analisis_id: UUID | None):
+        """Consulta el estado en DB para enterarse de cancelaciones hechas desde otro proceso."""
+        if analisis_id is None:
+            return
+        estado = self.db.query(Analisis.estado).filter(Analisis.id == analisis_id).scalar()
+        if estado == EstadoAnalisis.CANCELADO:
+            raise AnalisisCanceladoError(str(analisis_id))
+
+    async def _call_llm_with_fallback(
+        self,
+        system_prompt: str,
+        user_prompt: str | PromptPartes,
+        analisis_id: UUID = None,
+        presupuesto: Presupuesto = None,
+    ) -> str:
+        """
+        Recorre los modelos de los backends configurados; en cada paso se
+        elige el backend más rápido con capacidad libre. El primer modelo
+        que responde correctamente gana; si falla, pasa al siguiente. Con
+        presupuesto, se saltean los modelos cuya latencia típica no entra
+        en lo que queda.
         """
-        models = settings.available_models
         last_error = None
 
-        for model in models:
+        for proveedor, model in proveedores.intentos():
+            self._verificar_cancelacion(analisis_id)
+            if presupuesto is not None:
+                presupuesto.verificar(f"Último error: {last_error}" if last_error else "")
+                tipica = registro_latencias.tipica(model)
+                if tipica is not None and tipica > presupuesto.restante():
+                    logger.info(
+                        f"⏭️  {model} omitido: latencia típica {tipica:.1f}s "
+                        f"> presupuesto restante {presupuesto.restante():.1f}s"
+                    )
+                    continue
             try:
-                result = await self._call_llm(system_prompt, user_prompt, model=model)
-                logger.info(f"✅ Modelo exitoso: {model}")
+                with traza("llm.intento", modelo=model, proveedor=proveedor.nombre):
+                    result = await self._call_llm(
+                        system_prompt, user_prompt, model=model, presupuesto=presupuesto,
+                        proveedor=proveedor,
+                    )
+                logger.info(f"✅ Modelo exitoso: {model} ({proveedor.nombre})")
                 return result
+            except PresupuestoAgotadoError:
+                raise
             except Exception as e:
-                logger.warning(f"⚠️  {model} falló: {e}. Probando siguiente...")
+                logger.warning(f"⚠️  {model} ({proveedor.nombre}) falló: {e}. Probando siguiente...")
                 last_error = e
 
+        if presupuesto is not None:
+            presupuesto.verificar(f"Último error: {last_error}" if last_error else "")
         raise Exception(f"Todos los modelos del registro fallaron. Último error: {last_error}")
 
-    async def _call_llm(self, system_prompt: str, user_prompt: str, model: str = None) -> str:
-        model = model or settings.available_models[0]
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
+    def _timeout_disponible(self, presupuesto: Presupuesto | None, model: str) -> float:
+        if presupuesto is None:
+            return settings.llm_timeout_segundos
+        presupuesto.verificar(f"Sin tiempo para invocar {model}.")
+        return min(settings.llm_timeout_segundos, presupuesto.restante())
+
+    async def _call_llm(
+        self,
+        system_prompt: str,
+        user_prompt: str | PromptPartes,
+        model: str = None,
+        presupuesto: Presupuesto = None,
+        proveedor: ProveedorLLM = None,
+    ) -> str:
+        proveedor = proveedor or proveedores.proveedores[-1]
+        model = model or proveedor.modelos[0]
         payload = {
             "model": model,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
+            "messages": construir_mensajes(system_prompt, user_prompt, model),
             "temperature": 0.3,
         }
 
         max_retries = 2
         for attempt in range(max_retries):
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.url, headers=headers, json=payload, timeout=60.0
+            # El slot del backend se libera antes de esperar el backoff de un 429.
+            # Con un backend saturado, esperar el slot también descuenta presupuesto
+            espera_slot = presupuesto.restante() if presupuesto is not None else None
+            try:
+                async with proveedor.slot(timeout=espera_slot):
+                    timeout = self._timeout_disponible(presupuesto, model)
+                    marcar_invocacion_llm()
+                    inicio = time.monotonic()
+                    try:
+                        # wait_for acota la request completa, no solo cada lectura del socket
+                        with traza("llm.http", modelo=model, intento=attempt + 1) as span:
+                            response = await asyncio.wait_for(proveedor.post(payload, timeout), timeout=timeout)
+                            span.atributos["http.status_code"] = response.status_code
+                    except asyncio.TimeoutError:
+                        if presupuesto is not None:
+                            presupuesto.verificar(f"Timeout esperando a {model}.")
+                        raise Exception(f"Timeout de {timeout:.0f}s esperando a {model}.")
+                    duracion = time.monotonic() - inicio
+            except asyncio.TimeoutError:
+                # Solo la espera del slot llega acá: el timeout de la request se convierte arriba
+                if presupuesto is not None:
+                    presupuesto.verificar(f"Esperando un lugar libre en {proveedor.nombre} para {model}.")
+                raise
+
+            if response.status_code == 429:
+                wait = 2 ** attempt * 5
+                if presupuesto is not None:
+                    wait = min(wait, presupuesto.restante())
+                logger.warning(
+                    f"⏳ Rate limit en {model}, reintentando en {wait:.0f}s "
+                    f"(intento {attempt + 1}/{max_retries})..."
                 )
-                if response.status_code == 429:
-                    wait = 2 ** attempt * 5
-                    logger.warning(
-                        f"⏳ Rate limit en {model}, reintentando en {wait}s "
-                        f"(intento {attempt + 1}/{max_retries})..."
-                    )
-                    await asyncio.sleep(wait)
-                    continue
-                response.raise_for_status()
-            
-                content = response.json()["choices"][0]["message"]["content"]
-            
-                # ← Validar que el contenido no esté vacío
-                if not content or not content.strip():
-                    raise Exception(f"Respuesta vacía del modelo {model}.")
-            
-                return content
+                await asyncio.sleep(wait)
+                continue
+            response.raise_for_status()
+
+            content = response.json()["choices"][0]["message"]["content"]
+
+            # ← Validar que el contenido no esté vacío
+            if not content or not content.strip():
+                raise Exception(f"Respuesta vacía del modelo {model}.")
+
+            registro_latencias.registrar(model, duracion)
+            registro_latencias.registrar(proveedor.clave_latencia, duracion)
+            return content
 
         raise Exception(f"Rate limit agotado para {model}.")
 
     def _get_system_prompt(self) -> str:
-        return """
-        Sos analista técnico de obras. Generás informes profesionales en formato narrativo, tono formal y objetivo.
-        Usá exclusivamente los datos recibidos. No inventes información.
-        Si falta un dato, indicarlo como pendiente o no informado.
-
-        DEBES RESPONDER EXCLUSIVAMENTE UN JSON con esta estructura exacta:
-        {
-            "resumen_general": "Texto narrativo del estado general del proyecto...",
-            "estado_ejecucion": "Texto narrativo sobre avance y ejecución de tareas...",
-            "estado_planificacion": "Texto narrativo sobre cumplimiento de etapas y plazos...",
-            "estado_seguridad": "Texto narrativo sobre condiciones de seguridad e higiene...",
-            "estado_validaciones": "Texto narrativo sobre validaciones técnicas pendientes y aprobadas...",
-            "riesgos_identificados": ["Riesgo 1", "Riesgo 2"],
-            "score_coherencia": 85
-        }
-        No uses listas de puntos en los campos de texto. Todo debe ser prosa formal.
-        riesgos_identificados debe ser una lista de strings concisos, puede estar vacía [].
-        score_coherencia debe ser un número entero entre 0 y 100.
-        """
+        # Texto estático: se devuelve la constante del módulo sin reconstruirla
+        return SYSTEM_PROMPT
 
-    def _build_user_prompt(self, snapshot: SnapshotInput) -> str:
-        s = snapshot.model_dump(mode='json')
-        p = s.get('proyecto', {})
-        avances = s.get('avances', [])
-        etapas = s.get('etapas', [])
-        ultimo_avance = avances[-1] if avances else {}
-
-        etapas_texto = "\n".join([
-            f"  - {e.get('etapa_nombre')} (orden {e.get('etapa_orden')}): "
-            f"{e.get('estado')} | {e.get('fecha_inicio_estimada')} → {e.get('fecha_fin_estimada')}"
-            for e in etapas
-        ])
-
-        avances_texto = "\n".join([
-            f"  - {a.get('fecha_registro')} | {a.get('etapa_nombre')} | "
-            f"{a.get('porcentaje_avance')}% | "
-            f"Tareas: {', '.join(a.get('tareas_principales', []))} | "
-            f"Oficios: {', '.join(a.get('oficios_activos', []))}"
-            for a in avances
-        ])
-
-        # seguridad_higiene y validaciones_tecnicas son List[Any] — normalizamos a string
-        seguridad_texto = '; '.join([
-            str(item) if not isinstance(item, dict) else json.dumps(item, ensure_ascii=False)
-            for item in s.get('seguridad_higiene', [])
-        ])
-
-        validaciones_texto = '; '.join([
-            str(item) if not isinstance(item, dict) else json.dumps(item, ensure_ascii=False)
-            for item in s.get('validaciones_tecnicas', [])
-        ])
-
-        return f"""
-        Analiza los siguientes datos de obra:
-
-        PROYECTO:
-        Nombre: {p.get('proyecto_nombre')}
-        Responsable técnico: {p.get('responsable_tecnico_nombre')}
-        Ubicación: {p.get('ubicacion')}
-        Tipo de intervención: {p.get('tipo_intervencion')}
-        Superficie: {p.get('superficie_m2')} m²
-        Sistema constructivo: {p.get('sistema_constructivo')}
-        Fecha inicio: {p.get('fecha_inicio')}
-
-        ETAPAS PLANIFICADAS:
-{etapas_texto}
-
-        HISTORIAL DE AVANCES:
-{avances_texto}
-
-        ETAPA Y AVANCE ACTUAL:
-        Etapa: {ultimo_avance.get('etapa_nombre')} — {ultimo_avance.get('porcentaje_avance')}%
-        Tareas: {', '.join(ultimo_avance.get('tareas_principales', []))}
-        Oficios activos: {', '.join(ultimo_avance.get('oficios_activos', []))}
-
-        SEGURIDAD E HIGIENE:
-        {seguridad_texto}
-
-        VALIDACIONES TÉCNICAS:
-        {validaciones_texto}
-        """
+    def _build_user_prompt(self, snapshot: SnapshotCanonico) -> PromptPartes:
+        # Se reutiliza el volcado canónico: no se vuelve a serializar el snapshot
+        return build_user_prompt(snapshot.datos)
 
     def _parse_ia_response(self, raw_content: str) -> dict:
         # Algunos modelos envuelven el JSON en ```json ... ```
@@ -194,6 +413,10 @@ class AIEngineService:
         return json.loads(cleaned.strip())
 
     def _save_results(self, analisis_id: UUID, data: dict):
+        # Al reprocesar se reemplaza el resultado anterior (analisis_id es único)
+        self.db.query(ResultadoAnalisis).filter(ResultadoAnalisis.analisis_id == analisis_id).delete()
+        # Una sola normalización para la columna y para los términos
+        riesgos = normalizar_riesgos(data.get("riesgos_identificados"))
         resultado = ResultadoAnalisis(
             analisis_id=analisis_id,
             resumen_general=data.get("resumen_general", "No informado"),
@@ -201,7 +424,9 @@ class AIEngineService:
             estado_planificacion=data.get("estado_planificacion", "No informado"),
             estado_seguridad=data.get("estado_seguridad", "No informado"),
             estado_validaciones=data.get("estado_validaciones", "No informado"),
-            riesgos_identificados=data.get("riesgos_identificados", []),
+            riesgos_identificados=riesgos,
             score_coherencia=data.get("score_coherencia", 0)
         )
-        self.db.add(resultado)
\ No newline at end of file
+        self.db.add(resultado)
+        # Taxonomía normalizada para la búsqueda y las frecuencias por riesgo
+        sincronizar_terminos_riesgo(self.db, resultado, riesgos)
\ No newline at end of file
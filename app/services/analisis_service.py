@@ -1,43 +1,95 @@
+import asyncio
 import logging
+from datetime import datetime
 from sqlalchemy.orm import Session
 from uuid import UUID
 
-from app.schemas.analisis import AnalisisCreate
-from app.schemas.snapshot import SnapshotInput
-from app.crud import crud_analisis
+from app.config import settings
+from app.schemas.analisis import AnalisisCreate, AnalisisOut
+from app.schemas.snapshot import SnapshotCanonico
+from app.crud import crud_analisis, crud_snapshot, crud_webhooks
 from app.models.enums import EstadoAnalisis
-from app.utils.hashing import generar_hash_payload
-from app.core.exceptions import AnalisisNotFoundError
+from app.core.exceptions import AnalisisNotFoundError, AnalisisNoCancelableError
+from app.db import SessionWorkers
+from app.db.database import JSONPreserializado
+from app.models import Analisis
 from app.services.ai_engine import AIEngineService
+from app.services.ejecutor import ejecutor
+from app.services.perfilador import perfilar as perfilar_tarea
+from app.services.presupuesto import Presupuesto
+from app.services.trazas import traza
+from app.services.webhooks import validar_callback
+from app.utils.cache import CacheLRU
 
 logger = logging.getLogger("analisis_service")
 
+# Bytes JSON de análisis COMPLETADOS, serializados una sola vez por versión
+_cache_respuestas = CacheLRU(settings.cache_respuestas_max)
+
 def iniciar_nuevo_analisis(db: Session, datos: AnalisisCreate) -> UUID:
-    """Crea el registro inicial del análisis"""
+    """Crea el registro inicial del análisis (y su webhook, si trae callback_url)"""
+    if datos.callback_url:
+        validar_callback(str(datos.callback_url))
     nuevo_analisis = crud_analisis.create_analisis(db, datos)
+    if datos.callback_url:
+        crud_webhooks.crear_suscripciones(db, str(datos.callback_url), [nuevo_analisis.id])
     return nuevo_analisis.id
 
-async def procesar_snapshot_con_ia(db: Session, analisis_id: UUID, snapshot: SnapshotInput):
+def serializar_analisis(analisis: Analisis) -> bytes:
+    """
+    JSON de AnalisisOut generado por pydantic-core (sin jsonable_encoder).
+    Los COMPLETADOS no cambian salvo reproceso (que toca updated_at), así que
+    sus bytes se cachean y las lecturas repetidas no recargan el resultado.
+    """
+    if analisis.estado != EstadoAnalisis.COMPLETADO:
+        return AnalisisOut.model_validate(analisis).model_dump_json().encode("utf-8")
+
+    clave = (analisis.id, analisis.version, analisis.updated_at)
+    contenido = _cache_respuestas.get(clave)
+    if contenido is None:
+        contenido = AnalisisOut.model_validate(analisis).model_dump_json().encode("utf-8")
+        _cache_respuestas.set(clave, contenido)
+    return contenido
+
+async def procesar_snapshot_con_ia(
+    db: Session, analisis_id: UUID, snapshot: SnapshotCanonico | None, presupuesto: Presupuesto = None
+):
     """
-    Orquestador que coordina el flujo de datos y la IA.
+    Orquestador que coordina el flujo de datos y la IA. Sin `snapshot`, se
+    arma desde las tablas Dato* cargadas por la ingesta por partes.
     """
     analisis = crud_analisis.get_analisis(db, analisis_id)
     if not analisis:
         logger.error(f"Análisis {analisis_id} no encontrado.")
         return
 
-    crud_analisis.update_estado(db, analisis_id, EstadoAnalisis.PROCESANDO)
+    # Reclamo atómico: evita que un doble envío procese dos veces (también entre procesos)
+    if not crud_analisis.reclamar_procesamiento(db, analisis_id, settings.analisis_deadline_max_segundos):
+        logger.info(f"Análisis {analisis_id} cancelado o ya en proceso en otro worker, se omite.")
+        return
 
     try:
-        # ✅ CORRECCIÓN: Usar mode='json' para que las fechas sean strings antes del hash
-        snapshot_serializable = snapshot.model_dump(mode='json')
-        payload_hash = generar_hash_payload(snapshot_serializable)
-        
-        logger.info(f"Procesando snapshot {analisis_id} con hash: {payload_hash}")
+        if snapshot is None:
+            with traza("snapshot.cargar"):
+                datos = crud_snapshot.cargar_datos_snapshot(db, analisis_id)
+            if datos is None:
+                raise Exception("No hay un snapshot almacenado para el análisis.")
+            snapshot = SnapshotCanonico(datos=datos)
+            logger.info(f"Procesando snapshot por partes {analisis_id} con hash: {snapshot.hash}")
+            # Los datos ya están en las tablas Dato*: solo se registran hash y huella
+            crud_snapshot.sellar_snapshot(db, analisis_id, snapshot.hash, snapshot.huella)
+        else:
+            # Volcado, bytes canónicos y hash se calculan una sola vez en SnapshotCanonico
+            logger.info(f"Procesando snapshot {analisis_id} con hash: {snapshot.hash}")
+            with traza("snapshot.guardar", bytes=len(snapshot.bytes_canonicos)):
+                crud_snapshot.guardar_snapshot(
+                    db, analisis_id, JSONPreserializado(snapshot.bytes_canonicos.decode('utf-8')),
+                    snapshot.hash, snapshot.huella,
+                )
 
         # Invocación al Motor de IA
         ai_engine = AIEngineService(db)
-        await ai_engine.procesar_analisis_completo(analisis_id, snapshot)
+        await ai_engine.procesar_analisis_completo(analisis_id, snapshot, presupuesto=presupuesto)
 
     except Exception as e:
         # ✅ CORRECCIÓN: Usar str(e) para evitar errores de serialización en el log
@@ -45,5 +97,75 @@ async def procesar_snapshot_con_ia(db: Session, analisis_id: UUID, snapshot: Sna
         logger.error(f"Error crítico en la orquestación del análisis {analisis_id}: {error_msg}")
         
         # Aseguramos que el estado cambie a ERROR en la DB
-        crud_analisis.update_estado(db, analisis_id, EstadoAnalisis.ERROR)
-        db.commit()
\ No newline at end of file
+        analisis = crud_analisis.update_estado(db, analisis_id, EstadoAnalisis.ERROR)
+        if analisis:
+            crud_webhooks.encolar_eventos(db, analisis)
+        db.commit()
+
+async def ejecutar_procesamiento(
+    analisis_id: UUID, snapshot: SnapshotCanonico | None, presupuesto: Presupuesto = None, perfilar: bool = False
+):
+    """
+    Punto de entrada del ejecutor: crea y gestiona su propia sesión.
+    Abre el span raíz del análisis y, si se pidió, lo perfila por muestreo.
+
+    Si la tarea se cancela, el CANCELADO ya lo persistió quien canceló
+    (cancelar_analisis o el reemplazo por un análisis más nuevo). Cualquier
+    otra cancelación es un apagado del servicio: el análisis vuelve a
+    PENDIENTE en lugar de quedar cancelado, para que pueda reenviarse.
+    """
+    db = SessionWorkers()
+    try:
+        with traza("analisis.procesar", analisis_id=str(analisis_id)):
+            async with perfilar_tarea(str(analisis_id), activo=perfilar or settings.perfilar_todos):
+                await procesar_snapshot_con_ia(db, analisis_id, snapshot, presupuesto=presupuesto)
+    except asyncio.CancelledError:
+        db.rollback()
+        if crud_analisis.liberar_procesamiento(
+            db, analisis_id, "Procesamiento interrumpido por un reinicio del servicio; volver a enviarlo."
+        ):
+            logger.warning(f"⏸️  Procesamiento del análisis {analisis_id} interrumpido, vuelve a PENDIENTE.")
+        else:
+            logger.warning(f"🛑 Procesamiento del análisis {analisis_id} cancelado.")
+        raise
+    finally:
+        db.close()
+
+def _marcar_cancelado(db: Session, analisis: Analisis, motivo: str):
+    analisis.estado = EstadoAnalisis.CANCELADO
+    analisis.error_mensaje = motivo
+    analisis.fecha_finalizacion = datetime.utcnow()
+    # La notificación se persiste en la misma transacción que el estado
+    crud_webhooks.encolar_eventos(db, analisis)
+
+def cancelar_analisis(db: Session, analisis_id: UUID, motivo: str = "Cancelado por el usuario.") -> Analisis:
+    """
+    Marca el análisis como CANCELADO y cancela su tarea en vuelo, liberando
+    el slot del ejecutor y las requests al LLM que tenga abiertas.
+    """
+    analisis = crud_analisis.get_analisis(db, analisis_id)
+    if not analisis:
+        raise AnalisisNotFoundError(str(analisis_id))
+    if analisis.estado not in (EstadoAnalisis.PENDIENTE, EstadoAnalisis.PROCESANDO):
+        raise AnalisisNoCancelableError(str(analisis_id), analisis.estado.value)
+
+    _marcar_cancelado(db, analisis, motivo)
+    db.commit()
+    db.refresh(analisis)
+
+    ejecutor.cancelar(analisis_id)
+    logger.info(f"🛑 Análisis {analisis_id} cancelado: {motivo}")
+    return analisis
+
+def cancelar_analisis_superados(db: Session, analisis: Analisis) -> list[UUID]:
+    """Cancela los análisis previos del mismo proyecto y período que siguen activos."""
+    superados = crud_analisis.get_analisis_superados(db, analisis)
+    for previo in superados:
+        _marcar_cancelado(db, previo, f"Reemplazado por el análisis {analisis.id}.")
+    if superados:
+        db.commit()
+
+    for previo in superados:
+        ejecutor.cancelar(previo.id)
+        logger.info(f"🛑 Análisis {previo.id} reemplazado por {analisis.id}.")
+    return [previo.id for previo in superados]
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from typing import Any, Hashable
+
+from sqlalchemy import text
+
+from app.db import engine_workers
+from app.services.presupuesto import AnalisisCanceladoError, Presupuesto, PresupuestoAgotadoError
+from app.services.trazas import traza
+
+logger = logging.getLogger("coalescencia")
+
+# Fallos que dependen del análisis líder y no del snapshot: no se heredan
+_ERRORES_DEL_LIDER = (asyncio.CancelledError, AnalisisCanceladoError, PresupuestoAgotadoError)
+
+
+class LiderAbandonadoError(Exception):
+    """El líder de un vuelo se canceló o se quedó sin presupuesto; los seguidores deben reintentar."""
+
+
+class VueloUnico:
+    """
+    Single-flight en proceso: la primera tarea que pide una clave es la
+    líder y hace el trabajo; las demás esperan su resultado en lugar de
+    repetir la llamada al LLM.
+    """
+
+    def __init__(self):
+        self._vuelos: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def unirse(self, clave: Hashable) -> tuple[Future, bool]:
+        """Devuelve el futuro compartido y si quien llama quedó como líder."""
+        with self._lock:
+            futuro = self._vuelos.get(clave)
+            if futuro is not None:
+                return futuro, False
+            futuro = Future()
+            self._vuelos[clave] = futuro
+            return futuro, True
+
+    def resolver(self, clave: Hashable, futuro: Future, resultado: Any):
+        self._cerrar(clave, futuro)
+        futuro.set_result(resultado)
+
+    def fallar(self, clave: Hashable, futuro: Future, error: BaseException):
+        """
+        Propaga el error del líder a los seguidores, salvo que sea propio del
+        líder (cancelación, análisis CANCELADO, presupuesto agotado): cada
+        seguidor tiene su propio estado y deadline, así que vuelve a competir.
+        """
+        self._cerrar(clave, futuro)
+        if isinstance(error, _ERRORES_DEL_LIDER):
+            error = LiderAbandonadoError(type(error).__name__)
+        futuro.set_exception(error)
+
+    def _cerrar(self, clave: Hashable, futuro: Future):
+        with self._lock:
+            if self._vuelos.get(clave) is futuro:
+                del self._vuelos[clave]
+
+    async def esperar(self, futuro: Future, presupuesto: Presupuesto | None = None) -> Any:
+        # shield: si el seguidor se cancela no debe cancelar el futuro del líder
+        espera = asyncio.shield(asyncio.wrap_future(futuro))
+        if presupuesto is None:
+            return await espera
+        try:
+            return await asyncio.wait_for(espera, timeout=presupuesto.restante())
+        except asyncio.TimeoutError:
+            presupuesto.verificar("Esperando el resultado de un análisis idéntico en curso.")
+            raise
+
+
+vuelos = VueloUnico()
+
+
+@asynccontextmanager
+async def bloqueo_consultivo(clave: int, presupuesto: Presupuesto | None = None, intervalo: float = 0.5):
+    """
+    Advisory lock de PostgreSQL para coalescer entre procesos. Usa una
+    conexión dedicada (los locks de sesión viven en la conexión) y la
+    adquisición es por sondeo para no bloquear el bucle de eventos ni
+    ignorar cancelaciones. En otros motores no hace nada.
+    """
+    if engine_workers.dialect.name != "postgresql":
+        yield
+        return
+
+    conn = engine_workers.connect()
+    adquirido = False
+    try:
+        with traza("coalescencia.bloqueo_consultivo"):
+            while True:
+                adquirido = conn.execute(
+                    text("SELECT pg_try_advisory_lock(:clave)"), {"clave": clave}
+                ).scalar()
+                if adquirido:
+                    break
+                if presupuesto is not None:
+                    presupuesto.verificar("Esperando el resultado de un análisis idéntico en otro proceso.")
+                await asyncio.sleep(intervalo)
+        yield
+    finally:
+        try:
+            if adquirido:
+                conn.execute(text("SELECT pg_advisory_unlock(:clave)"), {"clave": clave})
+        finally:
+            conn.close()
@@ -0,0 +1,315 @@
+import asyncio
+import contextvars
+import logging
+import math
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Coroutine
+from uuid import UUID
+
+from app.config import settings
+from app.core.exceptions import CuotaClienteExcedidaError, ServicioSaturadoError
+from app.models.enums import PrioridadAnalisis
+from app.services.latencias import registro_latencias
+from app.services.planificador import PlanificadorJusto
+
+logger = logging.getLogger("ejecutor")
+
+
+class _Corrida:
+    """Lo que hizo una tarea del ejecutor; la comparten las subtareas que lance."""
+
+    __slots__ = ("invoco_llm",)
+
+    def __init__(self):
+        self.invoco_llm = False
+
+
+_corrida_actual: contextvars.ContextVar[_Corrida | None] = contextvars.ContextVar("corrida_actual", default=None)
+
+
+def marcar_invocacion_llm():
+    """
+    Indica que el análisis en curso llegó a llamar al LLM. Solo esas corridas
+    alimentan la duración típica que estima el Retry-After: las que salen
+    antes (reclamo perdido, cancelación, resultado coalescido) durarían casi
+    cero y la subestimarían.
+    """
+    corrida = _corrida_actual.get()
+    if corrida is not None:
+        corrida.invoco_llm = True
+
+
+def _sumar(contadores: dict[str, int], clave: str, delta: int):
+    """Actualiza un contador por cliente; los que llegan a cero se borran."""
+    valor = contadores.get(clave, 0) + delta
+    if valor:
+        contadores[clave] = valor
+    else:
+        contadores.pop(clave, None)
+
+
+class EjecutorAnalisis:
+    """
+    Corre los análisis en un bucle de eventos dedicado (hilo propio).
+    Limita cuántos se ejecutan a la vez, despacha la cola con el
+    planificador justo (prioridad + WFQ por cliente y proyecto), aplica
+    control de admisión y guarda el handle de cada tarea para poder
+    cancelarla mientras espera turno o mientras está en curso.
+    """
+
+    def __init__(
+        self,
+        max_concurrentes: int,
+        max_en_cola: int,
+        max_por_cliente: int,
+        max_interactivos_por_cliente: int,
+        fraccion_cola_lote: float,
+        planificador: PlanificadorJusto,
+    ):
+        self.max_concurrentes = max_concurrentes
+        self.max_en_cola = max_en_cola
+        self.max_por_cliente = max_por_cliente
+        self.max_interactivos_por_cliente = max_interactivos_por_cliente
+        self.fraccion_cola_lote = fraccion_cola_lote
+        self.planificador = planificador
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._hilo: threading.Thread | None = None
+        self._tareas: dict[UUID, Future] = {}
+        # Tareas de fondo de larga duración (p. ej. el repartidor de webhooks)
+        self._servicios: list[Future] = []
+        self._clientes: dict[UUID, tuple[str, PrioridadAnalisis]] = {}
+        self._por_cliente: dict[str, int] = {}
+        self._interactivos_por_cliente: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        # Estado del despacho: solo se toca desde el hilo del bucle
+        self._en_curso = 0
+
+    def _asegurar_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is not None:
+                return self._loop
+
+            loop = asyncio.new_event_loop()
+            listo = threading.Event()
+
+            def _correr():
+                asyncio.set_event_loop(loop)
+                listo.set()
+                loop.run_forever()
+
+            self._hilo = threading.Thread(target=_correr, name="ejecutor-analisis", daemon=True)
+            self._hilo.start()
+            listo.wait()
+            self._loop = loop
+            return loop
+
+    # ─── Despacho ────────────────────────────────────────────────────
+
+    async def _tomar_slot(self, prioridad: PrioridadAnalisis, cliente: str, proyecto: str):
+        if self._en_curso < self.max_concurrentes and not self.planificador:
+            self._en_curso += 1
+            self.planificador.despacho_inmediato(cliente)
+            return
+        turno = asyncio.get_running_loop().create_future()
+        self.planificador.push(turno, prioridad, cliente, proyecto)
+        try:
+            await turno
+        except asyncio.CancelledError:
+            # Si el turno ya se había concedido, se devuelve el slot
+            if turno.done() and not turno.cancelled():
+                self._soltar_slot()
+            raise
+
+    def _soltar_slot(self):
+        self._en_curso -= 1
+        turno = self.planificador.pop()
+        if turno is not None:
+            self._en_curso += 1
+            turno.set_result(None)
+
+    async def _ejecutar(
+        self, coro: Coroutine[Any, Any, Any], prioridad: PrioridadAnalisis, cliente: str, proyecto: str
+    ):
+        try:
+            await self._tomar_slot(prioridad, cliente, proyecto)
+            corrida = _Corrida()
+            token = _corrida_actual.set(corrida)
+            inicio = time.monotonic()
+            try:
+                return await coro
+            finally:
+                _corrida_actual.reset(token)
+                self._soltar_slot()
+                if corrida.invoco_llm:
+                    registro_latencias.registrar("ejecutor:analisis", time.monotonic() - inicio)
+        finally:
+            # Si se canceló mientras esperaba turno, la corrutina nunca arrancó
+            coro.close()
+
+    # ─── Admisión ────────────────────────────────────────────────────
+
+    def _duracion_tipica(self) -> float:
+        return registro_latencias.tipica("ejecutor:analisis") or settings.llm_timeout_segundos
+
+    def _retry_after(self, exceso: int) -> int:
+        """Segundos estimados hasta que se liberen `exceso` lugares."""
+        return max(1, math.ceil(self._duracion_tipica() * max(1, exceso) / self.max_concurrentes))
+
+    def _admitir(self, cliente: str, prioridad: PrioridadAnalisis):
+        """Se llama con el lock tomado. Lanza 503/429 si no hay lugar."""
+        pendientes = len(self._tareas)
+        capacidad = self.max_concurrentes + self.max_en_cola
+        if prioridad == PrioridadAnalisis.LOTE:
+            # El trabajo en lote solo usa una parte de la cola, el resto queda para interactivos
+            capacidad = self.max_concurrentes + int(self.max_en_cola * self.fraccion_cola_lote)
+        if pendientes >= capacidad:
+            raise ServicioSaturadoError(self._retry_after(pendientes - capacidad + 1))
+
+        del_cliente = self._por_cliente.get(cliente, 0)
+        if del_cliente >= self.max_por_cliente:
+            raise CuotaClienteExcedidaError(cliente, self._retry_after(del_cliente - self.max_por_cliente + 1))
+
+        if prioridad == PrioridadAnalisis.INTERACTIVA:
+            # La prioridad la elige el cliente: sin tope, todo su trabajo se declararía interactivo
+            interactivos = self._interactivos_por_cliente.get(cliente, 0)
+            if interactivos >= self.max_interactivos_por_cliente:
+                raise CuotaClienteExcedidaError(
+                    cliente,
+                    self._retry_after(interactivos - self.max_interactivos_por_cliente + 1),
+                    "análisis interactivos",
+                )
+
+    # ─── API pública ─────────────────────────────────────────────────
+
+    def enviar(
+        self,
+        analisis_id: UUID,
+        coro: Coroutine[Any, Any, Any],
+        cliente: str = "anonimo",
+        prioridad: PrioridadAnalisis = PrioridadAnalisis.NORMAL,
+        proyecto: str = "",
+    ) -> bool:
+        """
+        Programa la corrutina del análisis. Devuelve False si ya hay una tarea
+        en vuelo para ese análisis (la corrutina nueva se descarta). Lanza
+        ServicioSaturadoError / CuotaClienteExcedidaError si no se admite.
+        """
+        loop = self._asegurar_loop()
+        with self._lock:
+            if analisis_id in self._tareas:
+                coro.close()
+                return False
+            try:
+                self._admitir(cliente, prioridad)
+            except Exception:
+                coro.close()
+                raise
+            futuro = asyncio.run_coroutine_threadsafe(
+                self._ejecutar(coro, prioridad, cliente, proyecto), loop
+            )
+            self._tareas[analisis_id] = futuro
+            self._clientes[analisis_id] = (cliente, prioridad)
+            _sumar(self._por_cliente, cliente, 1)
+            if prioridad == PrioridadAnalisis.INTERACTIVA:
+                _sumar(self._interactivos_por_cliente, cliente, 1)
+
+        futuro.add_done_callback(lambda f: self._liberar(analisis_id, f))
+        return True
+
+    def _liberar(self, analisis_id: UUID, futuro: Future):
+        with self._lock:
+            if self._tareas.get(analisis_id) is not futuro:
+                return
+            del self._tareas[analisis_id]
+            cliente, prioridad = self._clientes.pop(analisis_id)
+            _sumar(self._por_cliente, cliente, -1)
+            if prioridad == PrioridadAnalisis.INTERACTIVA:
+                _sumar(self._interactivos_por_cliente, cliente, -1)
+
+    def cancelar(self, analisis_id: UUID) -> bool:
+        """
+        Cancela la tarea del análisis: aborta las requests httpx pendientes y
+        libera el slot del ejecutor. Devuelve False si no había nada en vuelo.
+        """
+        with self._lock:
+            futuro = self._tareas.get(analisis_id)
+        if futuro is None:
+            return False
+        return futuro.cancel()
+
+    def en_vuelo(self, analisis_id: UUID) -> bool:
+        with self._lock:
+            return analisis_id in self._tareas
+
+    def estadisticas(self) -> dict[str, Any]:
+        with self._lock:
+            pendientes = len(self._tareas)
+        en_curso = self._en_curso
+        return {
+            "en_curso": en_curso,
+            "en_cola": max(0, pendientes - en_curso),
+            "max_concurrentes": self.max_concurrentes,
+            "max_en_cola": self.max_en_cola,
+            "duracion_tipica_segundos": round(self._duracion_tipica(), 2),
+        }
+
+    def correr(self, coro: Coroutine[Any, Any, Any], timeout: float = 10.0) -> Any:
+        """Ejecuta una corrutina en el bucle del ejecutor y espera su resultado."""
+        with self._lock:
+            loop = self._loop
+        if loop is None:
+            coro.close()
+            return None
+        return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+    def iniciar_servicio(self, coro: Coroutine[Any, Any, Any]) -> Future:
+        """
+        Lanza una corrutina de fondo en el bucle del ejecutor, fuera de los
+        slots y del control de admisión. Se cancela en `detener`.
+        """
+        loop = self._asegurar_loop()
+        futuro = asyncio.run_coroutine_threadsafe(coro, loop)
+        with self._lock:
+            self._servicios.append(futuro)
+        return futuro
+
+    async def _esperar_tareas(self, timeout: float):
+        actual = asyncio.current_task()
+        tareas = [tarea for tarea in asyncio.all_tasks() if tarea is not actual]
+        if tareas:
+            await asyncio.wait(tareas, timeout=timeout)
+
+    def detener(self, limpieza: Coroutine[Any, Any, Any] | None = None, espera: float = 10.0):
+        """
+        Cancela todo lo pendiente, espera hasta `espera` segundos a que las
+        tareas terminen de procesar la cancelación (un análisis interrumpido
+        vuelve a PENDIENTE), corre la `limpieza` opcional (p. ej. cerrar
+        pools) en el propio bucle y lo detiene (shutdown de la app).
+        """
+        with self._lock:
+            futuros = list(self._tareas.values()) + self._servicios
+            loop = self._loop
+        for futuro in futuros:
+            futuro.cancel()
+        self.correr(self._esperar_tareas(espera), timeout=espera + 1)
+        if limpieza is not None:
+            self.correr(limpieza)
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+
+
+ejecutor = EjecutorAnalisis(
+    max_concurrentes=settings.max_analisis_concurrentes,
+    max_en_cola=settings.max_analisis_en_cola,
+    max_por_cliente=settings.max_analisis_por_cliente,
+    max_interactivos_por_cliente=settings.max_analisis_interactivos_por_cliente,
+    fraccion_cola_lote=settings.fraccion_cola_lote,
+    planificador=PlanificadorJusto(
+        pesos_clientes=settings.pesos_clientes,
+        cuota_minima=settings.cuota_minima_cliente,
+    ),
+)
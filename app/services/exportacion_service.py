@@ -0,0 +1,118 @@
+import csv
+import io
+import json
+import logging
+from datetime import date
+from typing import Iterator
+
+from app.crud import iterar_lotes_exportacion
+from app.db import SessionLectura
+from app.models import Analisis
+from app.models.enums import EstadoAnalisis
+from app.schemas.analisis import AnalisisOut
+
+logger = logging.getLogger("exportacion_service")
+
+# Se acumulan filas hasta este tamaño antes de emitir un chunk HTTP
+_TAMANO_CHUNK = 64 * 1024
+
+COLUMNAS_CSV = [
+    "id",
+    "proyecto_codigo",
+    "periodo_desde",
+    "periodo_hasta",
+    "estado",
+    "fecha_solicitud",
+    "version",
+    "error_mensaje",
+    "score_coherencia",
+    "riesgos_identificados",
+    "resumen_general",
+    "estado_ejecucion",
+    "estado_planificacion",
+    "estado_seguridad",
+    "estado_validaciones",
+    "generado_at",
+    "observaciones",
+]
+
+
+def _fila_csv(analisis: Analisis) -> list:
+    r = analisis.resultado
+    fila = [
+        analisis.id,
+        analisis.proyecto_codigo,
+        analisis.periodo_desde,
+        analisis.periodo_hasta,
+        analisis.estado.value,
+        analisis.fecha_solicitud.isoformat(),
+        analisis.version,
+        analisis.error_mensaje or "",
+    ]
+    if r is None:
+        return fila + [""] * (len(COLUMNAS_CSV) - len(fila))
+    observaciones = [
+        {
+            "categoria": o.categoria.value,
+            "nivel": o.nivel.value,
+            "titulo": o.titulo,
+            "descripcion": o.descripcion,
+            "recomendacion": o.recomendacion,
+            "orden": o.orden,
+        }
+        for o in r.observaciones
+    ]
+    return fila + [
+        r.score_coherencia if r.score_coherencia is not None else "",
+        "; ".join(r.riesgos_identificados or []),
+        r.resumen_general,
+        r.estado_ejecucion,
+        r.estado_planificacion,
+        r.estado_seguridad,
+        r.estado_validaciones,
+        r.generado_at.isoformat(),
+        # Las observaciones son una lista: van como JSON en una sola celda
+        json.dumps(observaciones, ensure_ascii=False),
+    ]
+
+
+def exportar_analisis(
+    formato: str = "ndjson",
+    proyecto_codigo: str | None = None,
+    desde: date | None = None,
+    hasta: date | None = None,
+    estado: EstadoAnalisis | None = None,
+    tamano_lote: int = 500,
+) -> Iterator[bytes]:
+    """
+    Genera el export como chunks de bytes para un StreamingResponse. Abre su
+    propia sesión (la de la request ya se cerró cuando empieza el streaming)
+    contra la réplica de lectura si hay una, y nunca tiene en memoria más de
+    un lote de análisis.
+    """
+    db = SessionLectura()
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer) if formato == "csv" else None
+    if escritor is not None:
+        escritor.writerow(COLUMNAS_CSV)
+
+    filas = 0
+    try:
+        for lote in iterar_lotes_exportacion(db, proyecto_codigo, desde, hasta, estado, tamano_lote):
+            for analisis in lote:
+                if escritor is not None:
+                    escritor.writerow(_fila_csv(analisis))
+                else:
+                    buffer.write(AnalisisOut.model_validate(analisis).model_dump_json())
+                    buffer.write("\n")
+                filas += 1
+
+                if buffer.tell() >= _TAMANO_CHUNK:
+                    yield buffer.getvalue().encode("utf-8")
+                    buffer.seek(0)
+                    buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+        logger.info(f"📤 Export {formato} completado: {filas} análisis.")
+    finally:
+        db.close()
@@ -0,0 +1,77 @@
+import hashlib
+import logging
+from typing import Any, Callable
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.respuestas import RespuestaJSONRapida
+from app.core.exceptions import IdempotenciaConflictoError, IdempotenciaEnCursoError
+from app.crud import crud_idempotencia
+
+logger = logging.getLogger("idempotencia")
+
+
+def huella_solicitud(cuerpo: bytes | str) -> str:
+    """Huella del cuerpo de la petición para detectar reusos de la clave con otro contenido."""
+    if isinstance(cuerpo, str):
+        cuerpo = cuerpo.encode("utf-8")
+    return hashlib.sha256(cuerpo).hexdigest()
+
+
+def _reservar(
+    db: Session, clave: str, endpoint: str, huella: str
+) -> tuple[Any, RespuestaJSONRapida | None]:
+    """(registro reservado, None) si la clave es nueva, o (None, respuesta guardada) si es un reintento."""
+    registro, es_nueva = crud_idempotencia.reservar_clave(
+        db, clave, endpoint, huella, settings.idempotencia_ttl_segundos, settings.idempotencia_reserva_segundos
+    )
+    if es_nueva:
+        return registro, None
+    if registro.huella_solicitud != huella:
+        raise IdempotenciaConflictoError(clave)
+    if registro.status_code is None:
+        raise IdempotenciaEnCursoError(clave)
+    return None, respuesta_guardada(registro)
+
+
+def respuesta_guardada(registro) -> RespuestaJSONRapida:
+    """La respuesta original de una clave ya completada, marcada como replay."""
+    logger.info(f"🔁 Replay idempotente de {registro.endpoint} (clave {registro.clave}).")
+    return RespuestaJSONRapida(
+        status_code=registro.status_code,
+        content=registro.respuesta,
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def responder_idempotente(
+    db: Session,
+    clave: str | None,
+    endpoint: str,
+    huella: str,
+    status_code: int,
+    operacion: Callable[[], Any],
+) -> RespuestaJSONRapida:
+    """
+    Ejecuta `operacion` una sola vez por Idempotency-Key. Los reintentos con
+    la misma clave reciben la respuesta almacenada sin repetir el trabajo.
+    Sin clave, se comporta como un endpoint normal.
+    """
+    if not clave:
+        return RespuestaJSONRapida(status_code=status_code, content=jsonable_encoder(operacion()))
+
+    registro, repetida = _reservar(db, clave, endpoint, huella)
+    if repetida is not None:
+        return repetida
+
+    try:
+        contenido = jsonable_encoder(operacion())
+    except Exception:
+        crud_idempotencia.liberar_clave(db, registro)
+        raise
+
+    crud_idempotencia.completar_clave(db, registro, status_code, contenido)
+    return RespuestaJSONRapida(status_code=status_code, content=contenido)
+
@@ -0,0 +1,119 @@
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.core.exceptions import AnalisisNotFoundError, InformeNoDisponibleError
+from app.crud import crud_analisis, get_informe, guardar_informe
+from app.models import Analisis
+from app.models.enums import EstadoAnalisis
+from app.schemas.analisis import AnalisisOut
+from app.services.trazas import traza
+from app.utils.cache import CacheLRU
+from app.utils.informe_html import VERSION_PLANTILLA, renderizar_informe_html
+
+logger = logging.getLogger("informes")
+
+# (resultado_id, versión de plantilla) → (etag, html). Un reproceso crea un
+# resultado nuevo y un cambio de plantilla otra versión: no hace falta invalidar
+_cache_informes = CacheLRU(settings.cache_informes_max)
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _pool_render() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: un fork copiaría el proceso con los hilos del ejecutor y de
+            # las trazas a mitad de camino (locks tomados, conexiones abiertas)
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.informes_procesos, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def cerrar_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _etag(contenido: bytes) -> str:
+    return f'"{hashlib.sha256(contenido).hexdigest()[:32]}"'
+
+
+def _guardar(db: Session, resultado_id: UUID, contenido: bytes) -> tuple[str, bytes]:
+    etag = _etag(contenido)
+    guardar_informe(db, resultado_id, VERSION_PLANTILLA, contenido, etag)
+    _cache_informes.set((resultado_id, VERSION_PLANTILLA), (etag, contenido))
+    return etag, contenido
+
+
+async def generar_informe(db: Session, analisis: Analisis) -> tuple[str, bytes] | None:
+    """
+    Renderiza y guarda el informe de un análisis recién COMPLETADO. El
+    render (CPU) corre en el pool de procesos; el bucle solo espera.
+    """
+    if analisis.estado != EstadoAnalisis.COMPLETADO or analisis.resultado is None:
+        return None
+    datos = AnalisisOut.model_validate(analisis).model_dump(mode="json")
+    with traza("informe.renderizar", plantilla=VERSION_PLANTILLA):
+        contenido = await asyncio.get_running_loop().run_in_executor(
+            _pool_render(), renderizar_informe_html, datos
+        )
+    return _guardar(db, analisis.resultado.id, contenido)
+
+
+def _buscar_informe(db: Session, analisis_id: UUID) -> tuple[UUID, tuple[str, bytes] | None, dict | None]:
+    """
+    (resultado_id, (etag, html) ya generado o None, datos para renderizarlo
+    si falta). Cache en memoria y luego la tabla.
+    """
+    analisis = crud_analisis.get_analisis(db, analisis_id)
+    if not analisis:
+        raise AnalisisNotFoundError(str(analisis_id))
+    if analisis.estado != EstadoAnalisis.COMPLETADO or analisis.resultado is None:
+        raise InformeNoDisponibleError(str(analisis_id), analisis.estado.value)
+
+    resultado_id = analisis.resultado.id
+    clave = (resultado_id, VERSION_PLANTILLA)
+    en_cache = _cache_informes.get(clave)
+    if en_cache is not None:
+        return resultado_id, en_cache, None
+
+    informe = get_informe(db, resultado_id, VERSION_PLANTILLA)
+    if informe is not None:
+        _cache_informes.set(clave, (informe.etag, informe.contenido))
+        return resultado_id, (informe.etag, informe.contenido), None
+    return resultado_id, None, AnalisisOut.model_validate(analisis).model_dump(mode="json")
+
+
+async def obtener_informe(db: Session, analisis_id: UUID) -> tuple[str, bytes]:
+    """
+    (etag, html) del informe: cache en memoria, luego la tabla y, si no
+    existe para la plantilla vigente, se renderiza en el pool y se guarda.
+    Las consultas van al threadpool y el render al pool de procesos: la
+    request no ocupa el bucle ni un hilo mientras espera el render.
+    """
+    resultado_id, informe, datos = await run_in_threadpool(_buscar_informe, db, analisis_id)
+    if informe is not None:
+        return informe
+
+    # Resultado previo a esta plantilla: se renderiza una vez
+    logger.info(f"🖨️  Renderizando informe de {analisis_id} (plantilla {VERSION_PLANTILLA}).")
+    with traza("informe.renderizar", plantilla=VERSION_PLANTILLA):
+        contenido = await asyncio.get_running_loop().run_in_executor(
+            _pool_render(), renderizar_informe_html, datos
+        )
+    return await run_in_threadpool(_guardar, db, resultado_id, contenido)
@@ -0,0 +1,197 @@
+import hashlib
+import logging
+from typing import AsyncIterator, Callable
+from uuid import UUID
+
+from fastapi import status
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.core.exceptions import (
+    AnalisisNotFoundError,
+    IdempotenciaConflictoError,
+    IdempotenciaEnCursoError,
+    RegistroInvalidoError,
+    SnapshotNoDisponibleError,
+)
+from app.core.respuestas import RespuestaJSONRapida
+from app.crud import crud_analisis, crud_idempotencia, crud_snapshot
+from app.models import DatoAvance, DatoEtapa, DatoSeguridad, DatoValidacion
+from app.models.enums import EstadoAnalisis
+from app.schemas.snapshot import (
+    DatoAvanceBase,
+    DatoEtapaBase,
+    DatoProyectoBase,
+    DatoSeguridadBase,
+    DatoValidacionBase,
+)
+from app.services.idempotencia_service import respuesta_guardada
+
+logger = logging.getLogger("ingesta_service")
+
+# Sección del endpoint → (esquema de cada línea, tabla destino)
+SECCIONES = {
+    "etapas": (DatoEtapaBase, DatoEtapa),
+    "avances": (DatoAvanceBase, DatoAvance),
+    "seguridad": (DatoSeguridadBase, DatoSeguridad),
+    "validaciones": (DatoValidacionBase, DatoValidacion),
+}
+
+
+async def lineas_ndjson(cuerpo: AsyncIterator[bytes], max_bytes: int) -> AsyncIterator[tuple[int, bytes]]:
+    """
+    Parte el cuerpo en líneas a medida que llega (request.stream()), sin
+    tenerlo entero en memoria. Devuelve (número de línea, contenido).
+    """
+    pendiente = b""
+    numero = 0
+    async for chunk in cuerpo:
+        pendiente += chunk
+        *lineas, pendiente = pendiente.split(b"\n")
+        for linea in lineas:
+            numero += 1
+            if linea.strip():
+                yield numero, linea
+        if len(pendiente) > max_bytes:
+            raise RegistroInvalidoError(numero + 1, f"supera el máximo de {max_bytes} bytes por línea.")
+    if pendiente.strip():
+        yield numero + 1, pendiente
+
+
+async def _con_huella(cuerpo: AsyncIterator[bytes], huella) -> AsyncIterator[bytes]:
+    """Deja pasar el cuerpo tal cual y va sumando cada chunk al sha256 `huella`."""
+    async for chunk in cuerpo:
+        huella.update(chunk)
+        yield chunk
+
+
+async def huella_cuerpo(cuerpo: AsyncIterator[bytes]) -> str:
+    """sha256 de un cuerpo en streaming, sin guardarlo."""
+    huella = hashlib.sha256()
+    async for _ in _con_huella(cuerpo, huella):
+        pass
+    return huella.hexdigest()
+
+
+def _verificar_editable(db: Session, analisis_id: UUID):
+    analisis = crud_analisis.get_analisis(db, analisis_id)
+    if not analisis:
+        raise AnalisisNotFoundError(str(analisis_id))
+    if analisis.estado == EstadoAnalisis.PROCESANDO:
+        raise SnapshotNoDisponibleError(str(analisis_id), "el análisis se está procesando, no admite cambios.")
+    return analisis
+
+
+def iniciar_snapshot(db: Session, analisis_id: UUID, proyecto: DatoProyectoBase) -> UUID:
+    """Abre (o reinicia) el snapshot por partes del análisis con los datos del proyecto."""
+    analisis = _verificar_editable(db, analisis_id)
+    snapshot = crud_snapshot.iniciar_snapshot(db, analisis, proyecto.model_dump())
+    logger.info(f"📥 Snapshot por partes iniciado para {analisis_id}.")
+    return snapshot.id
+
+
+async def ingerir_seccion(
+    db: Session,
+    analisis_id: UUID,
+    seccion: str,
+    cuerpo: AsyncIterator[bytes],
+    antes_del_commit: Callable[[int, str], None] | None = None,
+) -> int:
+    """
+    Valida cada línea NDJSON contra el esquema de la sección y la inserta en
+    su tabla Dato* en lotes de `ingesta_lote_filas` (INSERT masivo). Todo el
+    envío es una transacción: si una línea es inválida no queda nada a medias.
+    La memoria depende del tamaño del lote, no del cuerpo.
+
+    `antes_del_commit(total, huella)` corre dentro de esa transacción, con
+    el sha256 del cuerpo leído, para sumar lo que deba confirmarse junto
+    con los registros.
+    """
+    esquema, modelo = SECCIONES[seccion]
+    await run_in_threadpool(_verificar_editable, db, analisis_id)
+    snapshot_id = await run_in_threadpool(crud_snapshot.get_snapshot_por_partes_id, db, analisis_id)
+    if snapshot_id is None:
+        raise SnapshotNoDisponibleError(
+            str(analisis_id), "primero hay que iniciarlo con PUT /snapshot/proyecto."
+        )
+
+    lote: list[dict] = []
+    total = 0
+    huella = hashlib.sha256()
+    try:
+        # Cada registro guarda su posición: el snapshot se rearma en el orden de carga
+        orden = await run_in_threadpool(crud_snapshot.siguiente_orden, db, modelo, snapshot_id)
+        async for numero, linea in lineas_ndjson(_con_huella(cuerpo, huella), settings.ingesta_linea_max_bytes):
+            try:
+                registro = esquema.model_validate_json(linea)
+            except ValidationError as e:
+                raise RegistroInvalidoError(numero, str(e.errors(include_url=False)[:3]))
+            lote.append({"snapshot_id": snapshot_id, "orden": orden + total + len(lote), **registro.model_dump()})
+            if len(lote) >= settings.ingesta_lote_filas:
+                # El INSERT es bloqueante: fuera del bucle de eventos
+                await run_in_threadpool(crud_snapshot.insertar_datos, db, modelo, lote)
+                total += len(lote)
+                lote = []
+        await run_in_threadpool(crud_snapshot.insertar_datos, db, modelo, lote)
+        total += len(lote)
+        if antes_del_commit is not None:
+            await run_in_threadpool(antes_del_commit, total, huella.hexdigest())
+        await run_in_threadpool(db.commit)
+    except BaseException:
+        await run_in_threadpool(db.rollback)
+        raise
+
+    logger.info(f"📥 {total} registros de {seccion} agregados al snapshot de {analisis_id}.")
+    return total
+
+
+def _respuesta(seccion: str, registros: int) -> dict:
+    return {"mensaje": "Registros agregados", "seccion": seccion, "registros": registros}
+
+
+async def ingerir_seccion_idempotente(
+    db: Session, clave: str | None, analisis_id: UUID, seccion: str, cuerpo: AsyncIterator[bytes]
+) -> RespuestaJSONRapida:
+    """
+    ingerir_seccion una sola vez por Idempotency-Key. El cuerpo llega en
+    streaming, así que su huella (sha256) se conoce al terminar de leerlo:
+    se guarda con la respuesta en la misma transacción que los registros.
+    Un reintento se lee entero, sin insertar nada, y solo recibe la
+    respuesta guardada si su cuerpo es el mismo. La reserva dura
+    `ingesta_reserva_segundos` para que un upload largo no se dé por
+    abandonado mientras sigue llegando.
+    """
+    if not clave:
+        total = await ingerir_seccion(db, analisis_id, seccion, cuerpo)
+        return RespuestaJSONRapida(status_code=status.HTTP_200_OK, content=_respuesta(seccion, total))
+
+    endpoint = f"POST /analisis/{analisis_id}/snapshot/{seccion}"
+    registro, es_nueva = await run_in_threadpool(
+        crud_idempotencia.reservar_clave,
+        db, clave, endpoint, "", settings.idempotencia_ttl_segundos, settings.ingesta_reserva_segundos,
+    )
+    if not es_nueva:
+        if registro.status_code is None:
+            raise IdempotenciaEnCursoError(clave)
+        if await huella_cuerpo(cuerpo) != registro.huella_solicitud:
+            raise IdempotenciaConflictoError(clave)
+        return respuesta_guardada(registro)
+
+    contenido: dict = {}
+
+    def completar(total: int, huella: str):
+        contenido.update(_respuesta(seccion, total))
+        if not crud_idempotencia.completar_clave(
+            db, registro, status.HTTP_200_OK, contenido, huella=huella, commit=False
+        ):
+            # Otra request retomó la reserva y carga el envío: estos registros se descartan
+            raise IdempotenciaEnCursoError(clave)
+
+    try:
+        await ingerir_seccion(db, analisis_id, seccion, cuerpo, completar)
+    except BaseException:
+        await run_in_threadpool(crud_idempotencia.liberar_clave, db, registro)
+        raise
+    return RespuestaJSONRapida(status_code=status.HTTP_200_OK, content=contenido)
@@ -0,0 +1,29 @@
+import threading
+
+
+class RegistroLatencias:
+    """
+    Latencia típica por modelo, como media móvil exponencial de las
+    invocaciones exitosas. Se usa para descartar modelos que no entran
+    en el presupuesto restante del análisis.
+    """
+
+    def __init__(self, alfa: float = 0.3):
+        self.alfa = alfa
+        self._valores: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, clave: str, segundos: float):
+        with self._lock:
+            previo = self._valores.get(clave)
+            if previo is None:
+                self._valores[clave] = segundos
+            else:
+                self._valores[clave] = self.alfa * segundos + (1 - self.alfa) * previo
+
+    def tipica(self, clave: str) -> float | None:
+        with self._lock:
+            return self._valores.get(clave)
+
+
+registro_latencias = RegistroLatencias()
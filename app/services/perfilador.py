@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from types import FrameType
+
+from app.config import settings
+
+logger = logging.getLogger("perfilador")
+
+_NOMBRE_VALIDO = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+def _pila(frame: FrameType | None) -> list[str]:
+    """Frames de la raíz a la hoja, en el formato `funcion (archivo:linea)`."""
+    marcos = []
+    while frame is not None:
+        codigo = frame.f_code
+        marcos.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    marcos.reverse()
+    return marcos
+
+
+def _pila_corrutina(coro) -> list[str]:
+    """Cadena de awaits de una corrutina suspendida, de afuera hacia adentro."""
+    marcos = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        codigo = frame.f_code
+        marcos.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{frame.f_lineno})")
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return marcos
+
+
+class PerfiladorMuestreo:
+    """
+    Profiler por muestreo de una sola tarea asyncio. Un hilo aparte mira
+    cada `intervalo` segundos qué está haciendo la tarea:
+
+    - si es la que corre en el bucle, toma la pila real del hilo del bucle
+      (tiempo de CPU: armar prompts, parsear, serializar);
+    - si está suspendida, toma la pila de la corrutina con el prefijo
+      `[esperando]` (HTTP al LLM, cola del ejecutor, locks).
+
+    El resultado son pilas colapsadas (formato de flamegraph.pl / speedscope)
+    con tiempo de pared, que se suma a los spans para ver dónde se fue.
+    """
+
+    def __init__(self, tarea: asyncio.Task, loop: asyncio.AbstractEventLoop, intervalo: float):
+        self.tarea = tarea
+        self.loop = loop
+        self.intervalo = intervalo
+        self.muestras: Counter[str] = Counter()
+        self._hilo_loop = threading.get_ident()
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._correr, name="perfilador", daemon=True)
+
+    def iniciar(self):
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        self._hilo.join()
+
+    def _muestra(self) -> list[str] | None:
+        if self.tarea.done():
+            return None
+        # Lecturas sin lock desde otro hilo: una muestra inconsistente solo es ruido
+        if asyncio.current_task(self.loop) is self.tarea:
+            frame = sys._current_frames().get(self._hilo_loop)
+            return _pila(frame)
+        pila = _pila_corrutina(self.tarea.get_coro())
+        if not pila:
+            return None
+        return ["[esperando]"] + pila
+
+    def _correr(self):
+        while not self._detener.wait(self.intervalo):
+            try:
+                pila = self._muestra()
+            except Exception:
+                continue
+            if pila:
+                self.muestras[";".join(pila)] += 1
+
+    def colapsado(self) -> str:
+        return "".join(f"{pila} {cantidad}\n" for pila, cantidad in self.muestras.most_common())
+
+
+def ruta_perfil(nombre: str) -> str:
+    if not _NOMBRE_VALIDO.match(nombre):
+        raise ValueError(f"Nombre de perfil inválido: {nombre}")
+    return os.path.join(settings.perfiles_dir, f"{nombre}.folded")
+
+
+def leer_perfil(nombre: str) -> str | None:
+    """Pilas colapsadas guardadas para `nombre`, o None si no hay perfil."""
+    try:
+        with open(ruta_perfil(nombre), encoding="utf-8") as archivo:
+            return archivo.read()
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _guardar_perfil(ruta: str, contenido: str):
+    """
+    Escribe el perfil y poda `perfiles_dir` a los `perfiles_max` más
+    recientes, para que el perfilado a pedido no llene el disco.
+    """
+    directorio = os.path.dirname(ruta) or "."
+    os.makedirs(directorio, exist_ok=True)
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        archivo.write(contenido)
+
+    perfiles = [e for e in os.scandir(directorio) if e.is_file() and e.name.endswith(".folded")]
+    if len(perfiles) <= settings.perfiles_max:
+        return
+    perfiles.sort(key=lambda e: e.stat().st_mtime)
+    for entrada in perfiles[:len(perfiles) - settings.perfiles_max]:
+        try:
+            os.remove(entrada.path)
+        except FileNotFoundError:
+            pass
+
+
+@asynccontextmanager
+async def perfilar(nombre: str, activo: bool = True):
+    """
+    Perfila la tarea actual mientras dura el bloque y guarda las pilas
+    colapsadas en `perfiles_dir/<nombre>.folded`. Con `activo=False` no
+    hace nada, para poder envolver el código siempre.
+    """
+    if not activo:
+        yield
+        return
+
+    perfilador = PerfiladorMuestreo(
+        asyncio.current_task(), asyncio.get_running_loop(), settings.perfilado_intervalo_ms / 1000
+    )
+    inicio = time.monotonic()
+    perfilador.iniciar()
+    try:
+        yield
+    finally:
+        perfilador.detener()
+        ruta = ruta_perfil(nombre)
+        # El disco fuera del bucle: lo comparten todos los análisis en curso
+        await asyncio.to_thread(_guardar_perfil, ruta, perfilador.colapsado())
+        logger.info(
+            f"🔥 Perfil de {nombre}: {sum(perfilador.muestras.values())} muestras "
+            f"en {time.monotonic() - inicio:.1f}s → {ruta}"
+        )
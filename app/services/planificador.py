@@ -0,0 +1,173 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Any
+
+from app.models.enums import PrioridadAnalisis
+
+# Reparto de turnos entre niveles de prioridad cuando todos tienen trabajo en
+# cola: de cada 7 despachos, 4 son interactivos, 2 normales y 1 de lote. Un
+# nivel con cola nunca se queda sin turnos, aunque lleguen interactivos sin parar
+_PESO_PRIORIDAD = {
+    PrioridadAnalisis.INTERACTIVA: 4.0,
+    PrioridadAnalisis.NORMAL: 2.0,
+    PrioridadAnalisis.LOTE: 1.0,
+}
+
+
+class _EsperasCliente:
+    """Estadísticas de espera en cola de un cliente (ventana de las últimas N)."""
+
+    def __init__(self, ventana: int = 200):
+        self.total = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+        self.recientes: deque[float] = deque(maxlen=ventana)
+
+    def registrar(self, espera: float):
+        self.total += 1
+        self.suma += espera
+        self.maximo = max(self.maximo, espera)
+        self.recientes.append(espera)
+
+    def resumen(self) -> dict[str, Any]:
+        ordenadas = sorted(self.recientes)
+        p95 = ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * 0.95))] if ordenadas else 0.0
+        return {
+            "despachados": self.total,
+            "espera_media_segundos": round(self.suma / self.total, 3) if self.total else 0.0,
+            "espera_p95_segundos": round(p95, 3),
+            "espera_max_segundos": round(self.maximo, 3),
+        }
+
+
+class _ColaNivel:
+    """Cola WFQ de un nivel de prioridad, con su propio tiempo virtual por flujo."""
+
+    def __init__(self, peso: float):
+        self.peso = peso
+        self.cola: list[tuple[float, int, asyncio.Future, str, str, float]] = []
+        self.tiempo_virtual = 0.0
+        self.ultimo_fin: dict[tuple[str, str], float] = {}
+        self.activos: dict[tuple[str, str], int] = {}
+        # Etiqueta del nivel para repartir los turnos entre niveles
+        self.pase = 0.0
+
+
+class PlanificadorJusto:
+    """
+    Cola de despacho con weighted fair queuing (start-time fair queuing) en
+    dos planos. Entre niveles de prioridad, los turnos se reparten según
+    _PESO_PRIORIDAD: lo interactivo sale antes y más seguido, pero el lote
+    conserva una parte mínima aunque un cliente mande todo como INTERACTIVA.
+    Dentro de cada nivel, por flujo cliente + proyecto_codigo: el peso del
+    cliente se reparte entre sus proyectos activos y nunca baja de la cuota
+    mínima garantizada, así un lote de cientos de análisis de un tenant no
+    deja esperando al resto.
+
+    push/pop se llaman desde el bucle del ejecutor y las estadísticas desde
+    los hilos de las requests, por eso el estado va bajo lock.
+    """
+
+    def __init__(self, pesos_clientes: dict[str, float], cuota_minima: float):
+        self.pesos_clientes = pesos_clientes
+        self.cuota_minima = cuota_minima
+
+        self._niveles = {prioridad: _ColaNivel(peso) for prioridad, peso in _PESO_PRIORIDAD.items()}
+        self._secuencia = itertools.count()
+        # Pase del último nivel despachado: el reloj virtual entre niveles
+        self._pase_virtual = 0.0
+
+        self._esperas: dict[str, _EsperasCliente] = {}
+        self._lock = threading.Lock()
+
+    def __bool__(self) -> bool:
+        return any(nivel.cola for nivel in self._niveles.values())
+
+    def _flujos_activos(self) -> set[tuple[str, str]]:
+        return {flujo for nivel in self._niveles.values() for flujo in nivel.activos}
+
+    def _peso_flujo(self, cliente: str) -> float:
+        flujos = self._flujos_activos()
+        peso_cliente = self.pesos_clientes.get(cliente, 1.0)
+        proyectos_activos = sum(1 for (c, _) in flujos if c == cliente) or 1
+        peso = peso_cliente / proyectos_activos
+
+        # Cuota mínima: el flujo recibe al menos esa fracción de la suma de pesos activos
+        clientes_activos = {c for (c, _) in flujos} | {cliente}
+        suma = sum(self.pesos_clientes.get(c, 1.0) for c in clientes_activos)
+        return max(peso, self.cuota_minima * suma)
+
+    def push(self, turno: asyncio.Future, prioridad: PrioridadAnalisis, cliente: str, proyecto: str):
+        nivel = self._niveles[prioridad]
+        flujo = (cliente, proyecto)
+        with self._lock:
+            if not nivel.cola:
+                # Un nivel que estuvo vacío no acumula turnos para cuando vuelve
+                nivel.pase = max(nivel.pase, self._pase_virtual)
+            nivel.activos[flujo] = nivel.activos.get(flujo, 0) + 1
+            inicio = max(nivel.tiempo_virtual, nivel.ultimo_fin.get(flujo, 0.0))
+            nivel.ultimo_fin[flujo] = inicio + 1.0 / self._peso_flujo(cliente)
+            heapq.heappush(nivel.cola, (
+                inicio, next(self._secuencia), turno, cliente, proyecto, time.monotonic(),
+            ))
+
+    def pop(self) -> asyncio.Future | None:
+        """Próximo turno vigente (los cancelados se descartan) o None si no hay."""
+        with self._lock:
+            while True:
+                con_cola = [nivel for nivel in self._niveles.values() if nivel.cola]
+                if not con_cola:
+                    return None
+                # Menor pase; a igualdad, el nivel de mayor prioridad (orden de _PESO_PRIORIDAD)
+                nivel = min(con_cola, key=lambda n: n.pase)
+                inicio, _, turno, cliente, proyecto, encolado = heapq.heappop(nivel.cola)
+                self._salir(nivel, cliente, proyecto)
+                if turno.done():
+                    continue
+                nivel.tiempo_virtual = max(nivel.tiempo_virtual, inicio)
+                self._pase_virtual = nivel.pase
+                nivel.pase += 1.0 / nivel.peso
+                self._registrar_espera(cliente, time.monotonic() - encolado)
+                return turno
+
+    def despacho_inmediato(self, cliente: str):
+        """Registra un análisis que no tuvo que esperar en cola."""
+        with self._lock:
+            self._registrar_espera(cliente, 0.0)
+
+    def _registrar_espera(self, cliente: str, espera: float):
+        self._esperas.setdefault(cliente, _EsperasCliente()).registrar(espera)
+
+    def _salir(self, nivel: _ColaNivel, cliente: str, proyecto: str):
+        flujo = (cliente, proyecto)
+        restantes = nivel.activos.get(flujo, 1) - 1
+        if restantes > 0:
+            nivel.activos[flujo] = restantes
+        else:
+            nivel.activos.pop(flujo, None)
+            # Un flujo que se vacía no acumula crédito para cuando vuelva
+            nivel.ultimo_fin.pop(flujo, None)
+
+    def estadisticas(self) -> dict[str, Any]:
+        with self._lock:
+            esperas = {cliente: e.resumen() for cliente, e in self._esperas.items()}
+            en_cola: dict[str, int] = {}
+            for nivel in self._niveles.values():
+                for (cliente, _), cantidad in nivel.activos.items():
+                    en_cola[cliente] = en_cola.get(cliente, 0) + cantidad
+        return {
+            "cuota_minima": self.cuota_minima,
+            "pesos_prioridad": {prioridad.value: peso for prioridad, peso in _PESO_PRIORIDAD.items()},
+            "clientes": {
+                cliente: {
+                    "peso": self.pesos_clientes.get(cliente, 1.0),
+                    "en_cola": en_cola.get(cliente, 0),
+                    **esperas.get(cliente, _EsperasCliente().resumen()),
+                }
+                for cliente in set(esperas) | set(en_cola)
+            },
+        }
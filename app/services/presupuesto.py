@@ -0,0 +1,33 @@
+import time
+
+
+class PresupuestoAgotadoError(Exception):
+    """Se consumió el tiempo máximo asignado al análisis."""
+
+
+class AnalisisCanceladoError(Exception):
+    """El análisis pasó a CANCELADO (p. ej. desde otro proceso) mientras corría."""
+
+
+class Presupuesto:
+    """
+    Deadline de punta a punta de un análisis. Arranca cuando se acepta la
+    solicitud, así que el tiempo en cola también se descuenta.
+    """
+
+    def __init__(self, segundos: float):
+        self.total = segundos
+        self._limite = time.monotonic() + segundos
+
+    def restante(self) -> float:
+        return max(0.0, self._limite - time.monotonic())
+
+    def agotado(self) -> bool:
+        return self.restante() <= 0
+
+    def verificar(self, contexto: str = ""):
+        if self.agotado():
+            detalle = f" {contexto}" if contexto else ""
+            raise PresupuestoAgotadoError(
+                f"Se agotó el presupuesto de tiempo del análisis ({self.total:.0f} s).{detalle}"
+            )
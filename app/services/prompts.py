@@ -0,0 +1,211 @@
+import json
+from typing import Any, NamedTuple
+
+from app.config import settings
+
+SYSTEM_PROMPT = """
+        Sos analista técnico de obras. Generás informes profesionales en formato narrativo, tono formal y objetivo.
+        Usá exclusivamente los datos recibidos. No inventes información.
+        Si falta un dato, indicarlo como pendiente o no informado.
+
+        DEBES RESPONDER EXCLUSIVAMENTE UN JSON con esta estructura exacta:
+        {
+            "resumen_general": "Texto narrativo del estado general del proyecto...",
+            "estado_ejecucion": "Texto narrativo sobre avance y ejecución de tareas...",
+            "estado_planificacion": "Texto narrativo sobre cumplimiento de etapas y plazos...",
+            "estado_seguridad": "Texto narrativo sobre condiciones de seguridad e higiene...",
+            "estado_validaciones": "Texto narrativo sobre validaciones técnicas pendientes y aprobadas...",
+            "riesgos_identificados": ["Riesgo 1", "Riesgo 2"],
+            "score_coherencia": 85
+        }
+        No uses listas de puntos en los campos de texto. Todo debe ser prosa formal.
+        riesgos_identificados debe ser una lista de strings concisos, puede estar vacía [].
+        score_coherencia debe ser un número entero entre 0 y 100.
+        """
+
+class PromptPartes(NamedTuple):
+    """
+    Prompt de usuario dividido en un prefijo estable (se repite entre
+    análisis del mismo proyecto) y un sufijo variable. El prefijo es el que
+    se marca para el cache de prompts del proveedor.
+    """
+    prefijo: str
+    sufijo: str
+
+    @property
+    def texto(self) -> str:
+        return self.prefijo + self.sufijo
+
+
+def _render_proyecto(p: dict[str, Any]) -> str:
+    return f"""
+        Analiza los siguientes datos de obra:
+
+        PROYECTO:
+        Nombre: {p.get('proyecto_nombre')}
+        Responsable técnico: {p.get('responsable_tecnico_nombre')}
+        Ubicación: {p.get('ubicacion')}
+        Tipo de intervención: {p.get('tipo_intervencion')}
+        Superficie: {p.get('superficie_m2')} m²
+        Sistema constructivo: {p.get('sistema_constructivo')}
+        Fecha inicio: {p.get('fecha_inicio')}
+
+"""
+
+
+def _render_etapas(etapas: list[dict[str, Any]]) -> str:
+    etapas_texto = "\n".join([
+        f"  - {e.get('etapa_nombre')} (orden {e.get('etapa_orden')}): "
+        f"{e.get('estado')} | {e.get('fecha_inicio_estimada')} → {e.get('fecha_fin_estimada')}"
+        for e in etapas
+    ])
+    return f"""        ETAPAS PLANIFICADAS:
+{etapas_texto}
+
+"""
+
+
+def _items_texto(items: list[Any]) -> str:
+    # seguridad_higiene y validaciones_tecnicas son List[Any] — normalizamos a string
+    return '; '.join([
+        str(item) if not isinstance(item, dict) else json.dumps(item, ensure_ascii=False)
+        for item in items
+    ])
+
+
+def _render_avances(avances: list[dict[str, Any]]) -> str:
+    return "\n".join([
+        f"  - {a.get('fecha_registro')} | {a.get('etapa_nombre')} | "
+        f"{a.get('porcentaje_avance')}% | "
+        f"Tareas: {', '.join(a.get('tareas_principales', []))} | "
+        f"Oficios: {', '.join(a.get('oficios_activos', []))}"
+        for a in avances
+    ])
+
+
+def build_user_prompt(datos: dict[str, Any]) -> PromptPartes:
+    """
+    Arma el prompt de usuario a partir del volcado canónico del snapshot.
+    PROYECTO y ETAPAS forman el prefijo estable; avances, seguridad y
+    validaciones cambian en cada análisis.
+    """
+    p = datos.get('proyecto', {})
+    avances = datos.get('avances', [])
+    etapas = datos.get('etapas', [])
+    ultimo_avance = avances[-1] if avances else {}
+
+    prefijo = _render_proyecto(p) + _render_etapas(etapas)
+
+    avances_texto = _render_avances(avances)
+
+    sufijo = f"""        HISTORIAL DE AVANCES:
+{avances_texto}
+
+        ETAPA Y AVANCE ACTUAL:
+        Etapa: {ultimo_avance.get('etapa_nombre')} — {ultimo_avance.get('porcentaje_avance')}%
+        Tareas: {', '.join(ultimo_avance.get('tareas_principales', []))}
+        Oficios activos: {', '.join(ultimo_avance.get('oficios_activos', []))}
+
+        SEGURIDAD E HIGIENE:
+        {_items_texto(datos.get('seguridad_higiene', []))}
+
+        VALIDACIONES TÉCNICAS:
+        {_items_texto(datos.get('validaciones_tecnicas', []))}
+        """
+    return PromptPartes(prefijo, sufijo)
+
+
+# ─── Modo por secciones (map-reduce) ─────────────────────────────────
+
+SYSTEM_PROMPT_SECCION = """
+        Sos analista técnico de obras. Redactás UNA sección de un informe profesional, en prosa formal y objetiva.
+        Usá exclusivamente los datos recibidos. No inventes información.
+        Si falta un dato, indicarlo como pendiente o no informado.
+        Respondé SOLO con el texto de la sección: sin títulos, sin listas de puntos, sin JSON.
+        """
+
+SYSTEM_PROMPT_SINTESIS = """
+        Sos analista técnico de obras. Recibís las secciones ya redactadas de un informe y escribís la síntesis.
+        No agregues hechos que no estén en las secciones.
+
+        DEBES RESPONDER EXCLUSIVAMENTE UN JSON con esta estructura exacta:
+        {
+            "resumen_general": "Texto narrativo del estado general del proyecto...",
+            "riesgos_identificados": ["Riesgo 1", "Riesgo 2"],
+            "score_coherencia": 85
+        }
+        resumen_general debe ser prosa formal, sin listas de puntos.
+        riesgos_identificados debe ser una lista de strings concisos, puede estar vacía [].
+        score_coherencia debe ser un número entero entre 0 y 100 (coherencia entre avance, planificación, seguridad y validaciones).
+        """
+
+
+def build_section_prompts(datos: dict[str, Any]) -> dict[str, PromptPartes]:
+    """
+    Un prompt por sección narrativa, cada uno con solo la parte del snapshot
+    que necesita. El bloque PROYECTO es el prefijo común (cacheable del lado
+    del proveedor).
+    """
+    proyecto = _render_proyecto(datos.get('proyecto', {}))
+    etapas = _render_etapas(datos.get('etapas', []))
+    avances = f"""        HISTORIAL DE AVANCES:
+{_render_avances(datos.get('avances', []))}
+
+"""
+    return {
+        "estado_ejecucion": PromptPartes(proyecto, avances + """
+        Redactá la sección ESTADO DE EJECUCIÓN: avance de obra, tareas y oficios activos.
+        """),
+        "estado_planificacion": PromptPartes(proyecto + etapas, avances + """
+        Redactá la sección ESTADO DE PLANIFICACIÓN: cumplimiento de etapas y plazos frente al avance real.
+        """),
+        "estado_seguridad": PromptPartes(proyecto, f"""        SEGURIDAD E HIGIENE:
+        {_items_texto(datos.get('seguridad_higiene', []))}
+
+        Redactá la sección ESTADO DE SEGURIDAD: condiciones de seguridad e higiene.
+        """),
+        "estado_validaciones": PromptPartes(proyecto, f"""        VALIDACIONES TÉCNICAS:
+        {_items_texto(datos.get('validaciones_tecnicas', []))}
+
+        Redactá la sección ESTADO DE VALIDACIONES: validaciones técnicas pendientes y aprobadas.
+        """),
+    }
+
+
+def build_synthesis_prompt(datos: dict[str, Any], secciones: dict[str, str]) -> PromptPartes:
+    """Paso reduce: la síntesis ve las secciones redactadas, no el snapshot completo."""
+    proyecto = _render_proyecto(datos.get('proyecto', {}))
+    cuerpo = "\n\n".join(
+        f"        {nombre.upper()}:\n        {texto}" for nombre, texto in secciones.items()
+    )
+    return PromptPartes(proyecto, cuerpo + "\n")
+
+
+def construir_mensajes(system_prompt: str, user_prompt: str | PromptPartes, model: str) -> list[dict]:
+    """
+    Mensajes de chat para el modelo. Si el registro indica que el modelo
+    soporta cache de prompts, el system y el prefijo estable del usuario se
+    envían como bloques con `cache_control` para que el proveedor los reutilice.
+    """
+    if isinstance(user_prompt, str):
+        user_prompt = PromptPartes("", user_prompt)
+
+    if model not in settings.modelos_con_cache_prompt:
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt.texto},
+        ]
+
+    contenido_usuario = []
+    if user_prompt.prefijo:
+        contenido_usuario.append(
+            {"type": "text", "text": user_prompt.prefijo, "cache_control": {"type": "ephemeral"}}
+        )
+    contenido_usuario.append({"type": "text", "text": user_prompt.sufijo})
+    return [
+        {
+            "role": "system",
+            "content": [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}],
+        },
+        {"role": "user", "content": contenido_usuario},
+    ]
@@ -0,0 +1,143 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import httpx
+
+from app.config import settings
+from app.services.latencias import registro_latencias
+
+
+class ProveedorLLM:
+    """
+    Backend con API de chat completions compatible con OpenAI (OpenRouter,
+    llama.cpp / vLLM en la red local, ...). Cada uno tiene su propio pool de
+    conexiones, su límite de concurrencia y su lista de modelos.
+
+    El cliente httpx y el semáforo se crean perezosamente dentro del bucle
+    del ejecutor, que es donde corren todas las llamadas al LLM.
+    """
+
+    def __init__(
+        self,
+        nombre: str,
+        url: str,
+        api_key: str,
+        modelos: list[str],
+        max_concurrencia: int,
+    ):
+        self.nombre = nombre
+        self.url = url
+        self.api_key = api_key
+        self.modelos = modelos
+        self.max_concurrencia = max_concurrencia
+        self.headers = {"Content-Type": "application/json"}
+        if api_key:
+            self.headers["Authorization"] = f"Bearer {api_key}"
+
+        self._cliente: httpx.AsyncClient | None = None
+        self._semaforo: asyncio.Semaphore | None = None
+        self.en_uso = 0
+
+    @property
+    def clave_latencia(self) -> str:
+        return f"proveedor:{self.nombre}"
+
+    def cliente(self) -> httpx.AsyncClient:
+        if self._cliente is None:
+            self._cliente = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrencia,
+                    max_keepalive_connections=self.max_concurrencia,
+                ),
+            )
+        return self._cliente
+
+    def tiene_capacidad(self) -> bool:
+        return self.en_uso < self.max_concurrencia
+
+    def latencia_tipica(self) -> float | None:
+        return registro_latencias.tipica(self.clave_latencia)
+
+    @asynccontextmanager
+    async def slot(self, timeout: float | None = None):
+        """
+        Ocupa un lugar de concurrencia del backend mientras dura la request.
+        Con `timeout`, lanza asyncio.TimeoutError si no se libera uno a tiempo.
+        """
+        if self._semaforo is None:
+            self._semaforo = asyncio.Semaphore(self.max_concurrencia)
+        await asyncio.wait_for(self._semaforo.acquire(), timeout)
+        self.en_uso += 1
+        try:
+            yield
+        finally:
+            self.en_uso -= 1
+            self._semaforo.release()
+
+    async def post(self, payload: dict, timeout: float) -> httpx.Response:
+        return await self.cliente().post(self.url, headers=self.headers, json=payload, timeout=timeout)
+
+    async def cerrar(self):
+        if self._cliente is not None:
+            await self._cliente.aclose()
+            self._cliente = None
+
+
+class RegistroProveedores:
+    """Backends configurados y la política de ruteo entre ellos."""
+
+    def __init__(self, proveedores: list[ProveedorLLM]):
+        self.proveedores = [p for p in proveedores if p.modelos]
+
+    def elegir(self, candidatos: list[ProveedorLLM]) -> ProveedorLLM:
+        """
+        El de menor latencia típica entre los que tienen capacidad libre; si
+        todos están llenos, el de menor latencia (se espera su semáforo). Un
+        backend sin mediciones cuenta como latencia 0 para que se pruebe.
+        A igualdad, gana el orden de configuración.
+        """
+        orden = {id(p): i for i, p in enumerate(self.proveedores)}
+        return min(
+            candidatos,
+            key=lambda p: (not p.tiene_capacidad(), p.latencia_tipica() or 0.0, orden.get(id(p), 0)),
+        )
+
+    def intentos(self):
+        """
+        Genera pares (proveedor, modelo) para la cadena de fallback. El
+        backend se reelige en cada paso, así refleja la capacidad del momento.
+        """
+        pendientes = {id(p): list(p.modelos) for p in self.proveedores}
+        while True:
+            candidatos = [p for p in self.proveedores if pendientes[id(p)]]
+            if not candidatos:
+                return
+            proveedor = self.elegir(candidatos)
+            yield proveedor, pendientes[id(proveedor)].pop(0)
+
+    async def cerrar(self):
+        for proveedor in self.proveedores:
+            await proveedor.cerrar()
+
+
+def _construir_proveedores() -> list[ProveedorLLM]:
+    proveedores = []
+    if settings.llm_local_url:
+        proveedores.append(ProveedorLLM(
+            nombre="local",
+            url=settings.llm_local_url,
+            api_key=settings.llm_local_api_key,
+            modelos=settings.llm_local_modelos,
+            max_concurrencia=settings.llm_local_max_concurrencia,
+        ))
+    proveedores.append(ProveedorLLM(
+        nombre="openrouter",
+        url=settings.openrouter_url,
+        api_key=settings.openrouter_api_key,
+        modelos=settings.available_models,
+        max_concurrencia=settings.openrouter_max_concurrencia,
+    ))
+    return proveedores
+
+
+proveedores = RegistroProveedores(_construir_proveedores())
@@ -0,0 +1,236 @@
+import abc
+import contextvars
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger("trazas")
+
+
+class Span:
+    """
+    Tramo de una traza al estilo OpenTelemetry: nombre, ids, tiempos y
+    atributos. El id del análisis se hereda del padre para poder filtrar
+    todas las fases de un análisis en el colector.
+    """
+
+    __slots__ = (
+        "nombre", "trace_id", "span_id", "parent_id", "analisis_id",
+        "atributos", "inicio_ns", "fin_ns", "estado", "mensaje", "_inicio_mono",
+    )
+
+    def __init__(self, nombre: str, padre: "Span | None", atributos: dict[str, Any]):
+        self.nombre = nombre
+        self.trace_id = padre.trace_id if padre else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = padre.span_id if padre else None
+        self.analisis_id = atributos.pop("analisis_id", None) or (padre.analisis_id if padre else None)
+        self.atributos = atributos
+        self.inicio_ns = time.time_ns()
+        self.fin_ns: int | None = None
+        self.estado = "OK"
+        self.mensaje = ""
+        self._inicio_mono = time.perf_counter_ns()
+
+    def terminar(self):
+        self.fin_ns = self.inicio_ns + (time.perf_counter_ns() - self._inicio_mono)
+
+    @property
+    def duracion_ms(self) -> float:
+        return ((self.fin_ns or time.time_ns()) - self.inicio_ns) / 1e6
+
+    def como_dict(self) -> dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "nombre": self.nombre,
+            "analisis_id": self.analisis_id,
+            "inicio_ns": self.inicio_ns,
+            "fin_ns": self.fin_ns,
+            "duracion_ms": round(self.duracion_ms, 3),
+            "estado": self.estado,
+            "mensaje": self.mensaje,
+            "atributos": self.atributos,
+        }
+
+
+# ─── Exportadores ────────────────────────────────────────────────────
+
+class Exportador(abc.ABC):
+    """
+    Recibe los spans terminados y los escribe desde un hilo propio, así el
+    bucle de eventos nunca espera al disco ni al colector.
+    """
+
+    def __init__(self, lote_max: int = 256, intervalo: float = 2.0):
+        self.lote_max = lote_max
+        self.intervalo = intervalo
+        self._cola: queue.Queue[Span] = queue.Queue(maxsize=10_000)
+        self._hilo: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def exportar(self, span: Span):
+        self._asegurar_hilo()
+        try:
+            self._cola.put_nowait(span)
+        except queue.Full:
+            # Sin backpressure sobre los análisis: si el destino no da abasto se descarta
+            pass
+
+    def _asegurar_hilo(self):
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._correr, name="exportador-trazas", daemon=True)
+                self._hilo.start()
+
+    def _correr(self):
+        while True:
+            lote = [self._cola.get()]
+            limite = time.monotonic() + self.intervalo
+            while len(lote) < self.lote_max:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+            try:
+                self._escribir(lote)
+            except Exception as e:
+                logger.warning(f"⚠️  No se pudieron exportar {len(lote)} spans: {e}")
+
+    @abc.abstractmethod
+    def _escribir(self, lote: list[Span]):
+        """Envía un lote al destino. Corre en el hilo del exportador."""
+
+
+class ExportadorNulo(Exportador):
+    """Trazas deshabilitadas: los spans se miden pero no se envían a ningún lado."""
+
+    def exportar(self, span: Span):
+        pass
+
+    def _escribir(self, lote: list[Span]):
+        pass
+
+
+class ExportadorJSONL(Exportador):
+    """Un span por línea en un archivo local."""
+
+    def __init__(self, ruta: str, **kwargs):
+        super().__init__(**kwargs)
+        self.ruta = ruta
+
+    def _escribir(self, lote: list[Span]):
+        directorio = os.path.dirname(self.ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with open(self.ruta, "a", encoding="utf-8") as archivo:
+            for span in lote:
+                archivo.write(json.dumps(span.como_dict(), ensure_ascii=False, default=str) + "\n")
+
+
+def _atributo_otlp(clave: str, valor: Any) -> dict[str, Any]:
+    if isinstance(valor, bool):
+        return {"key": clave, "value": {"boolValue": valor}}
+    if isinstance(valor, int):
+        return {"key": clave, "value": {"intValue": str(valor)}}
+    if isinstance(valor, float):
+        return {"key": clave, "value": {"doubleValue": valor}}
+    return {"key": clave, "value": {"stringValue": str(valor)}}
+
+
+class ExportadorOTLP(Exportador):
+    """POST de OTLP/JSON (HTTP) a un colector local (OpenTelemetry Collector, Jaeger, Tempo)."""
+
+    def __init__(self, url: str, servicio: str, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self.servicio = servicio
+        self._cliente: httpx.Client | None = None
+
+    def _span_otlp(self, span: Span) -> dict[str, Any]:
+        atributos = dict(span.atributos)
+        if span.analisis_id:
+            atributos["analisis.id"] = span.analisis_id
+        cuerpo = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.nombre,
+            "kind": 1,
+            "startTimeUnixNano": str(span.inicio_ns),
+            "endTimeUnixNano": str(span.fin_ns),
+            "attributes": [_atributo_otlp(k, v) for k, v in atributos.items()],
+            "status": {"code": 2, "message": span.mensaje} if span.estado == "ERROR" else {"code": 1},
+        }
+        if span.parent_id:
+            cuerpo["parentSpanId"] = span.parent_id
+        return cuerpo
+
+    def _escribir(self, lote: list[Span]):
+        if self._cliente is None:
+            self._cliente = httpx.Client(timeout=5.0)
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_atributo_otlp("service.name", self.servicio)]},
+                "scopeSpans": [{
+                    "scope": {"name": "app.services.trazas"},
+                    "spans": [self._span_otlp(s) for s in lote],
+                }],
+            }]
+        }
+        self._cliente.post(self.url, json=payload).raise_for_status()
+
+
+def _construir_exportador() -> Exportador:
+    tipo = settings.trazas_exportador.lower()
+    if tipo == "jsonl":
+        return ExportadorJSONL(settings.trazas_archivo)
+    if tipo == "otlp":
+        return ExportadorOTLP(settings.trazas_otlp_url, servicio=settings.app_name)
+    return ExportadorNulo()
+
+
+exportador = _construir_exportador()
+
+# ─── API de instrumentación ──────────────────────────────────────────
+
+# Span activo de la tarea actual (cada tarea asyncio tiene su copia del contexto)
+_span_actual: contextvars.ContextVar[Span | None] = contextvars.ContextVar("span_actual", default=None)
+
+
+def span_actual() -> Span | None:
+    return _span_actual.get()
+
+
+@contextmanager
+def traza(nombre: str, **atributos: Any):
+    """
+    Abre un span hijo del activo. Sirve tanto en código síncrono como dentro
+    de corrutinas. Una excepción marca el span con estado ERROR y se propaga.
+    Pasar `analisis_id=` en el span raíz lo vincula al análisis.
+    """
+    span = Span(nombre, _span_actual.get(), atributos)
+    token = _span_actual.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.estado = "ERROR"
+        span.mensaje = f"{type(e).__name__}: {e}"[:500]
+        raise
+    finally:
+        _span_actual.reset(token)
+        span.terminar()
+        exportador.exportar(span)
@@ -0,0 +1,254 @@
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import logging
+import random
+import socket
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any
+from urllib.parse import urlsplit
+
+import httpx
+from sqlalchemy.orm import Session, selectinload
+
+from app.config import settings
+from app.core.exceptions import WebhookUrlNoPermitidaError, WebhooksDeshabilitadosError
+from app.core.respuestas import serializar_json
+from app.crud import marcar_entregadas, reclamar_entregas, reprogramar_entrega
+from app.db import SessionWorkers
+from app.models import Analisis, ResultadoAnalisis
+from app.schemas.analisis import AnalisisOut
+from app.services.trazas import traza
+
+logger = logging.getLogger("webhooks")
+
+
+def motivo_url_bloqueada(url: str) -> str | None:
+    """
+    Por qué no se puede enviar un webhook a `url`, o None si se puede. Con
+    `webhook_hosts_permitidos` solo valen esos hosts; sin lista, el host
+    tiene que resolver únicamente a IPs públicas, para que un callback no
+    sirva para llegar a localhost, la red interna o la metadata del cloud
+    (169.254.169.254). Resuelve DNS: es bloqueante.
+    """
+    partes = urlsplit(url)
+    if partes.scheme not in ("http", "https") or not partes.hostname:
+        return "solo se aceptan URLs http(s) con host."
+    host = partes.hostname.lower()
+    if settings.webhook_hosts_permitidos:
+        if host in (h.lower() for h in settings.webhook_hosts_permitidos):
+            return None
+        return "el host no está en WEBHOOK_HOSTS_PERMITIDOS."
+    try:
+        direcciones = socket.getaddrinfo(host, partes.port or 443, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError):
+        return "el host no resuelve."
+    for *_, sockaddr in direcciones:
+        ip = ipaddress.ip_address(sockaddr[0].split("%", 1)[0])
+        if getattr(ip, "ipv4_mapped", None):
+            ip = ip.ipv4_mapped
+        if not ip.is_global:
+            return f"el host resuelve a una dirección no pública ({ip})."
+    return None
+
+
+def validar_callback(url: str):
+    """Rechaza una suscripción si los webhooks están deshabilitados o la URL no está permitida."""
+    if not settings.webhook_secreto:
+        raise WebhooksDeshabilitadosError()
+    motivo = motivo_url_bloqueada(url)
+    if motivo:
+        raise WebhookUrlNoPermitidaError(url, motivo)
+
+
+class RepartidorWebhooks:
+    """
+    Worker de entrega de webhooks. Corre en el bucle del ejecutor: reclama
+    las entregas vencidas de la cola persistida, las agrupa por URL en lotes
+    (un POST por lote), las firma con HMAC-SHA256 y reprograma las fallidas
+    con backoff exponencial hasta `max_intentos`. La base es sincrónica, así
+    que reclamar y registrar corren en un hilo: el bucle lo comparten los
+    análisis en curso.
+
+    Firma: header X-Webhook-Firma = "sha256=" + HMAC(secreto, "<timestamp>.<cuerpo>"),
+    con el timestamp en X-Webhook-Timestamp para que el receptor descarte replays.
+    """
+
+    def __init__(
+        self,
+        secreto: str,
+        intervalo: float,
+        lote_max: int,
+        timeout: float,
+        max_intentos: int,
+        backoff_base: float,
+        backoff_max: float,
+        reserva: float,
+    ):
+        self.secreto = secreto
+        self.intervalo = intervalo
+        self.lote_max = lote_max
+        self.timeout = timeout
+        self.max_intentos = max_intentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.reserva = reserva
+        self._cliente: httpx.AsyncClient | None = None
+
+    def cliente(self) -> httpx.AsyncClient:
+        # Un solo pool para todos los receptores: keep-alive entre ciclos
+        if self._cliente is None:
+            self._cliente = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            )
+        return self._cliente
+
+    def firmar(self, cuerpo: bytes, timestamp: str) -> str:
+        firma = hmac.new(self.secreto.encode("utf-8"), timestamp.encode("ascii") + b"." + cuerpo, hashlib.sha256)
+        return f"sha256={firma.hexdigest()}"
+
+    def _backoff(self, intentos: int) -> float:
+        # Jitter para que los reintentos hacia un receptor caído no lleguen juntos
+        return min(self.backoff_max, self.backoff_base * 2 ** (intentos - 1)) * random.uniform(0.8, 1.2)
+
+    # ─── Ciclo ───────────────────────────────────────────────────────
+
+    async def correr(self):
+        logger.info("📬 Repartidor de webhooks iniciado.")
+        while True:
+            try:
+                entregadas = await self.repartir()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Error en el repartidor de webhooks: {e}")
+                entregadas = 0
+            # Con la cola vacía se espera; el intervalo es también la ventana de agrupación
+            if not entregadas:
+                await asyncio.sleep(self.intervalo)
+
+    async def repartir(self) -> int:
+        """Un ciclo: reclama, envía los lotes en paralelo y registra el resultado."""
+        entregas, eventos = await asyncio.to_thread(self._reclamar)
+        if not entregas:
+            return 0
+
+        por_url: dict[str, list[dict[str, Any]]] = defaultdict(list)
+        for entrega in entregas:
+            por_url[entrega["url"]].append(entrega)
+        lotes = [
+            (url, grupo[i:i + self.lote_max])
+            for url, grupo in por_url.items()
+            for i in range(0, len(grupo), self.lote_max)
+        ]
+
+        errores = await asyncio.gather(
+            *(self._enviar(url, [eventos[e["id"]] for e in lote]) for url, lote in lotes)
+        )
+        await asyncio.to_thread(self._registrar, lotes, errores)
+        return len(entregas)
+
+    def _reclamar(self) -> tuple[list[dict[str, Any]], dict[Any, dict[str, Any]]]:
+        db = SessionWorkers()
+        try:
+            # Se reclaman varios lotes por ciclo para poder agrupar por URL
+            entregas = reclamar_entregas(db, self.lote_max * 4, self.reserva)
+            if not entregas:
+                return [], {}
+            return entregas, self._armar_eventos(db, entregas)
+        finally:
+            db.close()
+
+    def _armar_eventos(self, db: Session, entregas: list[dict[str, Any]]) -> dict[Any, dict[str, Any]]:
+        ids = {e["analisis_id"] for e in entregas}
+        # Una consulta para todos los análisis del ciclo, con resultado y observaciones
+        analisis = {
+            a.id: a
+            for a in db.query(Analisis)
+            .options(selectinload(Analisis.resultado).selectinload(ResultadoAnalisis.observaciones))
+            .filter(Analisis.id.in_(ids))
+        }
+        eventos = {}
+        for entrega in entregas:
+            a = analisis.get(entrega["analisis_id"])
+            eventos[entrega["id"]] = {
+                "id": str(entrega["id"]),
+                "tipo": f"analisis.{entrega['evento'].value.lower()}",
+                "creado_at": entrega["created_at"].isoformat(),
+                "analisis": AnalisisOut.model_validate(a).model_dump(mode="json") if a else None,
+            }
+        return eventos
+
+    async def _enviar(self, url: str, eventos: list[dict[str, Any]]) -> str | None:
+        """POST de un lote. Devuelve None si el receptor respondió 2xx, o el error."""
+        # Se revisa de nuevo al enviar: el DNS pudo cambiar desde la suscripción
+        motivo = await asyncio.to_thread(motivo_url_bloqueada, url)
+        if motivo:
+            return f"URL no permitida: {motivo}"
+        cuerpo = serializar_json({"eventos": eventos})
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json",
+            "X-Webhook-Timestamp": timestamp,
+            "X-Webhook-Firma": self.firmar(cuerpo, timestamp),
+        }
+        try:
+            with traza("webhook.entregar", url=url, eventos=len(eventos)) as span:
+                respuesta = await self.cliente().post(url, content=cuerpo, headers=headers)
+                span.atributos["http.status_code"] = respuesta.status_code
+        except httpx.HTTPError as e:
+            return f"{type(e).__name__}: {e}"
+        if respuesta.is_success:
+            return None
+        return f"HTTP {respuesta.status_code}"
+
+    def _registrar(self, lotes: list[tuple[str, list[dict[str, Any]]]], errores: list[str | None]):
+        db = SessionWorkers()
+        try:
+            entregadas = []
+            ahora = datetime.utcnow()
+            for (url, lote), error in zip(lotes, errores):
+                if error is None:
+                    entregadas.extend(e["id"] for e in lote)
+                    continue
+                agotadas = 0
+                for entrega in lote:
+                    intentos = entrega["intentos"] + 1
+                    proximo = None
+                    if intentos < self.max_intentos:
+                        proximo = ahora + timedelta(seconds=self._backoff(intentos))
+                    else:
+                        agotadas += 1
+                    reprogramar_entrega(db, entrega["id"], intentos, proximo, error)
+                logger.warning(
+                    f"⚠️  Webhook a {url} falló ({error}): {len(lote) - agotadas} eventos reprogramados, "
+                    f"{agotadas} sin más reintentos."
+                )
+            if entregadas:
+                # marcar_entregadas hace commit también de las reprogramaciones
+                marcar_entregadas(db, entregadas)
+            else:
+                db.commit()
+        finally:
+            db.close()
+
+    async def cerrar(self):
+        if self._cliente is not None:
+            await self._cliente.aclose()
+            self._cliente = None
+
+
+repartidor = RepartidorWebhooks(
+    secreto=settings.webhook_secreto,
+    intervalo=settings.webhook_intervalo_segundos,
+    lote_max=settings.webhook_lote_max,
+    timeout=settings.webhook_timeout_segundos,
+    max_intentos=settings.webhook_max_intentos,
+    backoff_base=settings.webhook_backoff_base_segundos,
+    backoff_max=settings.webhook_backoff_max_segundos,
+    reserva=settings.webhook_reserva_segundos,
+)
@@ -1,3 +1,5 @@
-from .hashing import generar_hash_payload
+from .hashing import generar_hash_payload, generar_hash_bytes, generar_huella_bytes, serializar_canonico
+from .cache import CacheLRU
+from .texto import normalizar_termino
 
-__all__ = ["generar_hash_payload"]
\ No newline at end of file
+__all__ = ["generar_hash_payload", "generar_hash_bytes", "generar_huella_bytes", "serializar_canonico", "CacheLRU", "normalizar_termino"]
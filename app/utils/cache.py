@@ -0,0 +1,34 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class CacheLRU:
+    """Cache en memoria con desalojo LRU, segura entre hilos."""
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._items: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, clave: Hashable) -> Any | None:
+        with self._lock:
+            if clave not in self._items:
+                return None
+            self._items.move_to_end(clave)
+            return self._items[clave]
+
+    def set(self, clave: Hashable, valor: Any):
+        with self._lock:
+            self._items[clave] = valor
+            self._items.move_to_end(clave)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def invalidar(self, clave: Hashable):
+        with self._lock:
+            self._items.pop(clave, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
@@ -2,11 +2,29 @@ import hashlib
 import json
 from typing import Any
 
+def serializar_canonico(payload: Any) -> bytes:
+    """
+    Representación canónica (claves ordenadas) del payload JSON. Es la base
+    del hash, así que el formato no debe cambiar entre versiones.
+    """
+    return json.dumps(payload, sort_keys=True).encode('utf-8')
+
+def generar_hash_bytes(payload_bytes: bytes) -> int:
+    """Hash numérico de bytes ya canónicos (ver `serializar_canonico`)."""
+    # Usamos MD5 y lo convertimos a un entero (limitado a 32 bits para DB)
+    return int(hashlib.md5(payload_bytes).hexdigest()[:8], 16)
+
+def generar_huella_bytes(payload_bytes: bytes) -> str:
+    """
+    sha256 de bytes ya canónicos. El hash numérico es de 32 bits: esta huella
+    confirma que dos snapshots con el mismo hash son realmente iguales sin
+    tener que comparar los payloads completos.
+    """
+    return hashlib.sha256(payload_bytes).hexdigest()
+
 def generar_hash_payload(payload: dict[str, Any]) -> int:
     """
     Genera un hash numérico a partir del payload JSON para detectar 
     snapshots duplicados en la base de datos.
     """
-    payload_str = json.dumps(payload, sort_keys=True).encode('utf-8')
-    # Usamos MD5 y lo convertimos a un entero (limitado a 32 bits para DB)
-    return int(hashlib.md5(payload_str).hexdigest()[:8], 16)
\ No newline at end of file
+    return generar_hash_bytes(serializar_canonico(payload))
@@ -0,0 +1,103 @@
+import hashlib
+from html import escape
+from string import Template
+from typing import Any
+
+# Solo stdlib: este módulo se importa en los procesos del pool de render
+
+PLANTILLA = Template("""<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>Informe $proyecto_codigo · $periodo</title>
+<style>
+  body { font-family: Georgia, serif; max-width: 52rem; margin: 2rem auto; color: #222; line-height: 1.5; }
+  header { border-bottom: 2px solid #444; margin-bottom: 1.5rem; }
+  h1 { font-size: 1.6rem; margin-bottom: .2rem; }
+  h2 { font-size: 1.15rem; margin-top: 1.8rem; border-bottom: 1px solid #ccc; }
+  .meta { color: #666; font-size: .9rem; }
+  .score { font-size: 1.1rem; font-weight: bold; }
+  table { border-collapse: collapse; width: 100%; font-size: .9rem; }
+  th, td { border: 1px solid #ccc; padding: .4rem; vertical-align: top; text-align: left; }
+  .nivel-CRITICO { color: #a00; font-weight: bold; }
+  .nivel-ATENCION { color: #b60; }
+</style>
+</head>
+<body>
+<header>
+  <h1>Informe técnico de obra · $proyecto_codigo</h1>
+  <p class="meta">Período $periodo · Generado $generado_at · Análisis $analisis_id</p>
+  <p class="score">Score de coherencia: $score</p>
+</header>
+<h2>Resumen general</h2>
+$resumen_general
+<h2>Estado de ejecución</h2>
+$estado_ejecucion
+<h2>Estado de planificación</h2>
+$estado_planificacion
+<h2>Seguridad e higiene</h2>
+$estado_seguridad
+<h2>Validaciones técnicas</h2>
+$estado_validaciones
+<h2>Riesgos identificados</h2>
+$riesgos
+<h2>Observaciones</h2>
+$observaciones
+</body>
+</html>
+""")
+
+# Hash del módulo entero, no solo de PLANTILLA: cambiar cómo se arma un bloque
+# (_riesgos, _observaciones...) también deja de servir los informes guardados
+with open(__file__, "rb") as _fuente:
+    VERSION_PLANTILLA = hashlib.sha256(_fuente.read()).hexdigest()[:16]
+
+
+def _parrafos(texto: str | None) -> str:
+    bloques = [b.strip() for b in (texto or "No informado").split("\n\n") if b.strip()]
+    return "\n".join(f"<p>{escape(b)}</p>" for b in bloques)
+
+
+def _riesgos(riesgos: list[str]) -> str:
+    if not riesgos:
+        return "<p>No se identificaron riesgos.</p>"
+    return "<ul>\n" + "\n".join(f"  <li>{escape(r)}</li>" for r in riesgos) + "\n</ul>"
+
+
+def _observaciones(observaciones: list[dict[str, Any]]) -> str:
+    if not observaciones:
+        return "<p>Sin observaciones.</p>"
+    filas = "\n".join(
+        f"  <tr><td>{escape(o['categoria'])}</td>"
+        f"<td class=\"nivel-{escape(o['nivel'])}\">{escape(o['nivel'])}</td>"
+        f"<td><strong>{escape(o['titulo'])}</strong><br>{escape(o['descripcion'])}</td>"
+        f"<td>{escape(o.get('recomendacion') or '')}</td></tr>"
+        for o in observaciones
+    )
+    return (
+        "<table>\n  <tr><th>Categoría</th><th>Nivel</th><th>Observación</th><th>Recomendación</th></tr>\n"
+        + filas + "\n</table>"
+    )
+
+
+def renderizar_informe_html(analisis: dict[str, Any]) -> bytes:
+    """
+    HTML del informe a partir del volcado JSON de AnalisisOut (con resultado).
+    Función pura y a nivel de módulo para poder correrla en un ProcessPoolExecutor.
+    """
+    r = analisis["resultado"]
+    score = r.get("score_coherencia")
+    return PLANTILLA.substitute(
+        proyecto_codigo=escape(analisis["proyecto_codigo"]),
+        periodo=f"{escape(str(analisis['periodo_desde']))} a {escape(str(analisis['periodo_hasta']))}",
+        generado_at=escape(str(r["generado_at"])[:16].replace("T", " ")),
+        analisis_id=escape(str(analisis["id"])),
+        score="no informado" if score is None else f"{float(score):.0f} / 100",
+        resumen_general=_parrafos(r.get("resumen_general")),
+        estado_ejecucion=_parrafos(r.get("estado_ejecucion")),
+        estado_planificacion=_parrafos(r.get("estado_planificacion")),
+        estado_seguridad=_parrafos(r.get("estado_seguridad")),
+        estado_validaciones=_parrafos(r.get("estado_validaciones")),
+        riesgos=_riesgos(r.get("riesgos_identificados") or []),
+        observaciones=_observaciones(r.get("observaciones") or []),
+    ).encode("utf-8")
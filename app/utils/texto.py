@@ -0,0 +1,16 @@
+import re
+import unicodedata
+
+_ESPACIOS = re.compile(r"\s+")
+
+
+def normalizar_termino(texto: str) -> str:
+    """
+    Forma canónica de un término de riesgo: minúsculas, sin tildes, espacios
+    colapsados y sin puntuación en los bordes. "Falta de EPP." y
+    "falta de epp" quedan como el mismo término.
+    """
+    sin_tildes = "".join(
+        c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c)
+    )
+    return _ESPACIOS.sub(" ", sin_tildes).strip(" .,;:-").lower()
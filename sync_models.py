@@ -62,15 +62,24 @@ def sync_openrouter_models():
             if m not in favoritos and m not in MODELOS_EXCLUIDOS
         ]
 
+        # OpenRouter publica precio de lectura de cache solo para modelos con prompt caching
+        con_cache = {
+            m['id'] for m in data
+            if m.get('pricing', {}).get('input_cache_read') is not None
+        }
+        cache_list = [m for m in final_list if m in con_cache]
+
     except Exception as e:
         logger.error(f"❌ Falló el fetch de modelos: {e}. Usando fallback.")
         final_list = [m for m in favoritos if m not in MODELOS_EXCLUIDOS]
+        cache_list = []
 
     # Persistencia del registro
     os.makedirs("app/config", exist_ok=True)
     with open("app/config/models_registry.py", "w", encoding="utf-8") as f:
         f.write("# Archivo generado automáticamente por sync_models.py\n")
         f.write(f"AVAILABLE_MODELS = {json.dumps(final_list, indent=4)}\n")
+        f.write(f"MODELOS_CON_CACHE_PROMPT = {json.dumps(cache_list, indent=4)}\n")
 
     logger.info(f"✅ Registro actualizado con {len(final_list)} modelos.")
 
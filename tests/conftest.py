@@ -0,0 +1,45 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db import Base
+from app.models import Analisis, ClaveIdempotencia, EntregaWebhook, SuscripcionWebhook
+from app.models.enums import EstadoAnalisis
+
+# Tablas sin tipos exclusivos de PostgreSQL (el tsvector de resultados no existe en SQLite)
+TABLAS = [Analisis.__table__, ClaveIdempotencia.__table__, SuscripcionWebhook.__table__, EntregaWebhook.__table__]
+
+
+@pytest.fixture
+def Sesion():
+    engine = create_engine(
+        "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(engine, tables=TABLAS)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(Sesion):
+    sesion = Sesion()
+    yield sesion
+    sesion.close()
+
+
+@pytest.fixture
+def crear_analisis(db):
+    def crear(estado: EstadoAnalisis = EstadoAnalisis.PENDIENTE, proyecto_codigo: str = "CP-001") -> Analisis:
+        analisis = Analisis(
+            proyecto_codigo=proyecto_codigo,
+            periodo_desde=date(2024, 1, 1),
+            periodo_hasta=date(2024, 1, 31),
+            estado=estado,
+        )
+        db.add(analisis)
+        db.commit()
+        return analisis
+    return crear
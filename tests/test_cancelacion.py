@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from app.core.exceptions import AnalisisNoCancelableError
+from app.models import EntregaWebhook, SuscripcionWebhook
+from app.models.enums import EstadoAnalisis
+from app.services import analisis_service
+from app.services.ejecutor import EjecutorAnalisis
+from app.services.planificador import PlanificadorJusto
+
+
+@pytest.fixture
+def procesamiento_colgado(monkeypatch, Sesion):
+    """ejecutar_procesamiento con la sesión de test y un procesamiento que no termina."""
+    iniciado = asyncio.Event()
+
+    async def procesar(db, analisis_id, snapshot, presupuesto=None):
+        iniciado.set()
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(analisis_service, "SessionWorkers", Sesion)
+    monkeypatch.setattr(analisis_service, "procesar_snapshot_con_ia", procesar)
+    return iniciado
+
+
+async def _cancelar_en_curso(analisis_id, iniciado):
+    tarea = asyncio.ensure_future(analisis_service.ejecutar_procesamiento(analisis_id, None))
+    await iniciado.wait()
+    tarea.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await tarea
+
+
+async def test_apagado_devuelve_el_analisis_a_pendiente(db, crear_analisis, procesamiento_colgado):
+    analisis = crear_analisis(EstadoAnalisis.PROCESANDO)
+    db.add(SuscripcionWebhook(analisis_id=analisis.id, url="https://hooks.example.com/obra"))
+    db.commit()
+
+    await _cancelar_en_curso(analisis.id, procesamiento_colgado)
+
+    db.refresh(analisis)
+    assert analisis.estado == EstadoAnalisis.PENDIENTE
+    assert "reinicio" in analisis.error_mensaje
+    # Un reinicio no es un estado final: no se notifica
+    assert db.query(EntregaWebhook).count() == 0
+
+
+async def test_cancelacion_explicita_conserva_cancelado(db, crear_analisis, procesamiento_colgado, monkeypatch):
+    analisis = crear_analisis(EstadoAnalisis.PROCESANDO)
+    monkeypatch.setattr(analisis_service.ejecutor, "cancelar", lambda analisis_id: False)
+    analisis_service.cancelar_analisis(db, analisis.id, "Cancelado en test.")
+
+    await _cancelar_en_curso(analisis.id, procesamiento_colgado)
+
+    db.refresh(analisis)
+    assert analisis.estado == EstadoAnalisis.CANCELADO
+    assert analisis.error_mensaje == "Cancelado en test."
+
+
+def test_no_se_cancela_un_analisis_terminado(db, crear_analisis):
+    analisis = crear_analisis(EstadoAnalisis.COMPLETADO)
+    with pytest.raises(AnalisisNoCancelableError):
+        analisis_service.cancelar_analisis(db, analisis.id)
+
+
+def test_detener_el_ejecutor_deja_los_analisis_en_pendiente(db, crear_analisis, procesamiento_colgado):
+    ejecutor = EjecutorAnalisis(
+        max_concurrentes=2,
+        max_en_cola=4,
+        max_por_cliente=4,
+        max_interactivos_por_cliente=1,
+        fraccion_cola_lote=0.5,
+        planificador=PlanificadorJusto(pesos_clientes={}, cuota_minima=0.05),
+    )
+    analisis = crear_analisis(EstadoAnalisis.PROCESANDO)
+    ejecutor.enviar(analisis.id, analisis_service.ejecutar_procesamiento(analisis.id, None))
+    ejecutor.correr(asyncio.sleep(0.05))
+
+    ejecutor.detener()
+
+    db.refresh(analisis)
+    assert analisis.estado == EstadoAnalisis.PENDIENTE
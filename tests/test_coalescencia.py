@@ -0,0 +1,122 @@
+import asyncio
+from contextlib import asynccontextmanager
+from uuid import uuid4
+
+import pytest
+
+from app.services import ai_engine
+from app.services.ai_engine import AIEngineService
+from app.services.coalescencia import LiderAbandonadoError, VueloUnico
+from app.services.presupuesto import AnalisisCanceladoError, PresupuestoAgotadoError
+
+
+def _seguidor(vuelos: VueloUnico, clave):
+    futuro, es_lider = vuelos.unirse(clave)
+    assert not es_lider
+    return futuro
+
+
+def test_el_seguidor_recibe_el_resultado_del_lider():
+    vuelos = VueloUnico()
+    futuro, es_lider = vuelos.unirse("clave")
+    assert es_lider
+    seguidor = _seguidor(vuelos, "clave")
+
+    vuelos.resolver("clave", futuro, {"score_coherencia": 80})
+
+    assert seguidor.result() == {"score_coherencia": 80}
+    # El vuelo se cierra: el próximo que llega vuelve a ser líder
+    assert vuelos.unirse("clave")[1]
+
+
+@pytest.mark.parametrize(
+    "error",
+    [asyncio.CancelledError(), AnalisisCanceladoError("a"), PresupuestoAgotadoError("sin tiempo")],
+)
+def test_los_errores_propios_del_lider_no_se_heredan(error):
+    vuelos = VueloUnico()
+    futuro, _ = vuelos.unirse("clave")
+    seguidor = _seguidor(vuelos, "clave")
+
+    vuelos.fallar("clave", futuro, error)
+
+    with pytest.raises(LiderAbandonadoError):
+        seguidor.result()
+
+
+def test_los_errores_del_snapshot_se_comparten():
+    vuelos = VueloUnico()
+    futuro, _ = vuelos.unirse("clave")
+    seguidor = _seguidor(vuelos, "clave")
+
+    vuelos.fallar("clave", futuro, ValueError("respuesta inválida"))
+
+    with pytest.raises(ValueError):
+        seguidor.result()
+
+
+class _Snapshot:
+    def __init__(self, contenido: bytes, hash_: int = 1234):
+        self.hash = hash_
+        self.bytes_canonicos = contenido
+
+
+@pytest.fixture
+def motor(monkeypatch):
+    """AIEngineService sin DB: sin advisory lock ni resultados previos reutilizables."""
+    @asynccontextmanager
+    async def sin_bloqueo(clave, presupuesto=None):
+        yield
+
+    monkeypatch.setattr(ai_engine, "bloqueo_consultivo", sin_bloqueo)
+    monkeypatch.setattr(ai_engine, "vuelos", VueloUnico())
+    monkeypatch.setattr(AIEngineService, "_resultado_reutilizable", lambda self, analisis_id, snapshot: None)
+    return AIEngineService(db=None)
+
+
+async def test_el_seguidor_toma_el_liderazgo_si_el_lider_fue_cancelado(motor, monkeypatch):
+    lider, seguidor = uuid4(), uuid4()
+    llamadas = []
+    lider_en_vuelo = asyncio.Event()
+
+    async def generar(self, analisis_id, snapshot, presupuesto):
+        llamadas.append(analisis_id)
+        if analisis_id == lider:
+            lider_en_vuelo.set()
+            await asyncio.sleep(0.01)
+            raise AnalisisCanceladoError(str(analisis_id))
+        return {"resumen_general": "ok"}
+
+    monkeypatch.setattr(AIEngineService, "_generar_informe", generar)
+    snapshot = _Snapshot(b'{"a": 1}')
+
+    tarea_lider = asyncio.ensure_future(motor._obtener_informe(lider, snapshot, None))
+    await lider_en_vuelo.wait()
+    resultado = await motor._obtener_informe(seguidor, snapshot, None)
+
+    assert resultado == {"resumen_general": "ok"}
+    assert llamadas == [lider, seguidor]
+    with pytest.raises(AnalisisCanceladoError):
+        await tarea_lider
+
+
+async def test_una_colision_de_hash_no_comparte_el_resultado(motor, monkeypatch):
+    en_vuelo = asyncio.Event()
+    liberar = asyncio.Event()
+
+    async def generar(self, analisis_id, snapshot, presupuesto):
+        if not en_vuelo.is_set():
+            en_vuelo.set()
+            await liberar.wait()
+        return {"resumen_general": snapshot.bytes_canonicos.decode()}
+
+    monkeypatch.setattr(AIEngineService, "_generar_informe", generar)
+
+    primero = asyncio.ensure_future(motor._obtener_informe(uuid4(), _Snapshot(b"uno"), None))
+    await en_vuelo.wait()
+    # Mismo hash de 32 bits, otro contenido: no se suma al vuelo en curso
+    segundo = await motor._obtener_informe(uuid4(), _Snapshot(b"dos"), None)
+    liberar.set()
+
+    assert segundo == {"resumen_general": "dos"}
+    assert await primero == {"resumen_general": "uno"}
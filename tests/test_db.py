@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pytest
+
+import app.db as modulo_db
+from app.config import settings
+from app.db import database, get_db_lectura
+from app.models.enums import EstadoAnalisis
+from app.utils.cache import CacheLRU
+
+
+@pytest.fixture
+def con_replica(monkeypatch):
+    """Réplica configurada: cada sesión anota de qué pool salió."""
+    monkeypatch.setattr(database, "_escrituras_recientes", CacheLRU(100))
+    monkeypatch.setattr(modulo_db, "engine_lectura", object())
+    monkeypatch.setattr(modulo_db, "SessionLocal", lambda: SimpleNamespace(pool="primaria", close=lambda: None))
+    monkeypatch.setattr(modulo_db, "SessionLectura", lambda: SimpleNamespace(pool="replica", close=lambda: None))
+
+
+def _pool_de_lectura(analisis_id) -> str:
+    request = SimpleNamespace(path_params={"analisis_id": str(analisis_id)})
+    return next(get_db_lectura(request)).pool
+
+
+def test_tras_un_flush_las_lecturas_del_analisis_van_a_la_primaria(con_replica, crear_analisis, db, monkeypatch):
+    analisis = crear_analisis()
+    otro = crear_analisis()
+    # Se olvidan las altas: cuenta solo la escritura del test
+    monkeypatch.setattr(database, "_escrituras_recientes", CacheLRU(100))
+    assert _pool_de_lectura(analisis.id) == "replica"
+
+    analisis.estado = EstadoAnalisis.PROCESANDO
+    db.flush()
+
+    assert _pool_de_lectura(analisis.id) == "primaria"
+    assert _pool_de_lectura(otro.id) == "replica"
+
+
+def test_pasada_la_ventana_se_vuelve_a_la_replica(con_replica, crear_analisis, monkeypatch):
+    monkeypatch.setattr(settings, "db_ventana_lectura_propia_segundos", 0.0)
+    analisis = crear_analisis()
+
+    assert _pool_de_lectura(analisis.id) == "replica"
+
+
+def test_el_pool_de_workers_por_defecto_alcanza_para_los_analisis(monkeypatch):
+    monkeypatch.setattr(settings, "max_analisis_concurrentes", 8)
+    monkeypatch.setattr(settings, "db_workers_pool_size", None)
+
+    assert database._pool_workers() == 17
+
+
+def test_un_pool_de_workers_chico_se_rechaza_al_arrancar(monkeypatch):
+    monkeypatch.setattr(settings, "max_analisis_concurrentes", 8)
+    monkeypatch.setattr(settings, "db_workers_pool_size", 10)
+    monkeypatch.setattr(settings, "db_workers_max_overflow", 6)
+
+    with pytest.raises(RuntimeError, match="se necesitan al menos 17"):
+        database._pool_workers()
+
+
+def test_un_pool_de_workers_explicito_se_respeta(monkeypatch):
+    monkeypatch.setattr(settings, "max_analisis_concurrentes", 8)
+    monkeypatch.setattr(settings, "db_workers_pool_size", 12)
+    monkeypatch.setattr(settings, "db_workers_max_overflow", 5)
+
+    assert database._pool_workers() == 12
@@ -0,0 +1,88 @@
+import asyncio
+import importlib
+from uuid import uuid4
+
+import pytest
+
+from app.config import settings
+from app.core.exceptions import ClaveApiInvalidaError, CuotaClienteExcedidaError
+from app.models.enums import PrioridadAnalisis
+from app.routers.analisis import identificar_cliente
+from app.services.ejecutor import EjecutorAnalisis, marcar_invocacion_llm
+from app.services.latencias import RegistroLatencias
+from app.services.planificador import PlanificadorJusto
+
+# app.services reexporta la instancia `ejecutor` con el nombre del módulo
+modulo_ejecutor = importlib.import_module("app.services.ejecutor")
+
+
+@pytest.fixture
+def ejecutor(monkeypatch):
+    monkeypatch.setattr(modulo_ejecutor, "registro_latencias", RegistroLatencias())
+    return EjecutorAnalisis(
+        max_concurrentes=2,
+        max_en_cola=4,
+        max_por_cliente=4,
+        max_interactivos_por_cliente=1,
+        fraccion_cola_lote=0.5,
+        planificador=PlanificadorJusto(pesos_clientes={}, cuota_minima=0.05),
+    )
+
+
+async def _correr(ejecutor, coro):
+    return await ejecutor._ejecutar(coro, PrioridadAnalisis.NORMAL, "cliente", "CP-001")
+
+
+async def test_las_salidas_tempranas_no_cuentan_para_la_duracion_tipica(ejecutor):
+    async def reclamo_perdido():
+        return None
+
+    await _correr(ejecutor, reclamo_perdido())
+
+    assert modulo_ejecutor.registro_latencias.tipica("ejecutor:analisis") is None
+    assert ejecutor._en_curso == 0
+
+
+async def test_las_corridas_que_llaman_al_llm_cuentan(ejecutor):
+    async def seccion():
+        # Las subtareas (modo por secciones) comparten la marca de la corrida
+        marcar_invocacion_llm()
+
+    async def analisis():
+        await asyncio.gather(asyncio.ensure_future(seccion()))
+        await asyncio.sleep(0.01)
+
+    await _correr(ejecutor, analisis())
+
+    assert modulo_ejecutor.registro_latencias.tipica("ejecutor:analisis") >= 0.01
+
+
+def test_tope_de_interactivos_por_cliente(ejecutor):
+    async def espera():
+        await asyncio.sleep(3600)
+
+    try:
+        assert ejecutor.enviar(uuid4(), espera(), cliente="tenant-a", prioridad=PrioridadAnalisis.INTERACTIVA)
+        with pytest.raises(CuotaClienteExcedidaError):
+            ejecutor.enviar(uuid4(), espera(), cliente="tenant-a", prioridad=PrioridadAnalisis.INTERACTIVA)
+        # El tope es solo para lo interactivo y por cliente
+        assert ejecutor.enviar(uuid4(), espera(), cliente="tenant-a", prioridad=PrioridadAnalisis.NORMAL)
+        assert ejecutor.enviar(uuid4(), espera(), cliente="tenant-b", prioridad=PrioridadAnalisis.INTERACTIVA)
+        # Que las tareas arranquen antes de detener el bucle
+        ejecutor.correr(asyncio.sleep(0))
+    finally:
+        ejecutor.detener()
+
+
+def _request(ip: str):
+    return type("Request", (), {"client": type("Cliente", (), {"host": ip})()})()
+
+
+def test_el_cliente_sale_de_la_api_key_o_de_la_ip(monkeypatch):
+    monkeypatch.setattr(settings, "claves_clientes", {"clave-secreta": "estudio-norte"})
+
+    assert identificar_cliente(_request("10.0.0.7"), api_key="clave-secreta") == "estudio-norte"
+    # Sin clave, ningún header elegido por quien envía cambia la cuota: cuenta la IP
+    assert identificar_cliente(_request("10.0.0.7"), api_key=None) == "10.0.0.7"
+    with pytest.raises(ClaveApiInvalidaError):
+        identificar_cliente(_request("10.0.0.7"), api_key="inventada")
@@ -0,0 +1,176 @@
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from app.crud import iterar_lotes_exportacion
+from app.db import Base
+from app.models import Analisis, ObservacionGenerada, ResultadoAnalisis
+from app.models.enums import CategoriaObservacion, EstadoAnalisis, NivelObservacion
+from app.services import exportacion_service
+from app.services.exportacion_service import COLUMNAS_CSV, _fila_csv, exportar_analisis
+
+# Sin tsvector ni ARRAY de PostgreSQL: búsqueda y riesgos quedan en NULL
+_DDL_RESULTADOS_SQLITE = """
+CREATE TABLE resultados_analisis (
+    id CHAR(32) PRIMARY KEY,
+    analisis_id CHAR(32) NOT NULL UNIQUE REFERENCES analisis (id),
+    resumen_general TEXT NOT NULL,
+    estado_ejecucion TEXT NOT NULL,
+    estado_planificacion TEXT NOT NULL,
+    estado_seguridad TEXT NOT NULL,
+    estado_validaciones TEXT NOT NULL,
+    score_coherencia NUMERIC(5, 2),
+    riesgos_identificados TEXT,
+    generado_at DATETIME NOT NULL,
+    busqueda TEXT
+)
+"""
+
+_INICIO = datetime(2024, 6, 1, 12, 0)
+
+
+@pytest.fixture
+def exportables(db, Sesion, monkeypatch):
+    """Crea análisis con fecha de solicitud creciente; el export abre sesiones sobre la misma base."""
+    db.execute(text(_DDL_RESULTADOS_SQLITE))
+    Base.metadata.create_all(db.get_bind(), tables=[ObservacionGenerada.__table__])
+    monkeypatch.setattr(exportacion_service, "SessionLectura", Sesion)
+    creados = []
+
+    def crear(
+        proyecto_codigo: str = "CP-001",
+        periodo: tuple[date, date] = (date(2024, 1, 1), date(2024, 1, 31)),
+        estado: EstadoAnalisis = EstadoAnalisis.PENDIENTE,
+        con_resultado: bool = False,
+    ) -> Analisis:
+        analisis = Analisis(
+            proyecto_codigo=proyecto_codigo,
+            periodo_desde=periodo[0],
+            periodo_hasta=periodo[1],
+            estado=estado,
+            fecha_solicitud=_INICIO + timedelta(minutes=len(creados)),
+        )
+        if con_resultado:
+            analisis.resultado = ResultadoAnalisis(
+                resumen_general="Obra en plazo",
+                estado_ejecucion="ejecucion",
+                estado_planificacion="planificacion",
+                estado_seguridad="seguridad",
+                estado_validaciones="validaciones",
+                score_coherencia=85,
+                generado_at=_INICIO,
+                observaciones=[
+                    ObservacionGenerada(
+                        categoria=CategoriaObservacion.SEGURIDAD,
+                        nivel=NivelObservacion.CRITICO,
+                        titulo="Falta baranda",
+                        descripcion="Losa sin protección perimetral",
+                        orden=1,
+                    )
+                ],
+            )
+        db.add(analisis)
+        db.commit()
+        creados.append(analisis.id)
+        return analisis
+
+    return crear
+
+
+def _exportar(**filtros) -> bytes:
+    return b"".join(exportar_analisis(**filtros))
+
+
+def test_ndjson_una_linea_por_analisis(exportables):
+    pendiente = exportables()
+    completado = exportables(estado=EstadoAnalisis.COMPLETADO, con_resultado=True)
+
+    lineas = [json.loads(linea) for linea in _exportar().decode("utf-8").splitlines()]
+
+    assert [linea["id"] for linea in lineas] == [str(pendiente.id), str(completado.id)]
+    assert lineas[0]["estado"] == "PENDIENTE"
+    assert lineas[0]["resultado"] is None
+    resultado = lineas[1]["resultado"]
+    assert resultado["score_coherencia"] == 85.0
+    assert resultado["riesgos_identificados"] == []
+    assert [o["titulo"] for o in resultado["observaciones"]] == ["Falta baranda"]
+
+
+def test_csv_con_cabecera_y_columnas_fijas(exportables):
+    exportables()
+    exportables(estado=EstadoAnalisis.COMPLETADO, con_resultado=True)
+
+    cabecera, pendiente, completado = list(csv.reader(io.StringIO(_exportar(formato="csv").decode("utf-8"))))
+
+    assert cabecera == COLUMNAS_CSV
+    assert len(pendiente) == len(completado) == len(COLUMNAS_CSV)
+    # Sin resultado, las columnas del resultado quedan vacías
+    assert pendiente[COLUMNAS_CSV.index("estado")] == "PENDIENTE"
+    assert set(pendiente[COLUMNAS_CSV.index("score_coherencia"):]) == {""}
+    fila = dict(zip(COLUMNAS_CSV, completado))
+    assert fila["resumen_general"] == "Obra en plazo"
+    assert json.loads(fila["observaciones"])[0]["nivel"] == NivelObservacion.CRITICO.value
+
+
+def test_csv_une_los_riesgos_en_una_celda():
+    analisis = Analisis(
+        proyecto_codigo="CP-001",
+        periodo_desde=date(2024, 1, 1),
+        periodo_hasta=date(2024, 1, 31),
+        estado=EstadoAnalisis.COMPLETADO,
+        fecha_solicitud=_INICIO,
+        version=1,
+    )
+    analisis.resultado = ResultadoAnalisis(
+        resumen_general="r", estado_ejecucion="e", estado_planificacion="p", estado_seguridad="s",
+        estado_validaciones="v", riesgos_identificados=["lluvias", "acopio"], generado_at=_INICIO,
+    )
+
+    fila = dict(zip(COLUMNAS_CSV, _fila_csv(analisis)))
+
+    assert fila["riesgos_identificados"] == "lluvias; acopio"
+    assert fila["observaciones"] == "[]"
+
+
+def test_filtros_por_proyecto_periodo_y_estado(exportables):
+    enero = exportables(periodo=(date(2024, 1, 1), date(2024, 1, 31)))
+    marzo = exportables(periodo=(date(2024, 3, 1), date(2024, 3, 31)), estado=EstadoAnalisis.COMPLETADO)
+    otro_proyecto = exportables(proyecto_codigo="CP-002")
+
+    def ids(**filtros):
+        return [json.loads(linea)["id"] for linea in _exportar(**filtros).decode("utf-8").splitlines()]
+
+    assert ids(proyecto_codigo="CP-002") == [str(otro_proyecto.id)]
+    # El período filtra por solapamiento con [desde, hasta]
+    assert ids(proyecto_codigo="CP-001", desde=date(2024, 1, 15), hasta=date(2024, 2, 15)) == [str(enero.id)]
+    assert ids(desde=date(2024, 3, 31)) == [str(marzo.id)]
+    assert ids(estado=EstadoAnalisis.COMPLETADO) == [str(marzo.id)]
+
+
+def test_los_lotes_respetan_el_tamano_y_se_sacan_de_la_sesion(exportables, db):
+    ids = [exportables().id for _ in range(5)]
+    db.expunge_all()
+
+    lotes = []
+    for lote in iterar_lotes_exportacion(db, tamano_lote=2):
+        lotes.append([analisis.id for analisis in lote])
+        assert all(analisis in db for analisis in lote)
+    previos = lote
+
+    assert lotes == [ids[0:2], ids[2:4], ids[4:5]]
+    assert not any(analisis in db for analisis in previos)
+
+
+def test_el_export_se_emite_en_varios_chunks(exportables, monkeypatch):
+    for _ in range(3):
+        exportables()
+    monkeypatch.setattr(exportacion_service, "_TAMANO_CHUNK", 1)
+
+    chunks = list(exportar_analisis())
+
+    assert len(chunks) == 3
+    assert all(chunk.endswith(b"\n") for chunk in chunks)
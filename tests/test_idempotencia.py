@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.exceptions import IdempotenciaConflictoError, IdempotenciaEnCursoError
+from app.crud import crud_idempotencia
+from app.models import ClaveIdempotencia
+from app.services.idempotencia_service import responder_idempotente
+
+ENDPOINT = "POST /analisis/"
+
+
+def _responder(db, operacion, clave="clave-1", huella="huella-a"):
+    return responder_idempotente(db, clave, ENDPOINT, huella, 201, operacion)
+
+
+def test_el_reintento_recibe_la_respuesta_guardada(db):
+    llamadas = []
+
+    def operacion():
+        llamadas.append(1)
+        return {"id": "abc"}
+
+    primera = _responder(db, operacion)
+    segunda = _responder(db, operacion)
+
+    assert len(llamadas) == 1
+    assert segunda.status_code == 201
+    assert segunda.body == primera.body
+    assert segunda.headers["Idempotent-Replayed"] == "true"
+
+
+def test_la_misma_clave_con_otro_cuerpo_es_un_conflicto(db):
+    _responder(db, lambda: {"id": "abc"})
+    with pytest.raises(IdempotenciaConflictoError):
+        _responder(db, lambda: {"id": "abc"}, huella="huella-b")
+
+
+def test_si_la_operacion_falla_la_clave_se_libera(db):
+    def falla():
+        raise RuntimeError("sin lugar")
+
+    with pytest.raises(RuntimeError):
+        _responder(db, falla)
+    assert _responder(db, lambda: {"id": "abc"}).status_code == 201
+
+
+def _reserva_en_curso(db, antiguedad: timedelta):
+    ahora = datetime.utcnow()
+    db.add(ClaveIdempotencia(
+        clave="clave-1", endpoint=ENDPOINT, huella_solicitud="huella-a",
+        created_at=ahora - antiguedad, expira_at=ahora + timedelta(days=1),
+    ))
+    db.commit()
+
+
+def test_una_reserva_reciente_sin_respuesta_esta_en_curso(db):
+    _reserva_en_curso(db, timedelta(seconds=1))
+    with pytest.raises(IdempotenciaEnCursoError):
+        _responder(db, lambda: {"id": "abc"})
+
+
+def test_una_reserva_abandonada_se_retoma(db):
+    _reserva_en_curso(db, timedelta(hours=1))
+    respuesta = _responder(db, lambda: {"id": "abc"})
+    assert respuesta.status_code == 201
+    assert "Idempotent-Replayed" not in respuesta.headers
+
+
+def test_si_el_ganador_libera_la_clave_se_reintenta_la_reserva(db, Sesion, monkeypatch):
+    _reserva_en_curso(db, timedelta(seconds=1))
+    lecturas = []
+    get_clave = crud_idempotencia._get_clave
+
+    def get_clave_con_carrera(sesion, clave, endpoint):
+        lecturas.append(1)
+        if len(lecturas) == 1:
+            # Todavía no se ve la reserva del ganador: el INSERT choca con la unique
+            return None
+        # Entre el choque y la relectura, el ganador falló y liberó la clave
+        otra = Sesion()
+        otra.query(ClaveIdempotencia).delete()
+        otra.commit()
+        otra.close()
+        return get_clave(sesion, clave, endpoint)
+
+    monkeypatch.setattr(crud_idempotencia, "_get_clave", get_clave_con_carrera)
+    registro, es_nueva = crud_idempotencia.reservar_clave(db, "clave-1", ENDPOINT, "huella-a", 3600, 60)
+
+    assert es_nueva
+    assert registro.clave == "clave-1"
+    assert len(lecturas) == 2
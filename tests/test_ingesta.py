@@ -0,0 +1,184 @@
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.core.exceptions import (
+    IdempotenciaConflictoError,
+    IdempotenciaEnCursoError,
+    RegistroInvalidoError,
+    SnapshotNoDisponibleError,
+)
+from app.crud.crud_snapshot import _volcar, get_snapshot_por_partes_id, sellar_snapshot
+from app.db import Base
+from app.models import ClaveIdempotencia, DatoEtapa, DatoProyecto, DatoValidacion, SnapshotRecibido
+from app.schemas.snapshot import DatoEtapaBase, DatoProyectoBase, SnapshotCanonico
+from app.services import ingesta_service
+from app.services.ingesta_service import lineas_ndjson
+
+
+async def _cuerpo(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+async def _lineas(*chunks: bytes, max_bytes: int = 1024) -> list[tuple[int, bytes]]:
+    return [linea async for linea in lineas_ndjson(_cuerpo(*chunks), max_bytes)]
+
+
+async def test_las_lineas_se_arman_aunque_los_chunks_las_corten():
+    lineas = await _lineas(b'{"a": 1}\n{"b"', b': 2}\n\n{"c": 3}', b'\n{"d": 4}')
+    # Las líneas vacías no se devuelven pero cuentan para numerar los errores
+    assert lineas == [(1, b'{"a": 1}'), (2, b'{"b": 2}'), (4, b'{"c": 3}'), (5, b'{"d": 4}')]
+
+
+async def test_crlf_y_cuerpo_vacio():
+    assert await _lineas(b'{"a": 1}\r\n', b"\r\n") == [(1, b'{"a": 1}\r')]
+    assert await _lineas() == []
+
+
+async def test_una_linea_demasiado_larga_se_rechaza_sin_esperar_al_final():
+    with pytest.raises(RegistroInvalidoError, match="Línea 2"):
+        await _lineas(b'{"a": 1}\n', b"x" * 20, b"x" * 20, max_bytes=30)
+
+
+def test_snapshot_desde_datos_ya_volcados():
+    datos = {"proyecto": {"codigo": "CP-001"}}
+    snapshot = SnapshotCanonico(datos=datos)
+    assert snapshot.datos is datos
+    assert snapshot.hash == SnapshotCanonico(datos=dict(datos)).hash
+    with pytest.raises(ValueError):
+        SnapshotCanonico()
+
+
+@pytest.fixture
+def snapshot_por_partes(db, crear_analisis):
+    """Análisis con el snapshot por partes iniciado (tablas sin ARRAY, que SQLite no tiene)."""
+    tablas = [SnapshotRecibido.__table__, DatoProyecto.__table__, DatoEtapa.__table__, DatoValidacion.__table__]
+    Base.metadata.create_all(db.get_bind(), tables=tablas)
+    analisis = crear_analisis()
+    proyecto = DatoProyectoBase(
+        proyecto_nombre="Edificio", ubicacion="CABA", tipo_intervencion="Obra nueva", superficie_m2=100,
+        sistema_constructivo="Tradicional", responsable_tecnico_nombre="Resp", fecha_inicio=date(2024, 1, 1),
+    )
+    ingesta_service.iniciar_snapshot(db, analisis.id, proyecto)
+    return analisis.id
+
+
+def _ndjson(*registros: dict) -> bytes:
+    return b"".join(json.dumps(r).encode() + b"\n" for r in registros)
+
+
+async def test_el_volcado_respeta_el_orden_de_carga_entre_envios(db, snapshot_por_partes):
+    etapas = [
+        {"etapa_nombre": nombre, "etapa_orden": orden, "estado": "EN_CURSO"}
+        for nombre, orden in [("Estructura", 2), ("Excavación", 1), ("Terminaciones", 2), ("Fundaciones", 1)]
+    ]
+    await ingesta_service.ingerir_seccion(db, snapshot_por_partes, "etapas", _cuerpo(_ndjson(*etapas[:2])))
+    await ingesta_service.ingerir_seccion(db, snapshot_por_partes, "etapas", _cuerpo(_ndjson(*etapas[2:])))
+
+    snapshot_id = get_snapshot_por_partes_id(db, snapshot_por_partes)
+    volcado = _volcar(db, DatoEtapaBase, DatoEtapa, snapshot_id)
+    esperado = [DatoEtapaBase(**e).model_dump(mode="json") for e in etapas]
+    assert volcado == esperado
+    # Dos cargas de los mismos datos dan los mismos bytes (y el mismo hash)
+    assert _volcar(db, DatoEtapaBase, DatoEtapa, snapshot_id) == volcado
+
+
+def _etapas(*nombres: str) -> bytes:
+    return _ndjson(*({"etapa_nombre": n, "etapa_orden": 1, "estado": "OK"} for n in nombres))
+
+
+def _cantidad_etapas(db) -> int:
+    return db.query(DatoEtapa).count()
+
+
+async def test_el_reintento_de_un_envio_no_vuelve_a_insertar(db, snapshot_por_partes):
+    cuerpo = _etapas("A", "B")
+    primera = await ingesta_service.ingerir_seccion_idempotente(
+        db, "lote-1", snapshot_por_partes, "etapas", _cuerpo(cuerpo[:7], cuerpo[7:])
+    )
+    # Mismo contenido partido en otros chunks: misma huella
+    segunda = await ingesta_service.ingerir_seccion_idempotente(
+        db, "lote-1", snapshot_por_partes, "etapas", _cuerpo(cuerpo)
+    )
+
+    assert _cantidad_etapas(db) == 2
+    assert json.loads(primera.body)["registros"] == 2
+    assert segunda.body == primera.body
+    assert segunda.headers["Idempotent-Replayed"] == "true"
+
+
+async def test_otro_cuerpo_con_la_misma_clave_es_un_conflicto(db, snapshot_por_partes):
+    await ingesta_service.ingerir_seccion_idempotente(db, "lote-1", snapshot_por_partes, "etapas", _cuerpo(_etapas("A")))
+    # Mismo tamaño, otro contenido
+    with pytest.raises(IdempotenciaConflictoError):
+        await ingesta_service.ingerir_seccion_idempotente(
+            db, "lote-1", snapshot_por_partes, "etapas", _cuerpo(_etapas("B"))
+        )
+    assert _cantidad_etapas(db) == 1
+
+
+async def test_un_envio_cortado_libera_la_clave(db, snapshot_por_partes):
+    async def cortado():
+        yield _etapas("A")
+        raise ConnectionResetError("el cliente cortó")
+
+    with pytest.raises(ConnectionResetError):
+        await ingesta_service.ingerir_seccion_idempotente(db, "lote-2", snapshot_por_partes, "etapas", cortado())
+    assert _cantidad_etapas(db) == 0
+
+    respuesta = await ingesta_service.ingerir_seccion_idempotente(
+        db, "lote-2", snapshot_por_partes, "etapas", _cuerpo(_etapas("A"))
+    )
+    assert "Idempotent-Replayed" not in respuesta.headers
+    assert _cantidad_etapas(db) == 1
+
+
+async def test_un_upload_largo_no_se_da_por_abandonado(db, snapshot_por_partes):
+    # Reserva en curso desde hace más que idempotencia_reserva_segundos (60 s)
+    hace_rato = datetime.utcnow() - timedelta(minutes=5)
+    db.add(ClaveIdempotencia(
+        clave="lote-3", endpoint=f"POST /analisis/{snapshot_por_partes}/snapshot/etapas",
+        huella_solicitud="", created_at=hace_rato, expira_at=hace_rato + timedelta(days=1),
+    ))
+    db.commit()
+
+    with pytest.raises(IdempotenciaEnCursoError):
+        await ingesta_service.ingerir_seccion_idempotente(
+            db, "lote-3", snapshot_por_partes, "etapas", _cuerpo(_etapas("A"))
+        )
+    assert _cantidad_etapas(db) == 0
+
+
+async def test_si_otra_request_retomo_la_reserva_no_queda_nada_insertado(db, snapshot_por_partes):
+    async def retomado():
+        yield _etapas("A")
+        # Lo que haría un reintento que toma la reserva por abandonada
+        db.query(ClaveIdempotencia).delete(synchronize_session=False)
+
+    with pytest.raises(IdempotenciaEnCursoError):
+        await ingesta_service.ingerir_seccion_idempotente(db, "lote-4", snapshot_por_partes, "etapas", retomado())
+    assert _cantidad_etapas(db) == 0
+
+
+def test_sellar_un_snapshot_por_partes_no_reescribe_el_payload(db, snapshot_por_partes):
+    snapshot = SnapshotCanonico(datos={"etapas": [{"etapa_nombre": "A"}]})
+
+    sellar_snapshot(db, snapshot_por_partes, snapshot.hash, snapshot.huella)
+
+    db.expire_all()
+    guardado = db.query(SnapshotRecibido).filter(SnapshotRecibido.analisis_id == snapshot_por_partes).one()
+    assert guardado.payload_completo == {}
+    assert (guardado.hash_payload, guardado.huella_sha256) == (snapshot.hash, snapshot.huella)
+
+
+async def test_un_snapshot_de_un_solo_body_no_es_un_snapshot_por_partes(db, crear_analisis, snapshot_por_partes):
+    analisis = crear_analisis()
+    db.add(SnapshotRecibido(analisis_id=analisis.id, payload_completo={"etapas": []}, hash_payload=1))
+    db.commit()
+
+    assert get_snapshot_por_partes_id(db, analisis.id) is None
+    assert get_snapshot_por_partes_id(db, snapshot_por_partes) is not None
+    with pytest.raises(SnapshotNoDisponibleError):
+        await ingesta_service.ingerir_seccion(db, analisis.id, "etapas", _cuerpo(_etapas("A")))
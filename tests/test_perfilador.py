@@ -0,0 +1,29 @@
+import os
+
+from app.config import settings
+from app.services.perfilador import leer_perfil, perfilar
+
+
+async def test_perfilar_guarda_y_poda_los_perfiles_viejos(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "perfiles_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "perfiles_max", 2)
+
+    for i, nombre in enumerate(("a", "b", "c")):
+        async with perfilar(nombre):
+            pass
+        # mtime explícito: el orden de poda no depende de la resolución del reloj
+        os.utime(tmp_path / f"{nombre}.folded", (i, i))
+
+    async with perfilar("d"):
+        pass
+
+    assert sorted(os.listdir(tmp_path)) == ["c.folded", "d.folded"]
+    assert leer_perfil("a") is None
+    assert leer_perfil("d") is not None
+
+
+async def test_perfilar_inactivo_no_escribe(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "perfiles_dir", str(tmp_path))
+    async with perfilar("x", activo=False):
+        pass
+    assert os.listdir(tmp_path) == []
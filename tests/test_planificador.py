@@ -0,0 +1,66 @@
+import asyncio
+from collections import Counter
+
+from app.models.enums import PrioridadAnalisis
+from app.services.planificador import PlanificadorJusto
+
+
+def _planificador() -> PlanificadorJusto:
+    return PlanificadorJusto(pesos_clientes={}, cuota_minima=0.0)
+
+
+def _turno(loop, etiqueta: str) -> asyncio.Future:
+    turno = loop.create_future()
+    turno.etiqueta = etiqueta
+    return turno
+
+
+async def test_el_lote_no_se_queda_sin_turnos_ante_interactivos_continuos():
+    loop = asyncio.get_running_loop()
+    planificador = _planificador()
+    for i in range(10):
+        planificador.push(_turno(loop, "lote"), PrioridadAnalisis.LOTE, "tenant-b", "CP-002")
+
+    despachados = []
+    for _ in range(14):
+        # Un cliente que manda todo como INTERACTIVA mantiene su nivel siempre con cola
+        planificador.push(_turno(loop, "interactiva"), PrioridadAnalisis.INTERACTIVA, "tenant-a", "CP-001")
+        despachados.append(planificador.pop().etiqueta)
+
+    conteo = Counter(despachados)
+    assert conteo["lote"] >= 2
+    assert conteo["interactiva"] > conteo["lote"]
+
+
+async def test_un_interactivo_sale_antes_que_el_lote_acumulado():
+    loop = asyncio.get_running_loop()
+    planificador = _planificador()
+    for _ in range(5):
+        planificador.push(_turno(loop, "lote"), PrioridadAnalisis.LOTE, "tenant-b", "CP-002")
+    planificador.pop()
+
+    planificador.push(_turno(loop, "interactiva"), PrioridadAnalisis.INTERACTIVA, "tenant-a", "CP-001")
+    assert planificador.pop().etiqueta == "interactiva"
+
+
+async def test_dentro_de_un_nivel_se_reparte_entre_clientes():
+    loop = asyncio.get_running_loop()
+    planificador = _planificador()
+    for _ in range(10):
+        planificador.push(_turno(loop, "a"), PrioridadAnalisis.NORMAL, "tenant-a", "CP-001")
+    planificador.push(_turno(loop, "b"), PrioridadAnalisis.NORMAL, "tenant-b", "CP-002")
+
+    assert "b" in [planificador.pop().etiqueta for _ in range(2)]
+
+
+async def test_los_turnos_cancelados_se_descartan():
+    loop = asyncio.get_running_loop()
+    planificador = _planificador()
+    cancelado = _turno(loop, "cancelado")
+    planificador.push(cancelado, PrioridadAnalisis.INTERACTIVA, "tenant-a", "CP-001")
+    planificador.push(_turno(loop, "vigente"), PrioridadAnalisis.NORMAL, "tenant-a", "CP-001")
+    cancelado.cancel()
+
+    assert planificador.pop().etiqueta == "vigente"
+    assert planificador.pop() is None
+    assert not planificador
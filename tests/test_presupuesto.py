@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import ai_engine, presupuesto as modulo_presupuesto
+from app.services.ai_engine import AIEngineService
+from app.services.latencias import RegistroLatencias
+from app.services.presupuesto import Presupuesto, PresupuestoAgotadoError
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """Reloj monotónico controlado por el test: `reloj.ahora += segundos`."""
+    reloj = SimpleNamespace(ahora=1000.0)
+    monkeypatch.setattr(modulo_presupuesto, "time", SimpleNamespace(monotonic=lambda: reloj.ahora))
+    return reloj
+
+
+@pytest.fixture
+def motor(monkeypatch):
+    """Motor con dos modelos (`lento` y `rapido`) y un LLM falso que anota a quién se llamó."""
+    proveedor = SimpleNamespace(nombre="falso")
+    monkeypatch.setattr(
+        ai_engine, "proveedores",
+        SimpleNamespace(intentos=lambda: iter([(proveedor, "lento"), (proveedor, "rapido")])),
+    )
+    monkeypatch.setattr(ai_engine, "registro_latencias", RegistroLatencias())
+
+    motor = AIEngineService(db=None)
+    motor.llamados = []
+
+    async def llm(system_prompt, user_prompt, model=None, presupuesto=None, proveedor=None):
+        motor.llamados.append(model)
+        return f"respuesta de {model}"
+
+    monkeypatch.setattr(motor, "_call_llm", llm)
+    return motor
+
+
+def test_el_presupuesto_se_agota_con_el_tiempo(reloj):
+    presupuesto = Presupuesto(30)
+    reloj.ahora += 20
+    assert presupuesto.restante() == pytest.approx(10)
+    presupuesto.verificar()
+
+    reloj.ahora += 15
+    assert presupuesto.restante() == 0
+    assert presupuesto.agotado()
+    with pytest.raises(PresupuestoAgotadoError, match=r"\(30 s\)\. Esperando al LLM"):
+        presupuesto.verificar("Esperando al LLM")
+
+
+async def test_se_omite_el_modelo_cuya_latencia_no_entra_en_lo_que_queda(motor, reloj):
+    ai_engine.registro_latencias.registrar("lento", 40.0)
+    ai_engine.registro_latencias.registrar("rapido", 5.0)
+
+    respuesta = await motor._call_llm_with_fallback("sistema", "usuario", presupuesto=Presupuesto(30))
+
+    assert respuesta == "respuesta de rapido"
+    assert motor.llamados == ["rapido"]
+
+
+async def test_con_presupuesto_holgado_se_respeta_el_orden(motor, reloj):
+    ai_engine.registro_latencias.registrar("lento", 40.0)
+
+    await motor._call_llm_with_fallback("sistema", "usuario", presupuesto=Presupuesto(60))
+
+    assert motor.llamados == ["lento"]
+
+
+async def test_sin_presupuesto_no_se_llama_a_ningun_modelo(motor, reloj):
+    presupuesto = Presupuesto(30)
+    reloj.ahora += 31
+
+    with pytest.raises(PresupuestoAgotadoError):
+        await motor._call_llm_with_fallback("sistema", "usuario", presupuesto=presupuesto)
+    assert motor.llamados == []
@@ -0,0 +1,30 @@
+from app.config import models_registry, settings
+from app.services.prompts import PromptPartes, construir_mensajes
+
+
+def test_el_registro_declara_modelos_con_cache():
+    assert settings.modelos_con_cache_prompt
+    assert settings.modelos_con_cache_prompt <= set(models_registry.AVAILABLE_MODELS)
+
+
+def test_un_modelo_con_cache_recibe_el_hint_en_system_y_prefijo():
+    modelo = sorted(settings.modelos_con_cache_prompt)[0]
+
+    system, usuario = construir_mensajes("sistema", PromptPartes("proyecto\n", "avance\n"), modelo)
+
+    assert system["content"] == [{"type": "text", "text": "sistema", "cache_control": {"type": "ephemeral"}}]
+    assert usuario["content"] == [
+        {"type": "text", "text": "proyecto\n", "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": "avance\n"},
+    ]
+
+
+def test_un_modelo_sin_cache_recibe_texto_plano():
+    modelo = next(m for m in models_registry.AVAILABLE_MODELS if m not in settings.modelos_con_cache_prompt)
+
+    mensajes = construir_mensajes("sistema", PromptPartes("proyecto\n", "avance\n"), modelo)
+
+    assert mensajes == [
+        {"role": "system", "content": "sistema"},
+        {"role": "user", "content": "proyecto\navance\n"},
+    ]
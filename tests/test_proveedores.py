@@ -0,0 +1,34 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.ai_engine import AIEngineService
+from app.services.presupuesto import Presupuesto, PresupuestoAgotadoError
+from app.services.proveedores import ProveedorLLM
+
+
+async def test_esperar_un_slot_respeta_el_presupuesto():
+    proveedor = ProveedorLLM("local", "http://localhost:8080", "", ["modelo-local"], max_concurrencia=1)
+    ocupado = asyncio.Event()
+    liberar = asyncio.Event()
+
+    async def ocupar():
+        async with proveedor.slot():
+            ocupado.set()
+            await liberar.wait()
+
+    tarea = asyncio.ensure_future(ocupar())
+    await ocupado.wait()
+
+    inicio = time.monotonic()
+    with pytest.raises(PresupuestoAgotadoError, match="lugar libre"):
+        await AIEngineService(db=None)._call_llm(
+            "sistema", "usuario", presupuesto=Presupuesto(0.05), proveedor=proveedor
+        )
+    assert time.monotonic() - inicio < 1.0
+    assert proveedor.en_uso == 1
+
+    liberar.set()
+    await tarea
+    assert proveedor.en_uso == 0
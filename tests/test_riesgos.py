@@ -0,0 +1,50 @@
+from unittest.mock import MagicMock
+from uuid import uuid4
+
+import pytest
+
+from app.crud.crud_riesgos import _terminos_por_normalizado
+from app.models import ResultadoAnalisis
+from app.services import ai_engine
+from app.services.ai_engine import AIEngineService
+
+
+def test_lista_normaliza_y_deduplica():
+    assert _terminos_por_normalizado(["Falta de EPP.", "falta de epp", 3, "  "]) == {
+        "falta de epp": "Falta de EPP."
+    }
+
+
+def test_string_suelto_cuenta_como_un_riesgo():
+    assert _terminos_por_normalizado("Atraso en hormigonado") == {
+        "atraso en hormigonado": "Atraso en hormigonado"
+    }
+
+
+def test_otros_tipos_se_ignoran():
+    assert _terminos_por_normalizado({"riesgo": "x"}) == {}
+    assert _terminos_por_normalizado(None) == {}
+    assert _terminos_por_normalizado(42) == {}
+
+
+@pytest.mark.parametrize("crudo, guardado", [
+    ("Atraso en hormigonado", ["Atraso en hormigonado"]),
+    (["Lluvias", 7, " "], ["Lluvias"]),
+    ({"riesgo": "x"}, []),
+    (None, []),
+])
+def test_la_columna_recibe_la_lista_normalizada(crudo, guardado, monkeypatch):
+    sincronizados = []
+    monkeypatch.setattr(
+        ai_engine, "sincronizar_terminos_riesgo",
+        lambda db, resultado, riesgos: sincronizados.append(riesgos),
+    )
+    db = MagicMock()
+
+    AIEngineService(db)._save_results(uuid4(), {"riesgos_identificados": crudo})
+
+    resultado = db.add.call_args.args[0]
+    assert isinstance(resultado, ResultadoAnalisis)
+    assert resultado.riesgos_identificados == guardado
+    # Los términos salen de la misma lista que se guarda
+    assert sincronizados == [guardado]
@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from app.config import settings
+from app.services import ai_engine
+from app.services.ai_engine import AIEngineService
+from app.services.prompts import SYSTEM_PROMPT_SINTESIS
+
+
+@pytest.fixture
+def motor(monkeypatch):
+    """Motor en modo secciones con un LLM falso: `fallas[prompt]` = cuántas veces falla antes de responder."""
+    monkeypatch.setattr(settings, "seccion_max_intentos", 2)
+    monkeypatch.setattr(
+        ai_engine, "build_section_prompts",
+        lambda datos: {"estado_ejecucion": "ejecucion", "estado_seguridad": "seguridad"},
+    )
+    monkeypatch.setattr(ai_engine, "build_synthesis_prompt", lambda datos, secciones: "sintesis")
+
+    motor = AIEngineService(db=None)
+    motor.fallas = {}
+    motor.llamadas = []
+
+    async def llm(system_prompt, user_prompt, analisis_id=None, presupuesto=None):
+        motor.llamadas.append(user_prompt)
+        if motor.fallas.get(user_prompt, 0) > 0:
+            motor.fallas[user_prompt] -= 1
+            raise RuntimeError(f"falla {user_prompt}")
+        if system_prompt == SYSTEM_PROMPT_SINTESIS:
+            return '{"resumen_general": "Obra en plazo", "riesgos_identificados": ["lluvias"], "score_coherencia": 85}'
+        return f"Texto de {user_prompt}"
+
+    monkeypatch.setattr(motor, "_call_llm_with_fallback", llm)
+    return motor
+
+
+async def _generar(motor):
+    snapshot = SimpleNamespace(datos={})
+    return await motor._generar_informe_por_secciones(uuid4(), snapshot, presupuesto=None)
+
+
+async def test_la_sintesis_se_reintenta(motor):
+    motor.fallas["sintesis"] = 1
+
+    informe = await _generar(motor)
+
+    assert motor.llamadas.count("sintesis") == 2
+    assert informe["resumen_general"] == "Obra en plazo"
+    assert informe["informe_parcial"] is None
+
+
+async def test_sin_sintesis_se_guardan_las_secciones_como_parciales(motor):
+    motor.fallas["sintesis"] = 99
+
+    informe = await _generar(motor)
+
+    assert informe["estado_ejecucion"] == "Texto de ejecucion"
+    assert informe["resumen_general"] == "No informado"
+    assert informe["riesgos_identificados"] == []
+    assert informe["score_coherencia"] is None
+    assert "síntesis" in informe["informe_parcial"]
+
+
+async def test_una_seccion_fallida_marca_el_informe_como_parcial(motor):
+    motor.fallas["seguridad"] = 99
+
+    informe = await _generar(motor)
+
+    assert informe["estado_seguridad"].startswith("No informado")
+    assert informe["score_coherencia"] == 85
+    assert "estado_seguridad" in informe["informe_parcial"]
+
+
+async def test_sin_ninguna_seccion_el_analisis_falla(motor):
+    motor.fallas.update({"ejecucion": 99, "seguridad": 99})
+    with pytest.raises(Exception, match="Ninguna sección"):
+        await _generar(motor)
@@ -0,0 +1,59 @@
+import pytest
+
+from app.schemas.snapshot import SnapshotCanonico, SnapshotInput
+from app.utils.hashing import generar_hash_payload, generar_huella_bytes, serializar_canonico
+
+PAYLOAD = {
+    "proyecto": {
+        "proyecto_nombre": "Edificio RENO I",
+        "ubicacion": "Córdoba",
+        "tipo_intervencion": "Obra nueva",
+        "superficie_m2": 1250.5,
+        "sistema_constructivo": "Hormigón armado",
+        "responsable_tecnico_nombre": "Ing. Pérez",
+        "fecha_inicio": "2025-03-01",
+    },
+    "etapas": [
+        {
+            "etapa_nombre": "Estructura",
+            "etapa_orden": 1,
+            "fecha_inicio_estimada": "2025-03-01",
+            "fecha_fin_estimada": None,
+            "estado": "en_curso",
+        }
+    ],
+    "avances": [
+        {
+            "fecha_registro": "2025-04-10",
+            "etapa_nombre": "Estructura",
+            "porcentaje_avance": 35.0,
+            "tareas_principales": ["Losa 1er piso"],
+            "oficios_activos": ["Hormigonero"],
+        }
+    ],
+    "seguridad_higiene": [{"cobertura_art_declarada": True}],
+    "validaciones_tecnicas": [],
+}
+
+
+def test_el_hash_canonico_coincide_con_el_hash_del_payload():
+    snapshot = SnapshotCanonico(SnapshotInput.model_validate(PAYLOAD))
+
+    assert snapshot.datos == PAYLOAD
+    assert snapshot.hash == generar_hash_payload(PAYLOAD)
+    assert snapshot.huella == generar_huella_bytes(serializar_canonico(PAYLOAD))
+
+
+def test_el_snapshot_por_partes_hashea_igual_que_el_validado():
+    # Armado desde las tablas Dato* con las claves en otro orden
+    datos = {clave: PAYLOAD[clave] for clave in reversed(PAYLOAD)}
+
+    por_partes = SnapshotCanonico(datos=datos)
+    validado = SnapshotCanonico(SnapshotInput.model_validate(PAYLOAD))
+
+    assert (por_partes.hash, por_partes.huella) == (validado.hash, validado.huella)
+
+
+def test_hace_falta_el_modelo_o_los_datos():
+    with pytest.raises(ValueError):
+        SnapshotCanonico()
@@ -0,0 +1,111 @@
+import json
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.core.exceptions import WebhookUrlNoPermitidaError, WebhooksDeshabilitadosError
+from app.crud import reclamar_entregas
+from app.models import EntregaWebhook
+from app.models.enums import EstadoAnalisis, EstadoEntregaWebhook
+from app.services import webhooks
+from app.services.webhooks import RepartidorWebhooks, motivo_url_bloqueada, validar_callback
+
+
+@pytest.fixture
+def entregas(db, crear_analisis):
+    analisis = crear_analisis(EstadoAnalisis.COMPLETADO)
+    ahora = datetime.utcnow()
+
+    def crear(url: str, **campos) -> EntregaWebhook:
+        entrega = EntregaWebhook(
+            analisis_id=analisis.id, url=url, evento=EstadoAnalisis.COMPLETADO,
+            proximo_intento_at=campos.pop("proximo_intento_at", ahora - timedelta(seconds=1)), **campos
+        )
+        db.add(entrega)
+        db.commit()
+        return entrega
+    return crear
+
+
+def test_reclamar_toma_solo_las_vencidas_y_las_reserva(db, entregas):
+    vencida = entregas("http://receptor.test/a")
+    entregas("http://receptor.test/b", proximo_intento_at=datetime.utcnow() + timedelta(hours=1))
+    entregas("http://receptor.test/c", estado=EstadoEntregaWebhook.ENTREGADA)
+
+    reclamadas = reclamar_entregas(db, 10, reserva_segundos=60)
+    assert [e["id"] for e in reclamadas] == [vencida.id]
+    # Reservada: otro ciclo (u otro proceso) no la vuelve a tomar mientras dura la reserva
+    assert reclamar_entregas(db, 10, reserva_segundos=60) == []
+
+
+async def test_repartir_agrupa_por_url_firma_y_reprograma(db, Sesion, entregas, monkeypatch):
+    monkeypatch.setattr(settings, "webhook_hosts_permitidos", ["ok.test", "caido.test"])
+    monkeypatch.setattr(webhooks, "SessionWorkers", Sesion)
+    ok = [entregas("http://ok.test/hook") for _ in range(3)]
+    caida = entregas("http://caido.test/hook")
+
+    recibidos = []
+
+    def receptor(request: httpx.Request) -> httpx.Response:
+        recibidos.append(request)
+        return httpx.Response(200 if request.url.host == "ok.test" else 500)
+
+    repartidor = RepartidorWebhooks(
+        secreto="s3creto", intervalo=1, lote_max=2, timeout=1, max_intentos=3,
+        backoff_base=10, backoff_max=60, reserva=60,
+    )
+    repartidor._cliente = httpx.AsyncClient(transport=httpx.MockTransport(receptor))
+    monkeypatch.setattr(repartidor, "_armar_eventos", lambda db, lote: {e["id"]: {"id": str(e["id"])} for e in lote})
+
+    assert await repartidor.repartir() == 4
+    await repartidor.cerrar()
+
+    # 3 eventos con lote_max=2 → dos POST a ok.test, uno a caido.test
+    assert sorted(r.url.host for r in recibidos) == ["caido.test", "ok.test", "ok.test"]
+    for request in recibidos:
+        firma = repartidor.firmar(request.content, request.headers["X-Webhook-Timestamp"])
+        assert request.headers["X-Webhook-Firma"] == firma
+    assert sum(len(json.loads(r.content)["eventos"]) for r in recibidos if r.url.host == "ok.test") == 3
+
+    db.expire_all()
+    assert {db.get(EntregaWebhook, e.id).estado for e in ok} == {EstadoEntregaWebhook.ENTREGADA}
+    reprogramada = db.get(EntregaWebhook, caida.id)
+    assert reprogramada.estado == EstadoEntregaWebhook.PENDIENTE
+    assert reprogramada.intentos == 1
+    assert reprogramada.ultimo_error == "HTTP 500"
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1/hook",
+    "http://[::1]/hook",
+    "http://10.0.0.8/hook",
+    "http://192.168.1.1/hook",
+    "http://169.254.169.254/latest/meta-data",
+    "http://[::ffff:127.0.0.1]/hook",
+    "ftp://93.184.216.34/hook",
+])
+def test_urls_privadas_o_sin_http_se_bloquean(url, monkeypatch):
+    monkeypatch.setattr(settings, "webhook_hosts_permitidos", [])
+    assert motivo_url_bloqueada(url) is not None
+
+
+def test_ip_publica_y_lista_de_hosts_permitidos(monkeypatch):
+    monkeypatch.setattr(settings, "webhook_hosts_permitidos", [])
+    assert motivo_url_bloqueada("https://93.184.216.34/hook") is None
+
+    monkeypatch.setattr(settings, "webhook_hosts_permitidos", ["hooks.interno"])
+    assert motivo_url_bloqueada("http://hooks.interno:8080/x") is None
+    assert motivo_url_bloqueada("https://93.184.216.34/hook") is not None
+
+
+def test_sin_secreto_no_se_aceptan_callbacks(monkeypatch):
+    monkeypatch.setattr(settings, "webhook_secreto", "")
+    with pytest.raises(WebhooksDeshabilitadosError):
+        validar_callback("https://93.184.216.34/hook")
+
+    monkeypatch.setattr(settings, "webhook_secreto", "s3creto")
+    monkeypatch.setattr(settings, "webhook_hosts_permitidos", [])
+    with pytest.raises(WebhookUrlNoPermitidaError):
+        validar_callback("http://localhost/hook")